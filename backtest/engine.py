@@ -0,0 +1,413 @@
+"""
+Backtest hors-ligne de la stratégie Heikin Ashi + RSI.
+
+Chemin rapide vectorisé (NumPy) :
+    ticks -> bougies (même découpage que WebSocketClient._update_candle)
+          -> Heikin Ashi (même formule que _to_heikin_ashi)
+          -> scores (mêmes règles que DecisionEngine.compute_score)
+          -> simulation ouverture / clôture / retournement de main.py + TP/SL
+
+Usage :
+    python -m backtest.engine --ticks trades.csv
+    python -m backtest.engine --ohlc candles.csv
+    python -m backtest.engine --recorded data/ticks --symbol PF_ETHUSD
+    python -m backtest.engine --ticks trades.csv --parity
+"""
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from services.tick_recorder import TickReader
+from strategy.decision_engine import DecisionEngine, DEFAULT_WEIGHTS, RSI_LOW, RSI_HIGH
+from strategy.rules import pnl_percent, should_close, tp_sl_levels
+from utils.logger import setup_logger
+from config import SYMBOL, OHLC_INTERVAL_SEC, USE_HEIKIN_ASHI, TP_PCT, SL_PCT, MIN_GAIN_POUR_CLOTURE, ORDER_SIZE
+
+logger = setup_logger("Backtest")
+
+ACTIONS = np.array(["hold", "buy", "sell"])
+
+
+def load_ticks_csv(path: str) -> dict:
+    """Charge des trades bruts (colonnes time [ms], price, qty)."""
+    df = pd.read_csv(path, usecols=["time", "price", "qty"])
+    return {
+        "time": df["time"].to_numpy(dtype=np.int64),
+        "price": df["price"].to_numpy(dtype=np.float64),
+        "qty": df["qty"].to_numpy(dtype=np.float64),
+    }
+
+
+def load_ticks_recorded(directory: str, symbol: str, start_ms=None, end_ms=None) -> dict:
+    """Charge les ticks enregistrés par TickRecorder (memory-map, sans parsing)."""
+    return TickReader(directory, symbol).columns(start_ms, end_ms)
+
+
+def load_ohlc_csv(path: str) -> dict:
+    """Charge des bougies brutes (colonnes timestamp [s], open, high, low, close, volume)."""
+    df = pd.read_csv(path, usecols=["timestamp", "open", "high", "low", "close", "volume"])
+    candles = {name: df[name].to_numpy(dtype=np.float64) for name in ("open", "high", "low", "close", "volume")}
+    candles["timestamp"] = df["timestamp"].to_numpy(dtype=np.int64)
+    return candles
+
+
+def candles_from_ticks(time_ms, price, qty, interval: int = OHLC_INTERVAL_SEC, include_last: bool = False) -> dict:
+    """
+    Reconstruit les bougies brutes comme WebSocketClient._update_candle :
+    une nouvelle bougie démarre dès qu'un trade dépasse la fin de la bougie courante,
+    un trade en retard est fusionné dans la bougie courante, un intervalle sans trade
+    donne une bougie plate (OHLC = close précédent, volume 0).
+    La dernière bougie (encore ouverte en fin de données) est ignorée par défaut.
+    """
+    time_ms = np.asarray(time_ms)
+    price = np.asarray(price, dtype=np.float64)
+    qty = np.asarray(qty, dtype=np.float64)
+    if not len(price):
+        return {name: np.empty(0) for name in ("timestamp", "open", "high", "low", "close", "volume")}
+
+    bucket = (time_ms // 1000) // interval * interval
+    bucket = np.maximum.accumulate(bucket)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    ends = np.concatenate((starts[1:], [len(price)]))
+
+    candles = {
+        "timestamp": bucket[starts].astype(np.int64),
+        "open": price[starts],
+        "high": np.maximum.reduceat(price, starts),
+        "low": np.minimum.reduceat(price, starts),
+        "close": price[ends - 1],
+        "volume": np.add.reduceat(qty, starts),
+    }
+    slots = (candles["timestamp"] - candles["timestamp"][0]) // interval
+    if slots[-1] + 1 > len(slots):
+        # Intervalles sans trade : close précédent propagé, volume nul
+        filled = {name: np.empty(slots[-1] + 1) for name in candles}
+        filled["timestamp"] = candles["timestamp"][0] + np.arange(slots[-1] + 1, dtype=np.int64) * interval
+        source = np.full(slots[-1] + 1, -1)
+        source[slots] = np.arange(len(slots))
+        source = np.maximum.accumulate(source)
+        present = np.zeros(slots[-1] + 1, dtype=bool)
+        present[slots] = True
+        previous_close = candles["close"][source]
+        for name in ("open", "high", "low", "close"):
+            filled[name] = np.where(present, candles[name][source], previous_close)
+        filled["volume"] = np.where(present, candles["volume"][source], 0.0)
+        candles = filled
+    if not include_last:
+        candles = {name: values[:-1] for name, values in candles.items()}
+    return candles
+
+
+def heikin_ashi(candles: dict) -> dict:
+    """Heikin Ashi récursif, même amorçage que WebSocketClient._to_heikin_ashi."""
+    o, h, l, c = (candles[k] for k in ("open", "high", "low", "close"))
+    ha_close = (o + h + l + c) / 4
+    ha_open = np.empty_like(ha_close)
+    if len(ha_close):
+        # Récurrence séquentielle, faite sur des floats Python (plus rapide que l'indexation NumPy)
+        closes = ha_close.tolist()
+        opens = [(o[0] + c[0]) / 2]
+        for i in range(1, len(closes)):
+            opens.append((opens[-1] + closes[i - 1]) / 2)
+        ha_open[:] = opens
+    return {
+        "timestamp": candles["timestamp"],
+        "open": ha_open,
+        "high": np.maximum(h, np.maximum(ha_open, ha_close)),
+        "low": np.minimum(l, np.minimum(ha_open, ha_close)),
+        "close": ha_close,
+        "volume": candles["volume"],
+    }
+
+
+def _rolling_mean(values, window):
+    """Moyenne glissante ; moyenne cumulée tant que la fenêtre n'est pas pleine."""
+    out = np.cumsum(values) / np.arange(1, len(values) + 1)
+    if len(values) >= window:
+        out[window - 1:] = sliding_window_view(values, window).sum(axis=1) / window
+    return out
+
+
+def score_components(candles: dict, rsi_period: int = 14) -> dict:
+    """
+    Signaux élémentaires de DecisionEngine.compute_score, indépendants des poids et seuils :
+    RSI, tendance (+1 / -1 / 0), bougie forte (+1 / -1 / 0) et volume supérieur à la moyenne.
+    """
+    o, h, l, c, v = (candles[k] for k in ("open", "high", "low", "close", "volume"))
+    n = len(c)
+    rsi = np.full(n, 50.0)
+    if n >= rsi_period + 1:
+        delta = np.diff(c)
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        avg_gain = sliding_window_view(gain, rsi_period).sum(axis=1) / rsi_period
+        avg_loss = sliding_window_view(loss, rsi_period).sum(axis=1) / rsi_period
+        rs = avg_gain / (avg_loss + 1e-9)
+        rsi[rsi_period:] = 100 - (100 / (1 + rs))
+
+    body = c - o
+    rng = h - l
+    green = c > o
+    red = c < o
+    prev_green = np.concatenate(([False], green[:-1]))
+    prev_red = np.concatenate(([False], red[:-1]))
+
+    return {
+        "rsi": rsi,
+        "trend": (green & prev_green).astype(np.int64) - (red & prev_red),
+        "body": (body > rng * 0.6).astype(np.int64) - (-body > rng * 0.6),
+        "high_volume": v > _rolling_mean(v, 10) if n else np.zeros(0, dtype=bool),
+        "rsi_period": rsi_period,
+    }
+
+
+def combine_scores(components: dict, weights: dict | None = None, rsi_low: float = RSI_LOW,
+                   rsi_high: float = RSI_HIGH) -> np.ndarray:
+    """Score pondéré à partir des signaux élémentaires (0 tant que l'historique est insuffisant)."""
+    weights = weights or DEFAULT_WEIGHTS
+    rsi = components["rsi"]
+    scores = weights["trend"] * components["trend"]
+    scores = scores + weights["rsi"] * ((rsi < rsi_low).astype(np.int64) - (rsi > rsi_high))
+    scores = scores + weights["body"] * components["body"]
+    scores = scores + np.where(components["high_volume"],
+                               np.where(scores > 0, weights["volume"], -weights["volume"]), 0)
+    scores[:components["rsi_period"]] = 0
+    return scores
+
+
+def compute_scores(candles: dict, rsi_period: int = 14, weights: dict | None = None,
+                   rsi_low: float = RSI_LOW, rsi_high: float = RSI_HIGH) -> tuple:
+    """Scores vectorisés selon les règles de DecisionEngine.compute_score. Retourne (scores, rsi)."""
+    components = score_components(candles, rsi_period)
+    return combine_scores(components, weights, rsi_low, rsi_high), components["rsi"]
+
+
+def decisions_from_scores(scores, score_threshold: int = 60) -> np.ndarray:
+    """0 = hold, 1 = buy, 2 = sell."""
+    return np.where(scores >= score_threshold, 1, np.where(scores <= -score_threshold, 2, 0))
+
+
+class Backtester:
+    def __init__(
+        self,
+        rsi_period=14,
+        score_threshold=60,
+        interval=OHLC_INTERVAL_SEC,
+        use_heikin_ashi=USE_HEIKIN_ASHI,
+        tp_pct=TP_PCT,
+        sl_pct=SL_PCT,
+        min_gain=MIN_GAIN_POUR_CLOTURE,
+        order_size=ORDER_SIZE,
+        fee_pct=0.0,
+        weights=None,
+        rsi_low=RSI_LOW,
+        rsi_high=RSI_HIGH,
+    ):
+        self.rsi_period = rsi_period
+        self.score_threshold = score_threshold
+        self.interval = interval
+        self.use_heikin_ashi = use_heikin_ashi
+        self.tp_pct = tp_pct
+        self.sl_pct = sl_pct
+        self.min_gain = min_gain
+        self.order_size = order_size
+        self.fee_pct = fee_pct
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.rsi_low = rsi_low
+        self.rsi_high = rsi_high
+
+    def prepare(self, raw: dict) -> dict:
+        """Bougies transmises à la stratégie (HA ou brutes) + décisions vectorisées."""
+        signal = heikin_ashi(raw) if self.use_heikin_ashi else raw
+        scores, rsi = compute_scores(signal, self.rsi_period, self.weights, self.rsi_low, self.rsi_high)
+        return {
+            "raw": raw,
+            "signal": signal,
+            "scores": scores,
+            "rsi": rsi,
+            "decisions": decisions_from_scores(scores, self.score_threshold),
+        }
+
+    def run_ticks(self, ticks: dict) -> dict:
+        raw = candles_from_ticks(ticks["time"], ticks["price"], ticks["qty"], self.interval)
+        return self.run_candles(raw)
+
+    def run_candles(self, raw: dict) -> dict:
+        started = time.perf_counter()
+        prepared = self.prepare(raw)
+        trades = self.simulate(prepared)
+        result = {
+            "candles": len(raw["close"]),
+            "trades": trades,
+            "summary": summarize(trades),
+            "elapsed_sec": time.perf_counter() - started,
+        }
+        result.update(prepared)
+        return result
+
+    def simulate(self, prepared: dict) -> list:
+        """
+        Rejoue la logique de main.on_new_candle bougie par bougie :
+        ouverture sur signal, clôture sur signal opposé ou gain >= min_gain,
+        retournement immédiat, TP/SL testés sur le high/low brut des bougies suivantes
+        (SL prioritaire si les deux niveaux sont touchés dans la même bougie).
+        """
+        raw, signal = prepared["raw"], prepared["signal"]
+        timestamps = raw["timestamp"].tolist()
+        highs, lows = raw["high"].tolist(), raw["low"].tolist()
+        closes = signal["close"].tolist()
+        actions = ACTIONS[prepared["decisions"]].tolist()
+
+        trades = []
+        position = None
+
+        def close(exit_price, ts, reason):
+            pnl = pnl_percent(position["side"], position["entry_price"], exit_price) - 2 * self.fee_pct
+            trades.append({
+                "side": position["side"],
+                "entry_price": position["entry_price"],
+                "exit_price": exit_price,
+                "entry_timestamp": position["timestamp"],
+                "timestamp": ts,
+                "pnl_percent": pnl,
+                "size": self.order_size,
+                "reason": reason,
+            })
+
+        def open_(action, price, ts):
+            side = "long" if action == "buy" else "short"
+            tp, sl = tp_sl_levels(side, price, self.tp_pct, self.sl_pct)
+            return {"side": side, "entry_price": price, "timestamp": ts, "tp": tp, "sl": sl}
+
+        for ts, high, low, price, action in zip(timestamps, highs, lows, closes, actions):
+            # TP/SL résidents côté exchange : déclenchés pendant la bougie
+            if position and position["tp"] is not None:
+                long = position["side"] == "long"
+                hit_sl = low <= position["sl"] if long else high >= position["sl"]
+                hit_tp = high >= position["tp"] if long else low <= position["tp"]
+                if hit_sl:
+                    close(position["sl"], ts, "sl")
+                    position = None
+                elif hit_tp:
+                    close(position["tp"], ts, "tp")
+                    position = None
+
+            if not position:
+                if action != "hold":
+                    position = open_(action, price, ts)
+                continue
+
+            pnl = pnl_percent(position["side"], position["entry_price"], price)
+            if should_close(position["side"], action, pnl, self.min_gain):
+                close(price, ts, "signal" if action != "hold" else "min_gain")
+                position = open_(action, price, ts) if action != "hold" else None
+
+        return trades
+
+    def parity_check(self, ticks: dict, client_factory=None) -> dict:
+        """
+        Rejoue les ticks dans le code événementiel (WebSocketClient._update_candle
+        + DecisionEngine) et compare bougies et décisions au chemin vectorisé.
+        """
+        if client_factory is None:
+            from services.websocket_client import WebSocketClient
+            client_factory = WebSocketClient
+
+        emitted = []
+        engine = DecisionEngine(rsi_period=self.rsi_period, score_threshold=self.score_threshold,
+                                weights=self.weights, rsi_low=self.rsi_low, rsi_high=self.rsi_high)
+
+        def on_candle(candle):
+            engine.update(candle)
+            emitted.append((candle, engine.decide()[0]))
+
+        ws_logger = logging.getLogger("WebSocket")
+        previous_level = ws_logger.level
+        ws_logger.setLevel(logging.WARNING)
+        try:
+            client = client_factory("BACKTEST", on_candle)
+            for t, p, q in zip(ticks["time"].tolist(), ticks["price"].tolist(), ticks["qty"].tolist()):
+                client._update_candle(p, q, int(t // 1000))
+        finally:
+            ws_logger.setLevel(previous_level)
+
+        prepared = self.prepare(candles_from_ticks(ticks["time"], ticks["price"], ticks["qty"], self.interval))
+        signal = prepared["signal"]
+        actions = ACTIONS[prepared["decisions"]].tolist()
+
+        candle_mismatches = []
+        decision_mismatches = []
+        for i, (candle, action) in enumerate(emitted[:len(actions)]):
+            expected = [signal[k][i] for k in ("open", "high", "low", "close", "volume")]
+            got = [candle[k] for k in ("open", "high", "low", "close", "volume")]
+            if candle["timestamp"] != signal["timestamp"][i] or not np.allclose(got, expected, rtol=1e-12):
+                candle_mismatches.append(i)
+            if action != actions[i]:
+                decision_mismatches.append((i, action, actions[i]))
+
+        return {
+            "candles_event": len(emitted),
+            "candles_vectorized": len(actions),
+            "candle_mismatches": candle_mismatches,
+            "decision_mismatches": decision_mismatches,
+            "ok": len(emitted) == len(actions) and not candle_mismatches and not decision_mismatches,
+        }
+
+
+def summarize(trades: list) -> dict:
+    """PnL cumulé, drawdown max (en points de %), nombre de trades et taux de réussite."""
+    if not trades:
+        return {"trades": 0, "pnl_percent": 0.0, "max_drawdown_percent": 0.0, "win_rate": 0.0}
+    pnl = np.array([t["pnl_percent"] for t in trades])
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity
+    return {
+        "trades": len(trades),
+        "pnl_percent": float(equity[-1]),
+        "max_drawdown_percent": float(drawdown.max()),
+        "win_rate": float((pnl > 0).mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest de la stratégie HA + RSI")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--ticks", help="CSV de trades (time, price, qty)")
+    source.add_argument("--ohlc", help="CSV de bougies brutes (timestamp, open, high, low, close, volume)")
+    source.add_argument("--recorded", help="Dossier de ticks binaires (TickRecorder)")
+    parser.add_argument("--symbol", default=SYMBOL)
+    parser.add_argument("--interval", type=int, default=OHLC_INTERVAL_SEC)
+    parser.add_argument("--rsi-period", type=int, default=14)
+    parser.add_argument("--threshold", type=int, default=60)
+    parser.add_argument("--fee-pct", type=float, default=0.0)
+    parser.add_argument("--parity", action="store_true", help="Compare au code événementiel (ticks uniquement)")
+    args = parser.parse_args()
+
+    backtester = Backtester(
+        rsi_period=args.rsi_period,
+        score_threshold=args.threshold,
+        interval=args.interval,
+        fee_pct=args.fee_pct,
+    )
+
+    if args.ticks or args.recorded:
+        ticks = load_ticks_csv(args.ticks) if args.ticks else load_ticks_recorded(args.recorded, args.symbol)
+        if args.parity:
+            report = backtester.parity_check(ticks)
+            print(f"Parité : {'✅ OK' if report['ok'] else '❌ KO'} | {report['candles_event']} bougies événementielles, "
+                  f"{report['candles_vectorized']} vectorisées, {len(report['decision_mismatches'])} écarts de décision")
+            return
+        result = backtester.run_ticks(ticks)
+    else:
+        result = backtester.run_candles(load_ohlc_csv(args.ohlc))
+
+    summary = result["summary"]
+    print(f"Bougies : {result['candles']} | Trades : {summary['trades']} | PnL : {summary['pnl_percent']:.2f}% | "
+          f"Drawdown max : {summary['max_drawdown_percent']:.2f}% | Réussite : {summary['win_rate']:.0%} | "
+          f"Durée : {result['elapsed_sec']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Optimisation des paramètres de la stratégie (grille ou recherche aléatoire) sur un pool de processus.
+
+L'historique de ticks est placé une seule fois en mémoire partagée ; chaque worker
+met en cache les bougies, le Heikin Ashi et les signaux élémentaires par
+(intervalle, période RSI), partagés par toutes les combinaisons de poids / seuils / sorties.
+
+Usage :
+    python -m backtest.sweep --ticks trades.csv \\
+        --param rsi_period=10,14,21 --param score_threshold=50,60,70 \\
+        --param tp_pct=0.3,0.5,1 --param interval=10,30,60 --workers 8 --top 20
+    python -m backtest.sweep --recorded data/ticks --symbol PF_ETHUSD --random 500 \\
+        --param w_trend=10,20,30,40 --param w_rsi=10,20,30,40 --param rsi_low=25,30,35
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from multiprocessing import shared_memory
+import numpy as np
+from backtest.engine import (
+    Backtester, candles_from_ticks, heikin_ashi, score_components, combine_scores,
+    decisions_from_scores, summarize, load_ticks_csv, load_ticks_recorded,
+)
+from strategy.decision_engine import DEFAULT_WEIGHTS, RSI_LOW, RSI_HIGH
+from config import SYMBOL, OHLC_INTERVAL_SEC, USE_HEIKIN_ASHI, TP_PCT, SL_PCT, MIN_GAIN_POUR_CLOTURE
+
+# Paramètres optimisables et valeurs par défaut (celles du bot live)
+DEFAULTS = {
+    "interval": OHLC_INTERVAL_SEC,
+    "rsi_period": 14,
+    "score_threshold": 60,
+    "w_trend": DEFAULT_WEIGHTS["trend"],
+    "w_rsi": DEFAULT_WEIGHTS["rsi"],
+    "w_body": DEFAULT_WEIGHTS["body"],
+    "w_volume": DEFAULT_WEIGHTS["volume"],
+    "rsi_low": RSI_LOW,
+    "rsi_high": RSI_HIGH,
+    "tp_pct": float(TP_PCT) if TP_PCT else 0.0,
+    "sl_pct": float(SL_PCT) if SL_PCT else 0.0,
+    "min_gain": MIN_GAIN_POUR_CLOTURE,
+}
+INT_PARAMS = {"interval", "rsi_period"}
+COLUMNS = ("time", "price", "qty")
+
+
+# ---- Mémoire partagée ----
+
+def share_ticks(ticks: dict):
+    """Copie les colonnes de ticks dans des segments de mémoire partagée. Retourne (segments, description)."""
+    segments, spec = [], {}
+    for name in COLUMNS:
+        array = np.ascontiguousarray(ticks[name])
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+        segments.append(shm)
+        spec[name] = (shm.name, array.shape, array.dtype.str)
+    return segments, spec
+
+
+_worker = {}
+
+
+def _init_worker(spec: dict, use_heikin_ashi: bool, fee_pct: float):
+    """Attache les segments partagés dans le worker (aucune copie des ticks)."""
+    handles = {}
+    ticks = {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles[name] = shm
+        ticks[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    _worker.update(handles=handles, ticks=ticks, use_heikin_ashi=use_heikin_ashi, fee_pct=fee_pct)
+    _candles.cache_clear()
+    _prepared.cache_clear()
+
+
+@lru_cache(maxsize=32)
+def _candles(interval: int):
+    ticks = _worker["ticks"]
+    raw = candles_from_ticks(ticks["time"], ticks["price"], ticks["qty"], interval)
+    signal = heikin_ashi(raw) if _worker["use_heikin_ashi"] else raw
+    return raw, signal
+
+
+@lru_cache(maxsize=64)
+def _prepared(interval: int, rsi_period: int):
+    raw, signal = _candles(interval)
+    return raw, signal, score_components(signal, rsi_period)
+
+
+def evaluate(params: dict) -> dict:
+    """Backtest d'un jeu de paramètres à partir des tableaux en cache."""
+    raw, signal, components = _prepared(int(params["interval"]), int(params["rsi_period"]))
+    weights = {"trend": params["w_trend"], "rsi": params["w_rsi"], "body": params["w_body"], "volume": params["w_volume"]}
+    scores = combine_scores(components, weights, params["rsi_low"], params["rsi_high"])
+    backtester = Backtester(
+        rsi_period=int(params["rsi_period"]),
+        score_threshold=params["score_threshold"],
+        interval=int(params["interval"]),
+        use_heikin_ashi=_worker["use_heikin_ashi"],
+        tp_pct=params["tp_pct"],
+        sl_pct=params["sl_pct"],
+        min_gain=params["min_gain"],
+        fee_pct=_worker["fee_pct"],
+        weights=weights,
+        rsi_low=params["rsi_low"],
+        rsi_high=params["rsi_high"],
+    )
+    prepared = {
+        "raw": raw,
+        "signal": signal,
+        "decisions": decisions_from_scores(scores, params["score_threshold"]),
+    }
+    summary = summarize(backtester.simulate(prepared))
+    return dict(params, **summary, candles=len(raw["close"]))
+
+
+def _evaluate_chunk(chunk: list) -> list:
+    return [evaluate(params) for params in chunk]
+
+
+# ---- Génération des jeux de paramètres ----
+
+def parse_param(spec: str):
+    name, _, values = spec.partition("=")
+    name = name.strip()
+    if name not in DEFAULTS:
+        raise ValueError(f"Paramètre inconnu : {name} (disponibles : {', '.join(DEFAULTS)})")
+    cast = int if name in INT_PARAMS else float
+    return name, [cast(v) for v in values.split(",") if v.strip()]
+
+
+def grid(space: dict) -> list:
+    names = list(space)
+    return [dict(DEFAULTS, **dict(zip(names, combo))) for combo in itertools.product(*space.values())]
+
+
+def random_search(space: dict, n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    seen, out = set(), []
+    total = int(np.prod([len(v) for v in space.values()])) if space else 1
+    while len(out) < min(n, total):
+        combo = tuple(rng.choice(values) for values in space.values())
+        if combo not in seen:
+            seen.add(combo)
+            out.append(dict(DEFAULTS, **dict(zip(space, combo))))
+    return out
+
+
+def _chunks(param_sets: list, chunk_size: int) -> list:
+    """Regroupe par (intervalle, période RSI) pour maximiser les hits de cache dans chaque worker."""
+    param_sets = sorted(param_sets, key=lambda p: (p["interval"], p["rsi_period"]))
+    chunks = []
+    for _, group in itertools.groupby(param_sets, key=lambda p: (p["interval"], p["rsi_period"])):
+        group = list(group)
+        chunks += [group[i:i + chunk_size] for i in range(0, len(group), chunk_size)]
+    return chunks
+
+
+def run_sweep(ticks: dict, param_sets: list, workers: int | None = None, use_heikin_ashi: bool = USE_HEIKIN_ASHI,
+              fee_pct: float = 0.0, chunk_size: int = 16) -> list:
+    """Évalue tous les jeux de paramètres en parallèle. Retourne les résultats triés par PnL décroissant."""
+    workers = workers or os.cpu_count() or 1
+    segments, spec = share_ticks(ticks)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(spec, use_heikin_ashi, fee_pct)) as pool:
+            futures = [pool.submit(_evaluate_chunk, chunk) for chunk in _chunks(param_sets, chunk_size)]
+            for future in as_completed(futures):
+                results.extend(future.result())
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+    results.sort(key=lambda r: (r["pnl_percent"], -r["max_drawdown_percent"]), reverse=True)
+    return results
+
+
+def print_table(results: list, varied: list, top: int):
+    headers = varied + ["trades", "pnl_percent", "max_drawdown_percent", "win_rate"]
+    print(" | ".join(f"{h:>12}" for h in ["rang"] + headers))
+    for rank, result in enumerate(results[:top], 1):
+        cells = [f"{rank:>12}"]
+        for h in headers:
+            value = result[h]
+            cells.append(f"{value:>12.2f}" if isinstance(value, float) else f"{value:>12}")
+        print(" | ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimisation des paramètres de la stratégie")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--ticks", help="CSV de trades (time, price, qty)")
+    source.add_argument("--recorded", help="Dossier de ticks binaires (TickRecorder)")
+    parser.add_argument("--symbol", default=SYMBOL)
+    parser.add_argument("--param", action="append", default=[], help="nom=v1,v2,... (répétable)")
+    parser.add_argument("--random", type=int, default=0, help="Nombre de tirages aléatoires (sinon grille complète)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--fee-pct", type=float, default=0.0)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="Export CSV de tous les résultats")
+    args = parser.parse_args()
+
+    space = dict(parse_param(spec) for spec in args.param)
+    param_sets = random_search(space, args.random, args.seed) if args.random else grid(space)
+    ticks = load_ticks_csv(args.ticks) if args.ticks else load_ticks_recorded(args.recorded, args.symbol)
+
+    started = time.perf_counter()
+    results = run_sweep(ticks, param_sets, workers=args.workers, fee_pct=args.fee_pct)
+    elapsed = time.perf_counter() - started
+    print(f"{len(results)} jeux de paramètres évalués sur {len(ticks['time'])} ticks en {elapsed:.1f}s\n")
+    print_table(results, list(space), args.top)
+
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,520 @@
+"""
+Benchmarks des chemins critiques du bot, entièrement hors ligne (aucun appel réseau,
+MongoDB / Telegram / Kraken remplacés par des doublures en mémoire).
+
+Usage :
+    python -m bench.run                      # Exécute tout et compare à bench/baseline.json
+    python -m bench.run --filter engine      # Sous-ensemble (sous-chaîne du nom)
+    python -m bench.run --save               # Enregistre les résultats comme nouvelle référence
+    python -m bench.run --check              # Code retour 1 si une régression dépasse la tolérance
+
+Chaque benchmark prépare son état (hors chronomètre) puis traite `ops` éléments ;
+le résultat retenu est la médiane des répétitions, en nanosecondes par opération.
+"""
+import os
+
+# Identifiants factices : le benchmark n'utilise jamais les vraies clés du .env
+os.environ.setdefault("KRAKEN_API_KEY", "bench")
+os.environ.setdefault("KRAKEN_API_SECRET", "YmVuY2g=")
+os.environ.setdefault("TELEGRAM_TOKEN", "bench")
+os.environ.setdefault("TELEGRAM_CHAT_ID", "0")
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+from bench.streams import RATES, messages, trades
+from strategy.parity import synthetic_candles
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SYMBOLS = ["PF_ETHUSD", "PF_XBTUSD", "PF_SOLUSD"]
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """Enregistre une fonction de préparation : elle retourne (fonction chronométrée, nb d'opérations)."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# ---- Doublures d'I/O ----
+
+class StubResponse:
+    status_code = 200
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+
+class StubSession:
+    """Remplace requests.Session : réponses Kraken / Telegram immédiates et valides."""
+
+    def __init__(self):
+        self.posts = 0
+
+    def post(self, url, headers=None, json=None, data=None, timeout=None):
+        self.posts += 1
+        if url.endswith("/batchorder"):
+            statuses = [{"order_id": o["order_id"], "status": "cancelled"} if o["order"] == "cancel" else
+                        {"order_id": f"bench-{self.posts}-{i}", "order_tag": o["order_tag"], "status": "placed"}
+                        for i, o in enumerate(json["batchOrder"])]
+            return StubResponse({"result": "success", "batchStatus": statuses})
+        if url.endswith("/sendorder"):
+            return StubResponse({"result": "success", "sendStatus": {"order_id": f"bench-{self.posts}", "status": "placed"}})
+        return StubResponse({"ok": True})
+
+    def get(self, url, timeout=None):
+        return StubResponse({"result": "success"})
+
+
+class StubCollection:
+    def __init__(self):
+        self.count = 0
+
+    def create_index(self, keys, **options):
+        return "bench"
+
+    def insert_many(self, documents, ordered=True):
+        self.count += len(documents)
+
+
+class StubDatabase(dict):
+    def __missing__(self, name):
+        return self.setdefault(name, StubCollection())
+
+
+class StubMongoClient(dict):
+    """Remplace pymongo.MongoClient : client[db][collection] en mémoire."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+
+    def __missing__(self, name):
+        return self.setdefault(name, StubDatabase())
+
+
+class NullNotifier:
+    """Remplace TelegramNotifier : la file est simulée, rien ne part."""
+
+    def __init__(self):
+        self.messages = deque(maxlen=1000)
+
+    def send_message(self, message: str, parse_mode: str = "HTML"):
+        self.messages.append((time.monotonic(), message, parse_mode))
+
+
+class InlineStage:
+    """Étage d'exécution synchrone : le coût de l'ordre est mesuré dans le thread appelant."""
+
+    def put(self, job):
+        job()
+        return True
+
+
+_main = None
+
+
+def load_main():
+    """
+    Importe main.py avec Kraken et Telegram remplacés par des doublures ; MongoManager reste
+    le vrai (écriture différée) mais sur un client en mémoire.
+    """
+    global _main
+    if _main is None:
+        import db.mongo_manager
+        db.mongo_manager.MongoClient = StubMongoClient
+        import main
+        main.notifier.stop(timeout=0)
+        main.notifier = NullNotifier()
+        main.executor.session = StubSession()
+        main.execution = InlineStage()
+        _main = main
+    return _main
+
+
+# ---- Benchmarks ----
+
+def _ws_client(symbols):
+    from services.websocket_client import WebSocketClient
+    return WebSocketClient(symbols, lambda candle: None)
+
+
+def _on_message(rate: str, symbols):
+    def setup(scale: float):
+        stream = messages(symbols, RATES[rate], int(20_000 * scale))
+        client = _ws_client(symbols)
+
+        def run():
+            on_message = client.on_message
+            for message in stream:
+                on_message(None, message)
+        return run, len(stream)
+    return setup
+
+
+def _update_candle(rate: str, symbols):
+    def setup(scale: float):
+        ticks = [(t["price"], t["qty"], t["time"] // 1000, t["product_id"])
+                 for t in trades(symbols, RATES[rate], int(50_000 * scale))]
+        client = _ws_client(symbols)
+
+        def run():
+            update = client._update_candle
+            for price, qty, ts, symbol in ticks:
+                update(price, qty, ts, symbol)
+        return run, len(ticks)
+    return setup
+
+
+for _rate in RATES:
+    benchmark(f"ws.on_message[{_rate}]")(_on_message(_rate, SYMBOLS[:1]))
+    benchmark(f"ws.on_message[{_rate},3 symboles]")(_on_message(_rate, SYMBOLS))
+    benchmark(f"ws._update_candle[{_rate}]")(_update_candle(_rate, SYMBOLS[:1]))
+
+
+@benchmark("aggregator._to_heikin_ashi")
+def _heikin_ashi(scale: float):
+    from services.candle_aggregator import CandleAggregator
+    aggregator = CandleAggregator(SYMBOLS[0])
+    candles = [dict(c) for c in synthetic_candles(int(20_000 * scale))]
+    aggregator.candles.append(candles[0], candles[0])
+
+    def run():
+        to_heikin_ashi = aggregator._to_heikin_ashi
+        for candle in candles:
+            to_heikin_ashi(candle)
+    return run, len(candles)
+
+
+@benchmark("rollup.add[1m,5m,15m,1h]")
+def _rollup(scale: float):
+    from services.timeframes import TimeframeRollup
+    rollup = TimeframeRollup(SYMBOLS[0], 10, ("1m", "5m", "15m", "1h"))
+    candles = synthetic_candles(int(20_000 * scale))
+
+    def run():
+        add, flush = rollup.add, rollup.flush
+        for candle in candles:
+            add(candle)
+            flush(candle["timestamp"] + 10)
+    return run, len(candles)
+
+
+def _engine(history: int):
+    def setup(scale: float):
+        from services.candle_store import CandleStore
+        from strategy.decision_engine import DecisionEngine
+        candles = synthetic_candles(history + int(5_000 * scale))
+        store = CandleStore(max(history, 1))
+        for candle in candles[:history]:
+            store.append(candle, candle)
+        engine = DecisionEngine()
+        if history:
+            engine.load_history(store.window(history, kind="ha"))
+        live = candles[history:]
+
+        def run():
+            for candle in live:
+                engine.update(candle)
+                engine.decide()
+        return run, len(live)
+    return setup
+
+
+for _history in (0, 100, 1000, 5000):
+    benchmark(f"engine.update+decide[historique={_history}]")(_engine(_history))
+
+
+@benchmark("engine.update+decide[référence pandas]")
+def _pandas_engine(scale: float):
+    from strategy.parity import PandasDecisionEngine
+    candles = synthetic_candles(100 + int(300 * scale))
+    engine = PandasDecisionEngine()
+    for candle in candles[:100]:
+        engine.update(candle)
+    live = candles[100:]
+
+    def run():
+        for candle in live:
+            engine.update(candle)
+            engine.decide()
+    return run, len(live)
+
+
+@benchmark("strategies.update+evaluate[live + fantômes]")
+def _strategies(scale: float):
+    from strategy.registry import StrategySet
+    strategies = StrategySet(SYMBOLS[0])
+    candles = synthetic_candles(100 + int(20_000 * scale))
+    for candle in candles[:100]:
+        strategies.update(candle)
+    live = candles[100:]
+
+    def run():
+        update, evaluate, decide = strategies.update, strategies.evaluate, strategies.live.decide
+        for candle in live:
+            update(candle)
+            evaluate(candle, decide()[0])
+    return run, len(live)
+
+
+def _book(depth: int = 500):
+    from services.order_book import OrderBook
+    book = OrderBook(SYMBOLS[0])
+    book.apply_snapshot([{"price": 2500 - i * 0.05, "qty": 0.5} for i in range(depth)],
+                        [{"price": 2500.05 + i * 0.05, "qty": 0.5} for i in range(depth)], seq=0)
+    return book
+
+
+@benchmark("book.apply_delta[1000 niveaux]")
+def _book_delta(scale: float):
+    import random
+    book = _book()
+    rng = random.Random(7)
+    n = int(100_000 * scale)
+    # Niveaux proches du meilleur prix, retirés une fois sur quatre
+    deltas = [("buy" if rng.random() < 0.5 else "sell", round(2500 + rng.uniform(-5, 5), 2),
+               0.0 if rng.random() < 0.25 else round(rng.random(), 3)) for _ in range(n)]
+
+    def run():
+        apply_delta = book.apply_delta
+        seq = book.seq
+        for side, price, qty in deltas:
+            seq += 1
+            apply_delta(side, price, qty, seq)
+    return run, n
+
+
+@benchmark("executor.plan_entry")
+def _plan_entry(scale: float):
+    from trading.order_executor import OrderExecutor
+    book = _book()
+    executor = OrderExecutor(books={SYMBOLS[0]: book})
+    n = int(20_000 * scale)
+
+    def run():
+        plan_entry, apply_delta = executor.plan_entry, book.apply_delta
+        seq = book.seq
+        for i in range(n):
+            seq += 1
+            apply_delta("sell", 2500.05, 0.5 + (i & 1) * 0.1, seq)  # Invalide le cache du prix attendu
+            plan_entry(SYMBOLS[0], "buy", 0.02)
+    return run, n
+
+
+@benchmark("exits.on_tick[position ouverte]")
+def _exit_ticks(scale: float):
+    """Coût par trade de la surveillance des sorties, position ouverte (niveaux jamais atteints)."""
+    from trading.exit_engine import ExitEngine
+    exits = ExitEngine(tp_pct=50, sl_pct=50, min_gain=50, trail_pct=0)
+    exits.arm({"symbol": SYMBOLS[0], "side": "long", "entry_price": 2500.0})
+    stream = [(t["product_id"], t["price"], t["time"]) for t in trades(SYMBOLS[0], RATES["realistic"],
+                                                                         int(50_000 * scale))]
+
+    def run():
+        on_tick = exits.on_tick
+        for symbol, price, time_ms in stream:
+            on_tick(symbol, price, time_ms, 0)
+    return run, len(stream)
+
+
+@benchmark("paper.on_tick[TP/SL résidents]")
+def _paper_ticks(scale: float):
+    """Coût par trade du paper trading, position ouverte avec TP / SL résidents jamais atteints."""
+    from trading.paper_executor import PaperExecutor
+    paper = PaperExecutor(latency_ms=0)
+    stream = [(t["product_id"], t["price"], t["time"]) for t in trades(SYMBOLS[0], RATES["realistic"],
+                                                                         int(50_000 * scale))]
+    paper.on_tick(*stream[0])
+    paper.open_with_tp_sl(SYMBOLS[0], "buy", 0.02, stream[0][1] * 1.5, stream[0][1] * 0.5)
+    paper.on_tick(*stream[1])
+
+    def run():
+        on_tick = paper.on_tick
+        for symbol, price, time_ms in stream:
+            on_tick(symbol, price, time_ms)
+    return run, len(stream)
+
+
+@benchmark("executor._get_auth_headers")
+def _auth_headers(scale: float):
+    from trading.order_executor import OrderExecutor
+    executor = OrderExecutor()
+    entry = executor._market(SYMBOLS[0], "buy", 0.02)
+    take_profit, stop_loss = executor._tp_sl(SYMBOLS[0], "buy", 0.02, 2510.0, 2490.0)
+    payload = {"batchOrder": [dict(o, order="send", order_tag=t)
+                              for t, o in (("entry", entry), ("tp", take_profit), ("sl", stop_loss))]}
+    n = int(20_000 * scale)
+
+    def run():
+        sign = executor._get_auth_headers
+        for _ in range(n):
+            sign(payload)
+    return run, n
+
+
+@benchmark("main.on_new_candle[I/O simulées]")
+def _on_new_candle(scale: float):
+    from strategy.multi_symbol import SymbolContext
+    main = load_main()
+    from memory.position_manager import PositionManager
+    ctx = SymbolContext(SYMBOLS[0], position_manager=PositionManager())  # En mémoire : pas de journal disque
+    candles = synthetic_candles(int(5_000 * scale))
+
+    def run():
+        on_new_candle = main.on_new_candle
+        for candle in candles:
+            on_new_candle(ctx, candle)
+    return run, len(candles)
+
+
+def _bench_logger(name: str, handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(name)s | %(message)s'))
+    return logger
+
+
+def _log_candles(n: int) -> list:
+    return [dict(c, symbol=SYMBOLS[0]) for c in synthetic_candles(n)]
+
+
+@benchmark("log.info[f-string, fichier synchrone]")
+def _log_sync(scale: float):
+    """Référence : ancien setup_logger (formatage et écriture dans le thread appelant)."""
+    import tempfile
+    from logging.handlers import RotatingFileHandler
+    path = os.path.join(tempfile.mkdtemp(), "bench.log")
+    logger = _bench_logger("BenchSync", RotatingFileHandler(path, maxBytes=1_000_000, backupCount=1))
+    candles = _log_candles(int(5_000 * scale))
+
+    def run():
+        disabled = logging.root.manager.disable
+        logging.disable(logging.NOTSET)
+        for candle in candles:
+            logger.info(f"[WS] Bougie finalisée : {candle}")
+        logging.disable(disabled)
+    return run, len(candles)
+
+
+@benchmark("log.info[file asynchrone, formatage différé]")
+def _log_async(scale: float):
+    """
+    Coût côté appelant seul : création de l'enregistrement et dépôt dans la file. Le thread
+    d'écriture n'est pas démarré (sur 1 CPU il prendrait du temps d'horloge, pas du temps appelant).
+    """
+    import queue
+    from utils.logger import _AsyncHandler, _no_caller
+    candles = _log_candles(int(5_000 * scale))
+    logger = _bench_logger("BenchAsync", _AsyncHandler(queue.SimpleQueue(), maxsize=len(candles)))
+    logger.findCaller = _no_caller  # Comme setup_logger
+
+    def run():
+        disabled = logging.root.manager.disable
+        logging.disable(logging.NOTSET)
+        for candle in candles:
+            logger.info("[WS] Bougie finalisée : %s", candle)
+        logging.disable(disabled)
+    return run, len(candles)
+
+
+# ---- Exécution ----
+
+def measure(setup, repeat: int, scale: float) -> dict:
+    samples = []
+    for _ in range(repeat):
+        run, ops = setup(scale)
+        gc.collect()
+        start = time.perf_counter_ns()
+        run()
+        samples.append((time.perf_counter_ns() - start) / ops)
+    median = statistics.median(samples)
+    return {"ns_per_op": median, "best_ns_per_op": min(samples), "ops_per_sec": 1e9 / median, "ops": ops}
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(path: str, results: dict, args):
+    data = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "repeat": args.repeat,
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne des chemins critiques")
+    parser.add_argument("--filter", default="", help="Sous-chaîne du nom des benchmarks à exécuter")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplie la taille des flux synthétiques")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Enregistre les résultats comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Ralentissement toléré (0.25 = +25%%)")
+    parser.add_argument("--check", action="store_true", help="Code retour 1 en cas de régression")
+    parser.add_argument("--logging", action="store_true", help="Conserve les logs INFO (désactivés par défaut)")
+    args = parser.parse_args()
+
+    if not args.logging:
+        logging.disable(logging.INFO)
+
+    baseline = load_baseline(args.baseline)
+    results, regressions = {}, []
+    print(f"{'benchmark':<44} {'ns/op':>12} {'ops/s':>14} {'référence':>12} {'écart':>9}")
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(setup, args.repeat, args.scale)
+        line = f"{name:<44} {result['ns_per_op']:>12,.0f} {result['ops_per_sec']:>14,.0f}"
+        reference = baseline.get(name)
+        if reference:
+            delta = result["ns_per_op"] / reference["ns_per_op"] - 1
+            flag = ""
+            if delta > args.tolerance:
+                regressions.append(name)
+                flag = " ⚠️"
+            line += f" {reference['ns_per_op']:>12,.0f} {delta:>+8.0%}{flag}"
+        print(line, flush=True)
+
+    if args.save:
+        if args.filter and baseline:
+            # Mise à jour partielle : on garde les références des benchmarks non exécutés
+            results = dict(baseline, **results)
+        save_baseline(args.baseline, results, args)
+        print(f"\nRéférence enregistrée dans {args.baseline}")
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} régression(s) au-delà de +{args.tolerance:.0%} : {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
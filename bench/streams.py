@@ -0,0 +1,58 @@
+"""
+Flux de ticks synthétiques au format des messages WebSocket Kraken Futures.
+
+Déterministes (graine fixe) : deux exécutions produisent exactement les mêmes messages.
+"""
+import json
+import random
+import uuid
+
+# Débits par symbole (trades/s) : marché normal et rafale (liquidation, annonce)
+RATES = {"realistic": 20, "burst": 5000}
+START_MS = 1_748_900_000_000
+
+
+def trades(symbols, rate_per_sec: float, count: int, seed: int = 42, start_ms: int = START_MS,
+           start_price: float = 2500.0):
+    """Génère `count` trades (dicts du flux `trade`) répartis en tourniquet sur les symboles."""
+    rng = random.Random(seed)
+    symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+    prices = {symbol: start_price * (1 + i) for i, symbol in enumerate(symbols)}
+    step_ms = 1000 / (rate_per_sec * len(symbols))
+    out = []
+    for i in range(count):
+        symbol = symbols[i % len(symbols)]
+        price = prices[symbol] = round(prices[symbol] * (1 + rng.gauss(0, 0.0002)), 2)
+        out.append({
+            "feed": "trade",
+            "product_id": symbol,
+            "uid": str(uuid.UUID(int=rng.getrandbits(128))),
+            "side": "buy" if rng.random() < 0.5 else "sell",
+            "type": "fill",
+            "seq": i,
+            "time": start_ms + int(i * step_ms),
+            "qty": round(rng.expovariate(2), 3),
+            "price": price,
+        })
+    return out
+
+
+def messages(symbols, rate_per_sec: float, count: int, seed: int = 42, snapshot_size: int = 100):
+    """
+    Messages JSON déjà sérialisés (le coût d'encodage n'est pas mesuré) : un trade_snapshot
+    par symbole en tête (comme à l'abonnement), puis un message `trade` par trade,
+    entrecoupés d'un heartbeat toutes les 100 messages.
+    """
+    symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+    history = trades(symbols, rate_per_sec, snapshot_size * len(symbols), seed=seed + 1,
+                     start_ms=START_MS - 60_000)
+    out = []
+    for symbol in symbols:
+        snapshot = [dict(t, feed=None) for t in history if t["product_id"] == symbol][::-1]
+        out.append(json.dumps({"feed": "trade_snapshot", "product_id": symbol, "trades": snapshot},
+                              separators=(",", ":")))
+    for i, trade in enumerate(trades(symbols, rate_per_sec, count, seed=seed)):
+        if i % 100 == 99:
+            out.append(json.dumps({"feed": "heartbeat", "time": trade["time"]}, separators=(",", ":")))
+        out.append(json.dumps(trade, separators=(",", ":")))
+    return out
@@ -13,11 +13,17 @@ if KRAKEN_API_KEY is None:
 KRAKEN_API_SECRET = os.getenv("KRAKEN_API_SECRET")
 if KRAKEN_API_SECRET is None:
     raise ValueError("KRAKEN_API_SECRET est requis", "")
-BASE_URL = "https://futures.kraken.com/derivatives/api/v3"
+# Points d'accès (surchargeables pour viser le simulateur local : python -m simulator.kraken_futures)
+BASE_URL = os.getenv("KRAKEN_REST_URL", "https://futures.kraken.com/derivatives/api/v3")
+WS_URL = os.getenv("KRAKEN_WS_URL", "wss://futures.kraken.com/ws/v1")
+ORDER_TIMEOUT_SEC = (3.05, 5)  # Timeouts (connexion, lecture) des requêtes d'ordres
+ORDER_KEEPALIVE_SEC = 30       # Ping périodique pour garder la connexion REST ouverte
 
 
 # ⚙️ Paramètres de trading
 SYMBOL = "PF_ETHUSD"
+# Symboles tradés sur la même connexion WebSocket (ex. SYMBOLS=PF_ETHUSD,PF_XBTUSD)
+SYMBOLS = [s.strip() for s in os.getenv("SYMBOLS", SYMBOL).split(",") if s.strip()]
 LEVERAGE = 10
 TRADE_CAPITAL_RATIO = 0.3      # Utiliser 30 % du capital dispo
 MAX_CAPITAL_RATIO = 0.6        # Ne jamais dépasser 60 %
@@ -25,16 +31,83 @@ MIN_USDC_BALANCE = 10          # Alerte si balance < 10 USDC
 MIN_ORDER_SIZE = 0.01          # Taille minimale des ordres (à ajuster selon contrat)
 
 # 📊 Websocket / Data
-TIMEFRAME = "1m"
+TIMEFRAME = "1m"               # Timeframe supérieur suivi par main.py (bougies agrégées)
+# Timeframes dérivés des bougies de base clôturées (chacun multiple du précédent)
+TIMEFRAMES = [tf.strip() for tf in os.getenv("TIMEFRAMES", "1m,5m,15m,1h").split(",") if tf.strip()]
 OHLC_INTERVAL_SEC = 10         # Intervalle entre deux bougies
+# Marge après la fin d'un intervalle (horloge Kraken) avant sa clôture, pour les trades en retard
+CANDLE_GRACE_SEC = float(os.getenv("CANDLE_GRACE_SEC", "0.5"))
 USE_HEIKIN_ASHI = True
+CANDLE_HISTORY_SIZE = 5000     # Bougies conservées en mémoire (ring buffer)
+WS_JSON_BACKEND = os.getenv("WS_JSON_BACKEND", "auto")  # auto | orjson | json
+# Reconnexion : attente aléatoire dans [0, min(max, min x 2^tentative)] (full jitter), remise à zéro à l'ouverture
+WS_RECONNECT_MIN_SEC = float(os.getenv("WS_RECONNECT_MIN_SEC", "0.05"))
+WS_RECONNECT_MAX_SEC = float(os.getenv("WS_RECONNECT_MAX_SEC", "30"))
+WS_PING_SEC = 20               # Ping WebSocket : connexion morte détectée sans attendre le TCP
+WS_RESUME_TIMEOUT_SEC = 2.0    # Clôtures suspendues après réabonnement tant que le snapshot n'est pas reçu
+WS_DEDUP_SIZE = 5000           # Trades (uid) mémorisés par symbole pour écarter les doublons des snapshots
+# Flux privés authentifiés (fills, open_orders, open_positions, balances) : état du compte en mémoire
+PRIVATE_FEEDS = os.getenv("PRIVATE_FEEDS", "true").lower() in ("true", "1", "yes")
+ACCOUNT_FILL_HISTORY = 1000    # Exécutions (fills) conservées en mémoire
+# Position disparue sans exécution connue de son TP / SL (flux non ordonnés) : attente avant clôture "kraken"
+ACCOUNT_CLOSE_GRACE_SEC = float(os.getenv("ACCOUNT_CLOSE_GRACE_SEC", "5"))
+TICK_RECORD_DIR = os.getenv("TICK_RECORD_DIR")  # Enregistrement binaire des ticks (désactivé si vide)
+# Démarrage à chaud : bougies de base rechargées avant l'abonnement au flux live (0 = désactivé)
+BACKFILL_CANDLES = int(os.getenv("BACKFILL_CANDLES", "200"))
+# Sources, de la plus fidèle à la moins fidèle : ticks enregistrés, historique REST Kraken, MongoDB
+BACKFILL_SOURCES = [s.strip() for s in os.getenv("BACKFILL_SOURCES", "recorder,kraken,mongo").split(",") if s.strip()]
+BACKFILL_MAX_PAGES = 50        # Pages de 100 trades max par symbole via l'historique REST
 TP_PCT = os.getenv("TP_PCT", "0.5")  # Take Profit en pourcentage 
 SL_PCT = os.getenv("SL_PCT", "0.5")  # Stop Loss en pourcentage
+MIN_GAIN_POUR_CLOTURE = 0.5    # Clôture dès que le gain atteint ce %
+# Stop suiveur surveillé au tick : clôture si le prix recule de ce % depuis le meilleur prix (0 = désactivé)
+TRAILING_STOP_PCT = float(os.getenv("TRAILING_STOP_PCT", "0"))
+ORDER_SIZE = 0.02              # À adapter à ta gestion du risque
+# Carnet d'ordres local (flux book) : entrée au marché ou limite IOC, taille plafonnée à la liquidité
+USE_ORDER_BOOK = os.getenv("USE_ORDER_BOOK", "true").lower() in ("true", "1", "yes")
+MAX_SLIPPAGE_PCT = 0.05        # Écart max (%) entre prix moyen attendu et meilleur prix pour un ordre au marché
+
+# 🧪 Stratégies : paramètres de DecisionEngine par nom. Une seule est live, les autres
+# tournent en fantôme (paper trading, PnL virtuel) sur les mêmes bougies et indicateurs.
+STRATEGIES = {
+    "ha_rsi": {},                                      # Scoreur HA + RSI historique
+    "ha_rsi_strict": {"score_threshold": 70},
+    "ha_rsi_wide": {"rsi_low": 30, "rsi_high": 70},
+    "ha_trend": {"weights": {"trend": 40, "rsi": 20, "body": 20, "volume": 10}},
+    "ha_rsi_wilder": {"rsi_mode": "wilder"},
+}
+LIVE_STRATEGY = os.getenv("LIVE_STRATEGY", "ha_rsi")
+# Stratégies fantômes (par défaut : toutes les autres, SHADOW_STRATEGIES= vide pour aucune)
+SHADOW_STRATEGIES = [
+    s.strip() for s in os.getenv("SHADOW_STRATEGIES", ",".join(n for n in STRATEGIES if n != LIVE_STRATEGY)).split(",")
+    if s.strip() and s.strip() != LIVE_STRATEGY
+]
+
+# 📄 Paper trading : ordres simulés (PaperExecutor) exécutés sur le flux live, aucun envoi à Kraken.
+# Journal des positions et collections MongoDB séparés du live : la réconciliation au démarrage
+# (sur le compte virtuel) ne touche jamais les positions réelles, ni les trades live en base
+DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() in ("true", "1", "yes")
+PAPER_LATENCY_MS = float(os.getenv("PAPER_LATENCY_MS", "50"))  # Envoi -> exécution (horloge des trades)
+PAPER_FEE_PCT = float(os.getenv("PAPER_FEE_PCT", "0.05"))      # Frais taker par exécution (% du notionnel)
+PAPER_BALANCE = float(os.getenv("PAPER_BALANCE", "10000"))     # Solde virtuel initial (USD)
+
+# 📒 Positions (journal local, rejoué au démarrage puis réconcilié avec Kraken)
+POSITION_JOURNAL_DIR = os.getenv("POSITION_JOURNAL_DIR", "data/paper_positions" if DEBUG_MODE else "data/positions")
+POSITION_JOURNAL_COMPACT_EVERY = 1000  # Compaction après N enregistrements
+LEGACY_POSITION_FILE = "position.json"  # Ancien format, importé une fois s'il existe
 
 # 💾 MongoDB
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB = "kraken_bot"
-TRADE_COLLECTION = "trades"
+COLLECTION_PREFIX = "paper_" if DEBUG_MODE else ""  # Paper trading : paper_trades, paper_candles...
+TRADE_COLLECTION = f"{COLLECTION_PREFIX}trades"
+CANDLE_COLLECTION = f"{COLLECTION_PREFIX}candles"
+DECISION_COLLECTION = f"{COLLECTION_PREFIX}decisions"
+SHADOW_TRADE_COLLECTION = f"{COLLECTION_PREFIX}shadow_trades"  # Trades virtuels des stratégies fantômes
+MONGO_BATCH_SIZE = 500         # Insertion dès que N documents sont en attente
+MONGO_FLUSH_SEC = 2            # ... ou au plus tard toutes les N secondes
+MONGO_BUFFER_MAX = 100_000     # Documents en attente max par collection
+MONGO_SPOOL_DIR = os.getenv("MONGO_SPOOL_DIR", "data/mongo_spool")  # Secours disque si MongoDB indisponible
 
 # 📩 Telegram
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -43,9 +116,19 @@ if TELEGRAM_TOKEN is None:
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 if TELEGRAM_CHAT_ID is None:
     raise ValueError("TELEGRAM_CHAT_ID est requis")
+TELEGRAM_QUEUE_SIZE = 500      # Messages en attente max (au-delà : ignorés)
+TELEGRAM_RATE_PER_SEC = 1      # Débit max par chat (limite Telegram ~1 msg/s)
+TELEGRAM_BURST = 3             # Messages envoyables d'affilée avant limitation
+TELEGRAM_COALESCE_SEC = 0.5    # Fenêtre de regroupement des rafales en un récapitulatif
+TELEGRAM_TIMEOUT_SEC = 5
 
 # ⏱ Fréquence des boucles principales
 LOOP_INTERVAL_SEC = 15
+STRATEGY_WORKERS = int(os.getenv("STRATEGY_WORKERS", "4"))  # Threads d'évaluation de la stratégie
+STATS_INTERVAL_SEC = 60        # Fréquence du résumé des latences par symbole
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # Endpoint Prometheus local (0 = désactivé)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
 
-
-DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() in ("true", "1", "yes")
+# 📦 Pipeline (files bornées entre étages)
+CANDLE_QUEUE_SIZE = 0             # WebSocket -> stratégie (0 : non bornée, aucune bougie perdue)
+EXECUTION_QUEUE_SIZE = 1_000      # Stratégie -> ordres (bloquant : backpressure)
@@ -1,36 +1,201 @@
 # db/mongo_manager.py
 
-from pymongo import MongoClient
-from config import MONGO_URI, MONGO_DB, TRADE_COLLECTION
+import json
+import os
+import threading
+import time
+from collections import deque
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from config import (
+    MONGO_URI, MONGO_DB, TRADE_COLLECTION, CANDLE_COLLECTION, DECISION_COLLECTION, SHADOW_TRADE_COLLECTION,
+    MONGO_BATCH_SIZE, MONGO_FLUSH_SEC, MONGO_BUFFER_MAX, MONGO_SPOOL_DIR,
+)
 from utils.logger import setup_logger
+from utils.metrics import metrics
 
 logger = setup_logger("MongoDB")
 
+DUPLICATE_KEY = 11000
+
+# Index nécessaires aux requêtes de lecture (tri par timestamp sur un symbole)
+INDEXES = {
+    TRADE_COLLECTION: [([("symbol", ASCENDING), ("timestamp", DESCENDING)], {})],
+    CANDLE_COLLECTION: [([("symbol", ASCENDING), ("timestamp", DESCENDING)], {"unique": True})],
+    DECISION_COLLECTION: [([("symbol", ASCENDING), ("timestamp", DESCENDING)], {})],
+    SHADOW_TRADE_COLLECTION: [([("strategy", ASCENDING), ("symbol", ASCENDING), ("timestamp", DESCENDING)], {})],
+}
+
+
 class MongoManager:
-    def __init__(self):
+    """
+    Persistance MongoDB en écriture différée : `save_*` empile le document en mémoire,
+    un thread dédié l'insère par lots (`insert_many`) dès que MONGO_BATCH_SIZE documents
+    sont en attente ou toutes les MONGO_FLUSH_SEC secondes. Si MongoDB est indisponible,
+    les lots sont écrits en JSON lines dans MONGO_SPOOL_DIR puis rejoués au retour de la base.
+    """
+
+    def __init__(self, client=None, batch_size: int = MONGO_BATCH_SIZE, flush_sec: float = MONGO_FLUSH_SEC,
+                 buffer_max: int = MONGO_BUFFER_MAX, spool_dir: str = MONGO_SPOOL_DIR):
         try:
-            self.client = MongoClient(MONGO_URI)
+            # client injectable (ex. mongomock.MongoClient()) pour les tests
+            self.client = client or MongoClient(MONGO_URI, serverSelectionTimeoutMS=3000)
             self.db = self.client[MONGO_DB]
             self.collection = self.db[TRADE_COLLECTION]
             logger.info("Connexion à MongoDB établie.")
         except Exception as e:
-            logger.error(f"Erreur de connexion MongoDB : {e}")
+            logger.error("Erreur de connexion MongoDB : %s", e)
             raise
 
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.spool_dir = spool_dir
+        self.buffers = {name: deque() for name in INDEXES}
+        self.buffer_max = buffer_max
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.written = 0
+        self.spooled = 0
+        self.dropped = 0
+        self.indexed = False  # Index créés par le thread d'écriture (jamais au démarrage : base peut-être absente)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="mongo-writer", daemon=True)
+        self.thread.start()
+
+    def ensure_indexes(self) -> bool:
+        """Crée les index manquants. S'arrête au premier échec (base indisponible) : réessayé au cycle suivant."""
+        for name, indexes in INDEXES.items():
+            for keys, options in indexes:
+                try:
+                    self.db[name].create_index(keys, **options)
+                except Exception as e:
+                    logger.warning("Création d'index impossible sur %s : %s", name, e)
+                    return False
+        return True
+
+    # ---- Écriture différée ----
+
+    def _enqueue(self, collection: str, document: dict):
+        with self.lock:
+            buffer = self.buffers[collection]
+            if len(buffer) >= self.buffer_max:
+                buffer.popleft()
+                self.dropped += 1
+            buffer.append(document)
+            full = len(buffer) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
     def save_trade(self, trade_data: dict):
-        """Enregistre un trade dans la base de données."""
+        """Enregistre un trade dans la base de données (asynchrone)."""
+        self._enqueue(TRADE_COLLECTION, dict(trade_data))
+
+    def save_candle(self, candle: dict):
+        """Enregistre une bougie finalisée (asynchrone)."""
+        self._enqueue(CANDLE_COLLECTION, dict(candle))
+
+    def save_decision(self, decision: dict):
+        """Enregistre une décision de la stratégie (action, score, indicateurs) (asynchrone)."""
+        self._enqueue(DECISION_COLLECTION, dict(decision))
+
+    def save_shadow_trade(self, trade: dict):
+        """Enregistre un trade virtuel d'une stratégie (paper trading) (asynchrone)."""
+        self._enqueue(SHADOW_TRADE_COLLECTION, dict(trade))
+
+    def flush(self):
+        """Insère immédiatement tout ce qui est en attente."""
+        for name in self.buffers:
+            with self.lock:
+                batch = list(self.buffers[name])
+                self.buffers[name].clear()
+            if batch:
+                self._insert(name, batch)
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        self.thread.join(timeout=10)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self.lock:
+            pending = sum(len(buffer) for buffer in self.buffers.values())
+        return {"pending": pending, "written": self.written, "spooled": self.spooled, "dropped": self.dropped}
+
+    def _run(self):
+        while self.running:
+            if not self.indexed:
+                self.indexed = self.ensure_indexes()
+            self.wakeup.wait(timeout=self.flush_sec)
+            self.wakeup.clear()
+            self.flush()
+            self._replay_spool()
+
+    def _insert(self, collection: str, documents: list) -> bool:
+        start = time.perf_counter_ns()
+        try:
+            self.db[collection].insert_many(documents, ordered=False)
+            self.written += len(documents)
+            metrics.observe_since("mongo_write", collection, start)
+            return True
+        except BulkWriteError as e:
+            # Lot non ordonné : le reste est inséré. Doublons (ex. bougie rejouée depuis le spool)
+            # ignorés, seuls les documents en échec pour une autre raison sont mis au spool
+            self.written += e.details.get("nInserted", 0)
+            errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+            if not errors:
+                return True
+            logger.error("Erreur d'insertion %s (%s document(s)) : %s", collection, len(errors), errors[:1])
+            documents = [documents[err["index"]] for err in errors]
+        except Exception as e:
+            logger.error("MongoDB indisponible (%s) : %s", collection, e)
+        self._spool(collection, documents)
+        return False
+
+    # ---- Spool disque ----
+
+    def _spool_path(self, collection: str) -> str:
+        return os.path.join(self.spool_dir, f"{collection}.jsonl")
+
+    def _spool(self, collection: str, documents: list):
         try:
-            self.collection.insert_one(trade_data)
-            logger.debug(f"Trade enregistré : {trade_data}")
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with open(self._spool_path(collection), "a", encoding="utf-8") as f:
+                for document in documents:
+                    document = {k: v for k, v in document.items() if k != "_id"}
+                    f.write(json.dumps(document, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.spooled += len(documents)
         except Exception as e:
-            logger.error(f"Erreur lors de l'enregistrement du trade : {e}")
+            self.dropped += len(documents)
+            logger.error("Impossible d'écrire le spool %s : %s", collection, e)
+
+    def _replay_spool(self):
+        for collection in self.buffers:
+            path = self._spool_path(collection)
+            if not os.path.exists(path):
+                continue
+            replay_path = f"{path}.{int(time.time() * 1000)}.replay"
+            os.replace(path, replay_path)
+            with open(replay_path, encoding="utf-8") as f:
+                documents = [json.loads(line) for line in f if line.strip()]
+            if documents and not self._insert(collection, documents):
+                # Base toujours indisponible : les documents ont été ré-écrits dans le spool
+                os.remove(replay_path)
+                return
+            os.remove(replay_path)
+            logger.info("%s document(s) %s rejoué(s) depuis le spool.", len(documents), collection)
+
+    # ---- Lecture ----
 
     def get_all_trades(self):
         """Retourne tous les trades enregistrés."""
         try:
             return list(self.collection.find())
         except Exception as e:
-            logger.error(f"Erreur lors de la récupération des trades : {e}")
+            logger.error("Erreur lors de la récupération des trades : %s", e)
             return []
 
     def get_trades_by_symbol(self, symbol: str, limit: int = 100):
@@ -38,5 +203,23 @@ class MongoManager:
         try:
             return list(self.collection.find({"symbol": symbol}).sort("timestamp", -1).limit(limit))
         except Exception as e:
-            logger.error(f"Erreur lors de la récupération des trades pour {symbol} : {e}")
+            logger.error("Erreur lors de la récupération des trades pour %s : %s", symbol, e)
+            return []
+
+    def get_candles_by_symbol(self, symbol: str, limit: int = 500):
+        """Retourne les dernières bougies d'un symbole, de la plus ancienne à la plus récente."""
+        try:
+            candles = list(self.db[CANDLE_COLLECTION].find({"symbol": symbol}, {"_id": 0})
+                           .sort("timestamp", -1).limit(limit))
+            return candles[::-1]
+        except Exception as e:
+            logger.error("Erreur lors de la récupération des bougies pour %s : %s", symbol, e)
+            return []
+
+    def get_decisions_by_symbol(self, symbol: str, limit: int = 100):
+        """Retourne les dernières décisions pour un symbole donné."""
+        try:
+            return list(self.db[DECISION_COLLECTION].find({"symbol": symbol}).sort("timestamp", -1).limit(limit))
+        except Exception as e:
+            logger.error("Erreur lors de la récupération des décisions pour %s : %s", symbol, e)
             return []
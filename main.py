@@ -1,122 +1,467 @@
 from services.websocket_client import WebSocketClient
-from strategy.decision_engine import DecisionEngine
-from memory.position_manager import PositionManager
+from services.tick_recorder import TickRecorder
+from services.backfill import Backfill, KrakenTradeHistory
+from services.account_feed import AccountFeed, AccountState
+from strategy.multi_symbol import StrategyPool
+from services.pipeline import Stage, run_job, BLOCK
 from db.mongo_manager import MongoManager
 from telegram.notify import TelegramNotifier
-from trading.order_executor import OrderExecutor
-from config import SYMBOL, TP_PCT, SL_PCT
+from trading.order_executor import OrderExecutor, IOC_NOT_FILLED
+from trading.paper_executor import PaperExecutor
+from trading.exit_engine import ExitEngine
+from strategy.rules import pnl_percent, should_close, tp_sl_levels
+from utils.metrics import metrics, start_metrics_server, process_memory_bytes
+from utils.logger import setup_root_logger, stats as log_stats_counters
+from config import (
+    SYMBOLS, TP_PCT, SL_PCT, MIN_GAIN_POUR_CLOTURE, ORDER_SIZE, TICK_RECORD_DIR,
+    STRATEGY_WORKERS, STATS_INTERVAL_SEC, CANDLE_QUEUE_SIZE, EXECUTION_QUEUE_SIZE,
+    METRICS_PORT, METRICS_HOST, TIMEFRAME, BACKFILL_CANDLES, DEBUG_MODE, PRIVATE_FEEDS, MIN_USDC_BALANCE,
+    ACCOUNT_CLOSE_GRACE_SEC,
+)
 import logging
 import time
 
-# Logger global
-logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+# Logger global : même file asynchrone que les composants (console uniquement)
+setup_root_logger()
 
-# Composants
-engine = DecisionEngine()
-position_manager = PositionManager()
+# Composants partagés entre symboles
 mongo = MongoManager()
 notifier = TelegramNotifier()
-executor = OrderExecutor()
+# DEBUG_MODE : ordres simulés sur le flux live (paper trading), rien n'est envoyé à Kraken
+executor = PaperExecutor() if DEBUG_MODE else OrderExecutor()
+exits = ExitEngine()  # TP / SL / gain minimal / stop suiveur surveillés à chaque trade
+account = AccountState()  # Exécutions, ordres, positions et soldes Kraken (flux privés), lus sans REST
+unconfirmed = {}  # symbole -> (position, time.monotonic()) : soldée chez Kraken, exécution du TP / SL attendue
 
-# Paramètres de trade
-MIN_GAIN_POUR_CLOTURE = 0.5  # En %
-ORDER_SIZE = 0.02            # À adapter à ta gestion du risque
+# Le thread WebSocket et la stratégie ne font jamais d'I/O eux-mêmes : Telegram et MongoDB
+# écrivent en tâche de fond, les ordres passent par l'étage d'exécution.
+# Exécution : un seul worker FIFO -> les ordres d'un même symbole partent dans l'ordre des décisions.
+execution = Stage("Execution", run_job, maxsize=EXECUTION_QUEUE_SIZE, policy=BLOCK)
 
-def on_new_candle(candle: dict):
-    logging.info(f"📉 Nouvelle bougie : {candle}")
-    engine.update(candle)
-    action, score = engine.decide()
-    logging.info(f"🎯 Action : {action} | Score : {score}")
+def send_order(ctx, decided_ns: int, job, received_ns: int | None = None, stage: str = "candle_to_order"):
+    """
+    Ajoute un ordre à l'étage d'exécution en mesurant l'attente décision -> envoi et
+    réception -> envoi (`stage` : bougie par défaut, tick pour les sorties).
+    """
+    received_ns = ctx.received_ns if received_ns is None else received_ns
 
-    position = position_manager.get_position()
-    logging.info(f"[DEBUG] Position courante : {position}")
+    def timed():
+        metrics.observe_since("order_send", ctx.symbol, decided_ns)
+        metrics.observe_since(stage, ctx.symbol, received_ns)
+        return job()
+    execution.put(timed)
 
-    entry_price = candle["close"]
+def record_tp_sl(ctx, position: dict, acks: dict):
+    """
+    Accusés du lot d'entrée (exécution) : identifiants TP/SL enregistrés si la position locale n'a pas
+    changé entre-temps. Entrée refusée, expirée ou IOC non exécuté : voir cancel_entry.
+    """
+    entry, tp_ack, sl_ack = acks.get("entry"), acks.get("tp"), acks.get("sl")
+    tp_id = tp_ack["order_id"] if tp_ack and tp_ack["ok"] else None
+    sl_id = sl_ack["order_id"] if sl_ack and sl_ack["ok"] else None
+    if entry is not None and not entry["ok"]:
+        cancel_entry(ctx, position, entry, [i for i in (tp_id, sl_id) if i], acks.get("close"))
+        return
+    if not (tp_ack or sl_ack):
+        return
+    if ctx.position_manager.get_position() is position:
+        ctx.position_manager.set_tp_sl(tp_id, sl_id)
+    elif tp_id or sl_id:
+        # Position clôturée (ex. sortie au tick) pendant que le lot était en vol : TP/SL orphelins
+        logging.warning("⚠️ [%s] TP/SL acquittés après la clôture de leur position : annulation", ctx.symbol)
+        executor.cancel_orders([i for i in (tp_id, sl_id) if i])
+
+def cancel_entry(ctx, position: dict, entry: dict, resting: list, close: dict | None = None):
+    """
+    Entrée non exécutée chez Kraken : la position locale (ouverte avant l'envoi) est retirée sans
+    trade enregistré, sa surveillance au tick désarmée et les TP/SL acceptés du même lot annulés.
+    Retournement (`close`) : l'ancienne position a déjà été clôturée localement ; si la clôture
+    reduce-only est passée, le compte est à plat.
+    """
+    symbol = ctx.symbol
+    if resting:
+        executor.cancel_orders(resting)
+    if ctx.position_manager.get_position() is position:
+        exits.disarm(symbol, position)
+        ctx.position_manager.close_position()
+    if entry["status"] == IOC_NOT_FILLED:
+        # Limite IOC dépassée entre la décision et l'envoi : issue attendue d'une entrée sur carnet peu profond
+        reason = "IOC non exécuté, carnet déplacé"
+        logging.info("ℹ️ [%s] Entrée %s IOC non exécutée : position locale retirée, %d TP/SL annulé(s)", symbol,
+                     position["side"], len(resting))
+    else:
+        reason = entry["error"]
+        logging.warning("⚠️ [%s] Entrée %s non exécutée (%s) : position locale retirée, %d TP/SL annulé(s)", symbol,
+                        position["side"], reason, len(resting))
+    if close is not None and not close["ok"]:
+        logging.error("❌ [%s] Retournement : clôture refusée (%s), l'ancienne position %s reste ouverte chez Kraken "
+                      "sans TP/SL", symbol, close["error"], "long" if position["side"] == "short" else "short")
+    state = "à plat" if close is None or close["ok"] else "non retournée"
+    notifier.send_message(f"⚠️ *Entrée non exécutée* {symbol}\n{position['side'].upper()} : {reason}\n"
+                          f"Position {state}")
+
+def open_position(ctx, action: str, price: float, decided_ns: int, reverse_from=None):
+    """
+    Ouvre une position au marché selon le signal avec TP/SL dans le même lot d'ordres.
+    decided_ns : instant de la décision (time.perf_counter_ns), pour les métriques de latence.
+    reverse_from : position courante à retourner (clôture + ouverture en un seul aller-retour).
+    """
+    symbol = ctx.symbol
+    side = "long" if action == "buy" else "short"
+    # Taille et type d'ordre selon la liquidité du carnet local (marché ou limite IOC)
+    plan = executor.plan_entry(symbol, action, ORDER_SIZE)
+    size, limit_price = plan["size"], plan["limit_price"]
+    margin = account.available_margin()  # None tant que le flux balances n'a rien envoyé
+    if not size:
+        logging.warning("⚠️ [%s] Liquidité insuffisante dans le carnet : pas d'entrée %s", symbol, side)
+    elif margin is not None and margin < MIN_USDC_BALANCE:
+        logging.warning("⚠️ [%s] Marge disponible %.2f USD < %s : pas d'entrée %s", symbol, margin, MIN_USDC_BALANCE,
+                        side)
+        size = 0
+    if not size:
+        if reverse_from:
+            cancel_ids = (reverse_from.get("tp_id"), reverse_from.get("sl_id"))
+            send_order(ctx, decided_ns, lambda: executor.close_position(
+                symbol, reverse_from["side"], reverse_from["size"], cancel_ids
+            ))
+        return
+    tp, sl = tp_sl_levels(side, price, TP_PCT, SL_PCT)
+    ctx.position_manager.open_position(symbol, side, price, size)
+    position = ctx.position_manager.get_position()
+    exits.arm(position, tp, sl)
+    if reverse_from:
+        cancel_ids = (reverse_from.get("tp_id"), reverse_from.get("sl_id"))
+        send_order(ctx, decided_ns, lambda: record_tp_sl(ctx, position, executor.reverse_position(
+            symbol, reverse_from["side"], reverse_from["size"], action, size, tp, sl, cancel_ids, limit_price
+        )))
+    else:
+        send_order(ctx, decided_ns, lambda: record_tp_sl(
+            ctx, position, executor.open_with_tp_sl(symbol, action, size, tp, sl, limit_price)
+        ))
+    if side == "long":
+        message = f"💹 *Achat (LONG) ouvert* {symbol}\nPrix: {price}"
+    else:
+        message = f"🔻 *Vente (SHORT) ouverte* {symbol}\nPrix: {price}"
+    notifier.send_message(message)  # Non bloquant (file + thread dédié)
+
+def on_new_candle(ctx, candle: dict):
+    symbol = ctx.symbol
+    logging.info("📉 Nouvelle bougie : %s", candle)
+    start = time.perf_counter_ns()
+    ctx.strategies.update(candle)  # Indicateurs partagés par toutes les stratégies du symbole
+    metrics.observe_since("engine_update", symbol, start)
+    start = time.perf_counter_ns()
+    action, score = ctx.engine.decide()
+    decided_ns = time.perf_counter_ns()
+    metrics.observe("decide", symbol, (decided_ns - start) * 1e-9)
+    logging.info("🎯 [%s] Action : %s | Score : %s", symbol, action, score)
+    mongo.save_candle(candle)
+    mongo.save_decision({
+        "symbol": symbol,
+        "timestamp": candle["timestamp"],
+        "action": action,
+        "score": score,
+        "rsi": ctx.engine.compute_rsi(),
+        "close": candle["close"],
+        "strategy": ctx.strategies.live_name,
+    })
+
+    position = ctx.position_manager.get_position()
+    logging.debug("Position courante : %s", position)
+    # Dernier prix échangé (le close Heikin Ashi est une moyenne, jamais traitée à ce prix)
+    current_price = exits.last_price(symbol, candle["close"])
 
     if not position:
         # Ouverture position selon signal
-        if action == "buy":
-            executor.open_long_market(SYMBOL, ORDER_SIZE)
-            position_manager.open_position(SYMBOL, "long", entry_price, ORDER_SIZE)
-            notifier.send_message(f"💹 *Achat (LONG) ouvert* {SYMBOL}\nPrix: {entry_price}")
-            # Place TP/SL à l’ouverture
-            if TP_PCT and SL_PCT:
-                tp = entry_price * (1 + float(TP_PCT) / 100)
-                sl = entry_price * (1 - float(SL_PCT) / 100)
-                executor.place_tp_sl_orders("buy", ORDER_SIZE, tp, sl)
-        elif action == "sell":
-            executor.open_short_market(SYMBOL, ORDER_SIZE)
-            position_manager.open_position(SYMBOL, "short", entry_price, ORDER_SIZE)
-            notifier.send_message(f"🔻 *Vente (SHORT) ouverte* {SYMBOL}\nPrix: {entry_price}")
-            if TP_PCT and SL_PCT:
-                tp = entry_price * (1 + float(TP_PCT) / 100)
-                sl = entry_price * (1 - float(SL_PCT) / 100)
-                executor.place_tp_sl_orders("sell", ORDER_SIZE, tp, sl)
+        if action in ["buy", "sell"]:
+            open_position(ctx, action, current_price, decided_ns)
 
     else:
-        # Fermeture position si signal opposé ou gain suffisant
-        entry_price = position["entry_price"]
-        current_price = candle["close"]
+        # Fermeture position si signal opposé ou gain suffisant (le gain est aussi surveillé au tick)
         side = position["side"]
         size = position["size"]
 
         # Calcul du PnL
-        if side == "long":
-            pnl_pct = ((current_price - entry_price) / entry_price) * 100
-        elif side == "short":
-            pnl_pct = ((entry_price - current_price) / entry_price) * 100
+        pnl_pct = pnl_percent(side, position["entry_price"], current_price)
+
+        if should_close(side, action, pnl_pct, MIN_GAIN_POUR_CLOTURE):
+            reverse = action in ["buy", "sell"]
+            if not reverse:
+                cancel_ids = (position.get("tp_id"), position.get("sl_id"))
+                send_order(ctx, decided_ns, lambda: executor.close_position(symbol, side, size, cancel_ids))
+            record_close(ctx, position, current_price, candle["timestamp"], "signal" if reverse else "min_gain")
+            # Ouvre dans l'autre sens si signal fort (pas "hold") : un seul lot d'ordres
+            if reverse:
+                open_position(ctx, action, current_price, decided_ns, reverse_from=position)
+
+    return action  # Stratégies fantômes évaluées ensuite par le pool (evaluate_shadows), hors latence mesurée
+
+def record_close(ctx, position: dict, exit_price: float, timestamp: int, reason: str, **fields):
+    """Trade clôturé : MongoDB, Telegram, position locale (sans envoi d'ordre)."""
+    symbol, side = ctx.symbol, position["side"]
+    exits.disarm(symbol, position)
+    pnl_pct = pnl_percent(side, position["entry_price"], exit_price)
+    trade = {
+        "symbol": symbol,
+        "side": side,
+        "entry_price": position["entry_price"],
+        "exit_price": exit_price,
+        "pnl_percent": round(pnl_pct, 2),
+        "timestamp": timestamp,
+        "reason": reason,
+        **fields,
+    }
+    message = f"📊 *Trade clôturé* {symbol}\nType: {side.upper()}\nPnL: *{pnl_pct:.2f}%* ✅"
+    mongo.save_trade(trade)
+    notifier.send_message(message)  # Non bloquant (file + thread dédié)
+    ctx.position_manager.close_position()
+
+def close_on_exit(ctx, event: dict):
+    """
+    Niveau de sortie franchi au tick (file du symbole, jamais en parallèle d'une décision).
+    TP / SL : l'ordre résident Kraken s'exécute, on annule l'autre. Gain minimal / stop
+    suiveur, ou TP / SL sans ordre résident connu (accusé en vol ou en échec, position reprise
+    sans ordres) : clôture au marché et annulation de ceux qui existent.
+    """
+    position = ctx.position_manager.get_position()
+    if position is not event["position"]:
+        return  # Déjà clôturée ou retournée par la stratégie
+    symbol, reason = ctx.symbol, event["reason"]
+    tp_id, sl_id = position.get("tp_id"), position.get("sl_id")
+    decided_ns = time.perf_counter_ns()
+    if reason in ("tp", "sl") and (tp_id if reason == "tp" else sl_id):
+        sibling = sl_id if reason == "tp" else tp_id
+        if sibling:
+            send_order(ctx, decided_ns, lambda: executor.cancel_orders([sibling]),
+                       event["received_ns"], "tick_to_order")
+    else:
+        side, size = position["side"], position["size"]
+        send_order(ctx, decided_ns, lambda: executor.close_position(symbol, side, size, (tp_id, sl_id)),
+                   event["received_ns"], "tick_to_order")
+    record_close(ctx, position, event["price"], event["time_ms"] // 1000, reason,
+                 high=event["high"], low=event["low"], trigger_delay_ms=round(event["delay_ms"], 1))
+
+def sync_account(ctx):
+    """
+    Position ou exécution Kraken reçue par les flux privés (file du symbole) : prix d'exécution
+    et taille réels de la position locale, ou clôture si un TP / SL l'a déjà soldée chez Kraken.
+    Une position n'est considérée soldée qu'après avoir été vue exécutée (`filled`) : l'ordre
+    d'entrée encore en vol ou un retournement en cours ne la clôturent pas.
+    Les flux `fills` et `open_positions` ne sont pas ordonnés entre eux : une position disparue
+    sans exécution connue de son TP / SL attend cette exécution jusqu'à ACCOUNT_CLOSE_GRACE_SEC
+    avant d'être clôturée comme soldée par Kraken (liquidation, clôture manuelle).
+    """
+    symbol = ctx.symbol
+    position = ctx.position_manager.get_position()
+    closing = unconfirmed.pop(symbol, None)
+    if position is None:
+        return
+    exchange = account.position(symbol)
+    if exchange and exchange["side"] == position["side"]:
+        if position.get("filled") and (exchange["price"], exchange["size"]) == (position["entry_price"], position["size"]):
+            return
+        logging.info("✅ [%s] Exécution confirmée : %s %s @ %s (prix de décision %s)", symbol, position["side"],
+                     exchange["size"], exchange["price"], position["entry_price"])
+        ctx.position_manager.set_fill(exchange["price"], exchange["size"])
+        watch = exits.watches.get(symbol)
+        if watch is not None and watch.position is position:
+            exits.arm(position, watch.tp, watch.sl)  # Gain minimal / stop suiveur sur le prix réel
+    elif exchange is None and position.get("filled"):
+        tp_id, sl_id = position.get("tp_id"), position.get("sl_id")
+        reason = "tp" if tp_id and account.fill(tp_id) else "sl" if sl_id and account.fill(sl_id) else "kraken"
+        if reason == "kraken":
+            since = closing[1] if closing and closing[0] is position else time.monotonic()
+            if time.monotonic() - since < ACCOUNT_CLOSE_GRACE_SEC:
+                unconfirmed[symbol] = (position, since)  # Revu à l'exécution du TP / SL ou à l'échéance
+                return
+            # Dernière exécution du symbole retenue seulement si elle réduit la position (pas l'entrée)
+            fill = account.last_fill(symbol)
+            if fill and fill["side"] == ("sell" if position["side"] == "long" else "buy"):
+                exit_price = fill["price"]
+            else:
+                exit_price = exits.last_price(symbol, position["entry_price"])
         else:
-            pnl_pct = 0
-
-        must_close = False
-        if side == "long" and action == "sell":
-            must_close = True
-        elif side == "short" and action == "buy":
-            must_close = True
-        elif pnl_pct >= MIN_GAIN_POUR_CLOTURE:
-            must_close = True
-
-        if must_close:
-            executor.close_position_market(SYMBOL, side, size)
-            mongo.save_trade({
-                "symbol": SYMBOL,
-                "side": side,
-                "entry_price": entry_price,
-                "exit_price": current_price,
-                "pnl_percent": round(pnl_pct, 2),
-                "timestamp": candle["timestamp"]
-            })
-            notifier.send_message(
-                f"📊 *Trade clôturé* {SYMBOL}\nType: {side.upper()}\nPnL: *{pnl_pct:.2f}%* ✅"
-            )
-            position_manager.close_position()
-            # Ouvre dans l'autre sens si signal fort (pas "hold")
-            if action in ["buy", "sell"]:
-                time.sleep(1)  # petite pause pour éviter le double-trigger
-                if action == "buy":
-                    executor.open_long_market(SYMBOL, ORDER_SIZE)
-                    position_manager.open_position(SYMBOL, "long", current_price, ORDER_SIZE)
-                    notifier.send_message(f"💹 *Achat (LONG) ouvert* {SYMBOL}\nPrix: {current_price}")
-                    if TP_PCT and SL_PCT:
-                        tp = current_price * (1 + float(TP_PCT) / 100)
-                        sl = current_price * (1 - float(SL_PCT) / 100)
-                        executor.place_tp_sl_orders("buy", ORDER_SIZE, tp, sl)
-                elif action == "sell":
-                    executor.open_short_market(SYMBOL, ORDER_SIZE)
-                    position_manager.open_position(SYMBOL, "short", current_price, ORDER_SIZE)
-                    notifier.send_message(f"🔻 *Vente (SHORT) ouverte* {SYMBOL}\nPrix: {current_price}")
-                    if TP_PCT and SL_PCT:
-                        tp = current_price * (1 + float(TP_PCT) / 100)
-                        sl = current_price * (1 - float(SL_PCT) / 100)
-                        executor.place_tp_sl_orders("sell", ORDER_SIZE, tp, sl)
+            exit_price = account.fill(tp_id if reason == "tp" else sl_id)["price"]
+        filled_id = tp_id if reason == "tp" else sl_id if reason == "sl" else None
+        remaining = [i for i in (tp_id, sl_id) if i and i != filled_id and account.order(i)]
+        if remaining:
+            decided_ns = time.perf_counter_ns()
+            send_order(ctx, decided_ns, lambda: executor.cancel_orders(remaining), decided_ns, "account_to_order")
+        logging.warning("⚠️ [%s] Position soldée chez Kraken (%s @ %s)", symbol, reason, exit_price)
+        record_close(ctx, position, exit_price, int(time.time()), reason, source="kraken")
+
+def check_unconfirmed(pool: StrategyPool):
+    """Boucle principale : positions disparues sans exécution de TP / SL revues après le délai de grâce."""
+    now = time.monotonic()
+    for symbol, (_, since) in list(unconfirmed.items()):
+        if now - since >= ACCOUNT_CLOSE_GRACE_SEC:
+            pool.call(symbol, sync_account)
+
+def evaluate_shadows(ctx, candle: dict, action: str):
+    """
+    Stratégies fantômes en lot, après on_new_candle (StrategyPool.after) : une fois les ordres
+    live partis et hors de la latence par bougie. Trades papier uniquement.
+    """
+    start = time.perf_counter_ns()
+    for name, trade in ctx.strategies.evaluate(candle, action):
+        mongo.save_shadow_trade(dict(trade, symbol=ctx.symbol, strategy=name))
+    metrics.observe_since("shadows", ctx.symbol, start)
+
+def reconcile_positions(pool: StrategyPool):
+    """
+    Au démarrage : aligne les positions rejouées depuis le journal sur Kraken (qui fait foi)
+    avant de traiter la moindre bougie, puis annule les TP/SL orphelins.
+    """
+    positions = executor.get_open_positions()
+    orders = executor.get_open_orders()
+    if positions is None or orders is None:
+        logging.warning("⚠️ Réconciliation impossible (Kraken injoignable) : positions du journal conservées")
+        for ctx in pool.contexts.values():
+            if ctx.position_manager.get_position():
+                exits.arm(ctx.position_manager.get_position())
+        return
+    for symbol, ctx in pool.contexts.items():
+        orphans = ctx.position_manager.reconcile(
+            [p for p in positions if p.get("symbol") == symbol],
+            [o for o in orders if o.get("symbol") == symbol],
+        )
+        if orphans:
+            executor.cancel_orders(orphans)
+        position = ctx.position_manager.get_position()
+        if position:
+            exits.arm(position)  # TP / SL recalculés depuis le prix d'entrée
+        logging.info("🔄 [%s] Position après réconciliation : %s", symbol, position)
+
+def warm_start(pool: StrategyPool, client: WebSocketClient):
+    """
+    Avant l'abonnement au flux : recharge l'historique récent (ticks enregistrés, historique
+    Kraken, MongoDB) dans les bougies et les indicateurs, pour décider dès la première bougie live.
+    """
+    backfill = Backfill(history=KrakenTradeHistory(), mongo=mongo)
+    for symbol, ctx in pool.contexts.items():
+        start = time.perf_counter()
+        summary = backfill.warm_start(client.aggregators[symbol], ctx.strategies)
+        if summary["edge"]:
+            client.resume_after(symbol, *summary["edge"])
+        logging.info("🔥 [%s] Démarrage à chaud en %.0fms : %s bougies | ticks=%s | kraken=%s | mongo=%s | prêt=%s",
+                     symbol, (time.perf_counter() - start) * 1000, summary["candles"], summary["recorder"],
+                     summary["kraken"], summary["mongo"], summary["ready"])
+        if summary["gap"] > 0:
+            logging.warning("⚠️ [%s] %s bougie(s) manquante(s) entre MongoDB et les ticks", symbol, summary["gap"])
+
+def on_timeframe_candle(candle: dict):
+    """Clôture d'une bougie TIMEFRAME (thread WebSocket : aucun traitement lourd ici)."""
+    logging.info("🕐 [%s] Bougie %s : %s", candle["symbol"], candle["timeframe"], candle)
+
+def log_stats(pool: StrategyPool, stages, client: WebSocketClient):
+    for symbol, stats in pool.stats().items():
+        logging.info("⏱ [%s] bougies=%s | moy=%.1fms | max=%.1fms | en attente=%s (max %s)", symbol, stats["count"],
+                     stats["mean_ms"], stats["max_ms"], stats["pending"], stats["max_pending"])
+    db = mongo.stats()
+    logging.info("💾 [MongoDB] en attente=%s | écrits=%s | spool=%s | perdus=%s", db["pending"], db["written"],
+                 db["spooled"], db["dropped"])
+    telegram = notifier.stats()
+    logging.info("📩 [Telegram] file=%s | envoyés=%s | regroupés=%s | retardés=%s | perdus=%s | retard max=%.1fs",
+                 telegram["queued"], telegram["sent"], telegram["coalesced"], telegram["delayed"], telegram["dropped"],
+                 telegram["max_delay_sec"])
+    for stage in stages:
+        stats = stage.stats()
+        logging.info("📦 [%s] file=%s (max %s) | traités=%s | perdus=%s | erreurs=%s", stage.name, stats["depth"],
+                     stats["max_depth"], stats["processed"], stats["dropped"], stats["errors"])
+    for symbol, book in executor.books.items():
+        stats = book.stats()
+        logging.info("📚 [%s] carnet synchronisé=%s | niveaux=%s | spread=%s | mises à jour=%s | trous=%s", symbol,
+                     stats["synced"], stats["levels"], book.spread(), stats["updates"], stats["gaps"])
+    for symbol, ctx in pool.contexts.items():
+        for name, stats in ctx.strategies.stats().items():
+            live = " (live)" if name == ctx.strategies.live_name else ""
+            logging.info("🧪 [%s][%s%s] trades=%s | PnL=%.2f%% | DD max=%.2f%% | réussite=%.0f%% | position=%s", symbol,
+                         name, live, stats["trades"], stats["pnl_percent"], stats["max_drawdown_percent"],
+                         stats["win_rate"] * 100, stats["position"])
+    ws = client.stats()
+    logging.info("🔌 [WebSocket] connecté=%s | reconnexions=%s | doublons écartés=%s | rattrapés=%s", ws["connected"],
+                 ws["reconnects"], ws["duplicates"], ws["backfilled"])
+    if account.updated:
+        state = account.stats()
+        logging.info("👛 [Compte] positions=%s | ordres=%s | exécutions=%s | marge dispo=%s | dernier message il y a "
+                     "%.1fs", state["positions"], state["orders"], state["fills"], state["available_margin"],
+                     state["max_age_sec"] or 0)
+    exit_stats = exits.stats()
+    logging.info("🚪 [Sorties] surveillées=%s | déclenchées=%s", exit_stats["armed"], exit_stats["fired"])
+    if DEBUG_MODE:
+        paper = executor.stats()
+        logging.info("📄 [Paper] solde=%.2f | équité=%.2f (%+.2f%%) | frais=%.2f | exécutions=%s | déclenchés=%s | "
+                     "rejetés=%s | positions=%s", paper["balance"], paper["equity"], paper["pnl_percent"],
+                     paper["fees"], paper["filled"], paper["triggered"], paper["rejected"], paper["positions"])
+    for line in metrics.summary():
+        logging.info("⏱ %s", line)
+    logging.info("🧠 Mémoire résidente : %.0fMB", process_memory_bytes() / 1e6)
+    logs = log_stats_counters()
+    logging.info("📝 [Logs] file=%s | perdus=%s | limités=%s", logs["queued"], logs["dropped"], logs["suppressed"])
+
+def register_gauges(pool: StrategyPool, stages):
+    """Profondeur des files et mémoire exposées sur /metrics (suivi des tests d'endurance)."""
+    metrics.gauge("bot_queue_depth", "Éléments en attente par étage.",
+                  lambda: {stage.name: stage.queue.qsize() for stage in stages}, label="stage")
+    metrics.gauge("bot_strategy_pending", "Bougies en attente par symbole.",
+                  lambda: {symbol: len(ctx.pending) for symbol, ctx in pool.contexts.items()}, label="symbol")
+    metrics.gauge("bot_mongo_pending", "Documents MongoDB en attente d'écriture.", lambda: mongo.stats()["pending"])
+    metrics.gauge("bot_telegram_queued", "Messages Telegram en file.", lambda: notifier.queue.qsize())
+    metrics.gauge("bot_process_resident_bytes", "Mémoire résidente du processus.", process_memory_bytes)
+    metrics.gauge("bot_log_dropped", "Messages de log perdus (file d'écriture pleine).",
+                  lambda: log_stats_counters()["dropped"])
 
 if __name__ == "__main__":
-    client = WebSocketClient(SYMBOL, on_new_candle)
+    pool = StrategyPool(SYMBOLS, on_new_candle, max_workers=STRATEGY_WORKERS, after=evaluate_shadows)
+    # Bougies clôturées : file non bornée, le put du thread WebSocket ne bloque jamais et aucune
+    # bougie n'est perdue (indicateurs glissants de la stratégie)
+    candles = Stage("Candles", pool.submit, maxsize=CANDLE_QUEUE_SIZE, policy=BLOCK)
+    stages = [candles, execution]
+    for stage in stages:
+        stage.start()
+
+    if METRICS_PORT:
+        register_gauges(pool, stages)
+        start_metrics_server(METRICS_PORT, METRICS_HOST)
+
+    executor.warm_up()
+    executor.start_keepalive()
+    reconcile_positions(pool)
+
+    recorder = TickRecorder(TICK_RECORD_DIR) if TICK_RECORD_DIR else None
+    # Sorties au tick : traitées dans la file du symbole, comme les bougies
+    exits.on_exit = lambda event: pool.call(event["symbol"], lambda ctx: close_on_exit(ctx, event))
+    # Reconnexion automatique : trades manqués pendant la coupure rattrapés par l'historique REST
+    client = WebSocketClient(SYMBOLS, candles.put, recorder=recorder, exits=exits, history=KrakenTradeHistory(),
+                             paper=executor if DEBUG_MODE else None)
+    executor.books = client.books or {}
+    client.subscribe(TIMEFRAME, on_timeframe_candle)
+    if BACKFILL_CANDLES:
+        warm_start(pool, client)
+    # Flux privés : exécutions, ordres et positions poussés par Kraken (paper trading : rien à suivre)
+    account_feed = None
+    if PRIVATE_FEEDS and not DEBUG_MODE:
+        account_feed = AccountFeed(account, on_update=lambda feed, symbol: (
+            pool.call(symbol, sync_account) if feed in ("open_positions", "fills") and symbol in pool.contexts else None
+        ))
+        account_feed.start()
     client.start()
 
     try:
+        last_stats = time.time()
         while True:
             time.sleep(1)
+            check_unconfirmed(pool)
+            if time.time() - last_stats >= STATS_INTERVAL_SEC:
+                log_stats(pool, stages, client)
+                last_stats = time.time()
     except KeyboardInterrupt:
         print("🛑 Arrêt manuel détecté.")
         client.stop()
+        if account_feed:
+            account_feed.stop()
+        candles.stop()
+        pool.shutdown()
+        execution.stop()
+        notifier.stop()
+        mongo.close()
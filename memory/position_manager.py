@@ -1,10 +1,201 @@
 # memory/position_manager.py
 
+import json
+import os
+import threading
+import time
+import zlib
 from datetime import datetime
+from utils.logger import setup_logger
+from config import POSITION_JOURNAL_DIR, POSITION_JOURNAL_COMPACT_EVERY, LEGACY_POSITION_FILE
+
+logger = setup_logger("PositionManager")
+
+# Types d'ordres résidents Kraken (openorders) rattachés à la position
+TP_ORDER_TYPES = ("take_profit",)
+SL_ORDER_TYPES = ("stop", "stp")
+
+
+class PositionJournal:
+    """
+    Journal append-only de l'état d'une position : une ligne par changement,
+    `<crc32 hex> <json>\\n`, écrite en un seul write() (qui survit à un arrêt du processus).
+    Le fsync (coupure machine) est fait par un thread dédié juste après : l'appelant, sur le
+    chemin de l'ordre, n'attend pas le disque. Une ligne tronquée par un crash est détectée
+    (CRC) et coupée à la relecture. La compaction réécrit l'état courant dans un fichier
+    temporaire puis le substitue atomiquement (os.replace).
+    """
+
+    def __init__(self, path: str, compact_every: int = POSITION_JOURNAL_COMPACT_EVERY, fsync: bool = True):
+        self.path = path
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.records = 0
+        self.fd = None
+        self.dirty = threading.Event()  # Écritures en attente de fsync
+        self.syncer = None
+
+    @staticmethod
+    def _encode(record: dict) -> bytes:
+        data = json.dumps(record, separators=(",", ":"), default=str)
+        return f"{zlib.crc32(data.encode()):08x} {data}\n".encode()
+
+    def replay(self):
+        """Relit le journal et retourne la position courante (ou None). Coupe une fin corrompue."""
+        position, good_offset, offset = None, 0, 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for line in f:
+                    offset += len(line)
+                    try:
+                        crc, data = line.rstrip(b"\n").split(b" ", 1)
+                        if not line.endswith(b"\n") or int(crc, 16) != zlib.crc32(data):
+                            raise ValueError("CRC invalide")
+                        record = json.loads(data)
+                    except ValueError:
+                        logger.warning("Journal %s : fin corrompue ignorée à l'octet %s", self.path, good_offset)
+                        break
+                    position = self._apply(position, record)
+                    self.seq = record.get("seq", self.seq)
+                    self.records += 1
+                    good_offset = offset
+            if good_offset < offset:
+                with open(self.path, "r+b") as f:
+                    f.truncate(good_offset)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if self.fsync and self.syncer is None:
+            self.syncer = threading.Thread(target=self._sync_loop, name=f"journal-{os.path.basename(self.path)}",
+                                           daemon=True)
+            self.syncer.start()
+        return position
+
+    @staticmethod
+    def _apply(position, record: dict):
+        op = record.get("op")
+        if op in ("open", "snapshot", "adopt"):
+            return record.get("position")
+        if op == "close":
+            return None
+        if op == "tp_sl" and position:
+            return dict(position, tp_id=record.get("tp_id"), sl_id=record.get("sl_id"))
+        if op == "fill" and position:
+            return dict(position, entry_price=record.get("entry_price"), size=record.get("size"), filled=True)
+        return position
+
+    def append(self, op: str, current, **fields):
+        """Écrit un changement d'état. `current` : position après le changement (pour la compaction)."""
+        with self.lock:
+            self.seq += 1
+            line = self._encode(dict(fields, seq=self.seq, ts=int(time.time() * 1000), op=op))
+            os.write(self.fd, line)
+            self.records += 1
+            if self.records >= self.compact_every:
+                self._compact(current)
+        if self.fsync:
+            self.dirty.set()
+
+    def _sync_loop(self):
+        """Thread de fsync : regroupe les écritures survenues pendant le fsync précédent."""
+        while True:
+            self.dirty.wait()
+            self.dirty.clear()
+            with self.lock:
+                if self.fd is None:
+                    return
+                fd = os.dup(self.fd)  # Le fsync se fait hors verrou : une compaction peut rouvrir self.fd
+            try:
+                os.fsync(fd)
+            except OSError as e:
+                logger.error("Journal %s : fsync impossible : %s", self.path, e)
+            finally:
+                os.close(fd)
+
+    def compact(self, current):
+        with self.lock:
+            self._compact(current)
+
+    def _compact(self, current):
+        tmp = f"{self.path}.tmp"
+        self.seq += 1
+        with open(tmp, "wb") as f:
+            f.write(self._encode({"seq": self.seq, "ts": int(time.time() * 1000), "op": "snapshot",
+                                  "position": current}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._fsync_dir()
+        os.close(self.fd)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.records = 1
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(os.path.dirname(self.path) or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self.lock:
+            if self.fd is not None:
+                if self.fsync:
+                    os.fsync(self.fd)
+                os.close(self.fd)
+                self.fd = None
+        self.dirty.set()  # Réveille le thread de fsync pour qu'il se termine
+
 
 class PositionManager:
-    def __init__(self):
+    """
+    Position courante d'un symbole. Avec un symbole, chaque changement est journalisé
+    (POSITION_JOURNAL_DIR/<symbole>.journal) et rejoué au démarrage ; sans symbole,
+    la position reste en mémoire (tests, backtests).
+    """
+
+    def __init__(self, symbol: str | None = None, directory: str = POSITION_JOURNAL_DIR,
+                 compact_every: int = POSITION_JOURNAL_COMPACT_EVERY):
+        self.symbol = symbol
         self.position = None
+        self.journal = None
+        if symbol:
+            self.journal = PositionJournal(os.path.join(directory, f"{symbol}.journal"), compact_every)
+            existing = os.path.exists(self.journal.path)
+            start = time.perf_counter()
+            self.position = self.journal.replay()
+            if not existing:
+                self._import_legacy()
+            elif self.journal.records > 1:
+                self.journal.compact(self.position)
+            logger.info("[%s] Position restaurée en %.1fms : %s", symbol, (time.perf_counter() - start) * 1000,
+                        self.position)
+
+    def _import_legacy(self):
+        """Reprise unique de l'ancien position.json (jamais relu ensuite)."""
+        if not os.path.exists(LEGACY_POSITION_FILE):
+            return
+        try:
+            with open(LEGACY_POSITION_FILE, encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("%s illisible : %s", LEGACY_POSITION_FILE, e)
+            return
+        if legacy and legacy.get("symbol") == self.symbol:
+            self.position = dict(legacy, tp_id=legacy.get("tp_id"), sl_id=legacy.get("sl_id"))
+            self.journal.append("adopt", self.position, position=self.position, source=LEGACY_POSITION_FILE)
+            logger.warning("[%s] Position importée depuis %s (à réconcilier) : %s", self.symbol, LEGACY_POSITION_FILE,
+                           self.position)
+
+    def _journal(self, op: str, **fields):
+        if self.journal:
+            self.journal.append(op, self.position, **fields)
 
     def open_position(self, symbol, side, entry_price, size, tp_id=None, sl_id=None):
         self.position = {
@@ -16,16 +207,27 @@ class PositionManager:
             "tp_id": tp_id,
             "sl_id": sl_id,
         }
-        logger.info(f"Position ouverte : {self.position}")
+        self._journal("open", position=self.position)
+        logger.info("Position ouverte : %s", self.position)
 
     def close_position(self):
-        logger.info("Position clôturée localement.")
         self.position = None
+        self._journal("close")
+        logger.info("Position clôturée localement.")
 
     def set_tp_sl(self, tp_id, sl_id):
         if self.position:
             self.position["tp_id"] = tp_id
             self.position["sl_id"] = sl_id
+            self._journal("tp_sl", tp_id=tp_id, sl_id=sl_id)
+
+    def set_fill(self, entry_price: float, size: float):
+        """Exécution confirmée par Kraken (flux privés) : prix d'entrée et taille réels."""
+        if self.position:
+            self.position["entry_price"] = entry_price
+            self.position["size"] = size
+            self.position["filled"] = True
+            self._journal("fill", entry_price=entry_price, size=size)
 
     def get_tp_sl_ids(self):
         if self.position:
@@ -34,4 +236,45 @@ class PositionManager:
 
     def get_position(self):
         return self.position
- 
\ No newline at end of file
+
+    def reconcile(self, open_positions: list, open_orders: list) -> list:
+        """
+        Aligne la position locale sur Kraken (openpositions / openorders, déjà filtrés
+        sur le symbole). Kraken fait foi. Retourne les identifiants des ordres reduce-only
+        orphelins (sans position) à annuler.
+        """
+        exchange = open_positions[0] if open_positions else None
+        tp_ids = [o["order_id"] for o in open_orders if o.get("orderType") in TP_ORDER_TYPES]
+        sl_ids = [o["order_id"] for o in open_orders if o.get("orderType") in SL_ORDER_TYPES]
+        local = self.position
+
+        if exchange is None:
+            if local:
+                logger.warning("[%s] Position locale absente chez Kraken (TP/SL exécuté ?) - clôture locale",
+                               self.symbol)
+                self.close_position()
+            orphans = [o["order_id"] for o in open_orders if o.get("reduceOnly")]
+            if orphans:
+                logger.warning("[%s] %s ordre(s) reduce-only orphelin(s) à annuler", self.symbol, len(orphans))
+            return orphans
+
+        side, size = exchange["side"], float(exchange["size"])
+        tp_id = local.get("tp_id") if local and local.get("tp_id") in tp_ids else (tp_ids[0] if tp_ids else None)
+        sl_id = local.get("sl_id") if local and local.get("sl_id") in sl_ids else (sl_ids[0] if sl_ids else None)
+        if local and local["side"] == side and float(local["size"]) == size:
+            if (tp_id, sl_id) != (local.get("tp_id"), local.get("sl_id")):
+                self.set_tp_sl(tp_id, sl_id)
+            return []
+
+        self.position = {
+            "symbol": self.symbol,
+            "side": side,
+            "entry_price": float(exchange.get("price", local["entry_price"] if local else 0.0)),
+            "size": size,
+            "open_time": exchange.get("fillTime") or str(datetime.now()),
+            "tp_id": tp_id,
+            "sl_id": sl_id,
+        }
+        self._journal("adopt", position=self.position, source="kraken")
+        logger.warning("[%s] Position reprise depuis Kraken (locale : %s) : %s", self.symbol, local, self.position)
+        return []
@@ -0,0 +1,287 @@
+"""
+Flux privés Kraken Futures (WebSocket authentifié) et état du compte en mémoire.
+
+- AccountFeed : connexion dédiée, authentification par challenge (clé API, puis challenge
+  signé avec le secret : HMAC-SHA512 de SHA-256(challenge)), abonnement à `fills`,
+  `open_orders`, `open_positions` et `balances`. Reconnexion avec la même attente aléatoire
+  que le flux public ; les snapshots reçus au réabonnement reconstruisent l'état.
+- AccountState : exécutions, ordres résidents, positions et soldes tenus à jour depuis ces
+  flux. Lectures en O(1) (dicts par symbole / order_id) depuis la stratégie et les contrôles
+  de risque, sans requête REST.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+import websocket
+from services.websocket_client import WebSocketClient
+from utils.logger import setup_logger
+from config import KRAKEN_API_KEY, KRAKEN_API_SECRET, WS_URL, WS_PING_SEC, ACCOUNT_FILL_HISTORY
+
+logger = setup_logger("Account")
+
+PRIVATE_FEEDS = ("fills", "open_orders", "open_positions", "balances")
+
+
+def sign_challenge(secret: bytes, challenge: str) -> str:
+    """Challenge signé attendu par Kraken Futures pour les flux privés."""
+    digest = hashlib.sha256(challenge.encode()).digest()
+    return base64.b64encode(hmac.new(secret, digest, hashlib.sha512).digest()).decode()
+
+
+class AccountState:
+    def __init__(self, fill_history: int = ACCOUNT_FILL_HISTORY):
+        self.fill_history = fill_history
+        self.fills = {}        # fill_id -> exécution (ordre d'arrivée, borné)
+        self.order_fills = {}  # order_id -> {"qty", "price" (moyen), "time"} (borné)
+        self.last_fills = {}   # symbole -> dernière exécution
+        self.orders = {}       # order_id -> ordre résident
+        self.positions = {}    # symbole -> {"side", "size", "price", "mark_price", "pnl"}
+        self.balances = {}     # devise -> quantité
+        self.margin = {}       # available_margin, portfolio_value, balance_value (compte multi-collatéral)
+        self.updated = {}      # flux -> time.time() du dernier message
+
+    # ---- Lectures (O(1)) ----
+
+    def position(self, symbol: str):
+        return self.positions.get(symbol)
+
+    def order(self, order_id):
+        return self.orders.get(order_id)
+
+    def fill(self, order_id):
+        """Exécution agrégée d'un ordre : {"qty", "price" (moyen), "time"}, None si rien reçu."""
+        return self.order_fills.get(order_id)
+
+    def last_fill(self, symbol: str):
+        return self.last_fills.get(symbol)
+
+    def balance(self, currency: str = "USD"):
+        return self.balances.get(currency)
+
+    def available_margin(self):
+        """Marge disponible (None tant que le flux balances n'a rien envoyé)."""
+        return self.margin.get("available_margin")
+
+    def age(self, feed: str):
+        """Secondes depuis le dernier message du flux (None si jamais reçu)."""
+        updated = self.updated.get(feed)
+        return time.time() - updated if updated else None
+
+    @property
+    def ready(self) -> bool:
+        return all(feed in self.updated for feed in PRIVATE_FEEDS)
+
+    # ---- Mises à jour (thread du flux privé) ----
+
+    def apply(self, data: dict) -> list:
+        """Intègre un message de flux privé. Retourne les symboles dont la position a changé."""
+        feed = data.get("feed", "")
+        name = feed.removesuffix("_snapshot")
+        if name not in PRIVATE_FEEDS:
+            return []
+        self.updated[name] = time.time()
+        if name == "fills":
+            return self._apply_fills(data.get("fills") or [])
+        if name == "open_orders":
+            self._apply_orders(data, snapshot=feed.endswith("_snapshot"))
+            return []
+        if name == "open_positions":
+            return self._apply_positions(data.get("positions") or [])
+        self._apply_balances(data)
+        return []
+
+    def _apply_fills(self, fills: list) -> list:
+        symbols = []
+        for raw in fills:
+            fill_id = raw.get("fill_id")
+            if fill_id in self.fills:
+                continue  # Déjà reçue (fills_snapshot au réabonnement)
+            fill = {
+                "fill_id": fill_id,
+                "order_id": raw.get("order_id"),
+                "cli_ord_id": raw.get("cli_ord_id"),
+                "symbol": raw.get("instrument"),
+                "side": "buy" if raw.get("buy") else "sell",
+                "qty": float(raw.get("qty", 0)),
+                "price": float(raw.get("price", 0)),
+                "time": raw.get("time"),
+                "fill_type": raw.get("fill_type"),
+                "fee": float(raw.get("fee_paid") or 0),
+            }
+            self.fills[fill_id] = fill
+            if len(self.fills) > self.fill_history:
+                del self.fills[next(iter(self.fills))]
+            aggregate = self.order_fills.get(fill["order_id"])
+            if aggregate is None:
+                self.order_fills[fill["order_id"]] = {"qty": fill["qty"], "price": fill["price"], "time": fill["time"]}
+                if len(self.order_fills) > self.fill_history:
+                    del self.order_fills[next(iter(self.order_fills))]
+            else:
+                qty = aggregate["qty"] + fill["qty"]
+                aggregate["price"] = (aggregate["price"] * aggregate["qty"] + fill["price"] * fill["qty"]) / qty
+                aggregate["qty"] = qty
+                aggregate["time"] = fill["time"]
+            last = self.last_fills.get(fill["symbol"])
+            if last is None or (fill["time"] or 0) >= (last["time"] or 0):
+                self.last_fills[fill["symbol"]] = fill
+            symbols.append(fill["symbol"])
+        return list(dict.fromkeys(symbols))
+
+    def _apply_orders(self, data: dict, snapshot: bool):
+        if snapshot:
+            self.orders = {o["order_id"]: self._order(o) for o in data.get("orders") or []}
+            return
+        order = data.get("order")
+        if data.get("is_cancel"):
+            # Annulation, exécution complète ou déclenchement d'un stop : l'ordre quitte le carnet
+            self.orders.pop(data.get("order_id") or (order or {}).get("order_id"), None)
+        elif order:
+            self.orders[order["order_id"]] = self._order(order)
+
+    @staticmethod
+    def _order(raw: dict) -> dict:
+        return {
+            "order_id": raw.get("order_id"),
+            "cli_ord_id": raw.get("cli_ord_id"),
+            "symbol": raw.get("instrument"),
+            "side": "buy" if raw.get("direction", 0) == 0 else "sell",
+            "type": raw.get("type"),
+            "qty": float(raw.get("qty", 0)),
+            "filled": float(raw.get("filled") or 0),
+            "limit_price": raw.get("limit_price"),
+            "stop_price": raw.get("stop_price"),
+            "reduce_only": bool(raw.get("reduce_only")),
+            "time": raw.get("time"),
+        }
+
+    def _apply_positions(self, positions: list) -> list:
+        """Chaque message donne la liste complète : positions absentes = clôturées."""
+        current = {}
+        for raw in positions:
+            balance = float(raw.get("balance", 0))
+            if balance == 0:
+                continue
+            current[raw["instrument"]] = {
+                "side": "long" if balance > 0 else "short",
+                "size": abs(balance),
+                "price": float(raw.get("entry_price", 0)),
+                "mark_price": raw.get("mark_price"),
+                "pnl": raw.get("pnl"),
+            }
+        previous, self.positions = self.positions, current
+        key = lambda p: (p["side"], p["size"], p["price"]) if p else None
+        return [symbol for symbol in previous.keys() | current.keys()
+                if key(previous.get(symbol)) != key(current.get(symbol))]
+
+    def _apply_balances(self, data: dict):
+        flex = data.get("flex_futures") or {}
+        balances = dict(self.balances)
+        for currency, entry in (flex.get("currencies") or {}).items():
+            balances[currency] = float(entry.get("quantity", 0))
+        for currency, quantity in (data.get("holding") or {}).items():
+            balances.setdefault(currency, float(quantity))
+        self.balances = balances
+        self.margin = {key: float(flex[key]) for key in ("available_margin", "portfolio_value", "balance_value")
+                       if flex.get(key) is not None}
+
+    def stats(self) -> dict:
+        ages = [age for age in (self.age(feed) for feed in PRIVATE_FEEDS) if age is not None]
+        return {
+            "ready": self.ready,
+            "positions": {symbol: f"{p['side']} {p['size']}" for symbol, p in self.positions.items()},
+            "orders": len(self.orders),
+            "fills": len(self.fills),
+            "available_margin": self.available_margin(),
+            "max_age_sec": max(ages, default=None),
+        }
+
+
+class AccountFeed:
+    def __init__(self, state: AccountState, on_update=None, url: str = WS_URL, api_key: str = KRAKEN_API_KEY,
+                 api_secret: str = KRAKEN_API_SECRET):
+        self.state = state
+        self.on_update = on_update  # on_update(feed, symbol) : position ou exécution modifiée (dépôt non bloquant)
+        self.url = url
+        self.api_key = api_key
+        self.secret = base64.b64decode(api_secret or "")
+        self.ws = None
+        self.running = False
+        self.stopped = threading.Event()
+        self.attempt = 0
+        self.reconnects = 0
+        self.authenticated = False
+
+    def start(self):
+        self.running = True
+        self.stopped.clear()
+        threading.Thread(target=self._run, name="account-feed", daemon=True).start()
+        logger.info("Flux privés Kraken démarrés (%s).", ", ".join(PRIVATE_FEEDS))
+
+    def stop(self):
+        self.running = False
+        self.stopped.set()
+        if self.ws:
+            self.ws.close()
+
+    def _run(self):
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self.on_open,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close,
+            )
+            self.ws.run_forever(ping_interval=WS_PING_SEC, ping_timeout=WS_PING_SEC / 2)
+            if not self.running:
+                return
+            delay = WebSocketClient.backoff(self.attempt)
+            self.attempt += 1
+            logger.warning("Flux privés : reconnexion dans %.0fms (tentative %d)", delay * 1000, self.attempt)
+            if self.stopped.wait(delay):
+                return
+
+    def on_open(self, ws):
+        self.attempt = 0
+        ws.send(json.dumps({"event": "challenge", "api_key": self.api_key}))
+
+    def on_message(self, ws, message):
+        try:
+            data = json.loads(message)
+        except ValueError as e:
+            logger.error("Flux privés : message illisible : %s", e)
+            return
+        event = data.get("event")
+        if event == "challenge":
+            self._subscribe(ws, data["message"])
+            return
+        if event in ("error", "alert"):
+            logger.error("Flux privés : %s", data.get("message"))
+            return
+        if event:
+            logger.debug("Flux privés : %s", data)
+            return
+        feed = data.get("feed", "")
+        symbols = self.state.apply(data)
+        if self.on_update:
+            for symbol in symbols:
+                self.on_update(feed.removesuffix("_snapshot"), symbol)
+
+    def _subscribe(self, ws, challenge: str):
+        signed = sign_challenge(self.secret, challenge)
+        for feed in PRIVATE_FEEDS:
+            ws.send(json.dumps({"event": "subscribe", "feed": feed, "api_key": self.api_key,
+                                "original_challenge": challenge, "signed_challenge": signed}))
+        if self.authenticated:
+            self.reconnects += 1
+        self.authenticated = True
+        logger.info("Flux privés authentifiés, abonnement à %s", ", ".join(PRIVATE_FEEDS))
+
+    def on_error(self, ws, error):
+        logger.error("Flux privés : erreur WebSocket : %s", error)
+
+    def on_close(self, ws, close_status_code, close_msg):
+        logger.warning("Flux privés : connexion fermée.")
@@ -0,0 +1,170 @@
+"""
+Démarrage à chaud : recharge l'historique récent avant l'abonnement au flux live, pour que
+les indicateurs (RSI, volume moyen) et la graine Heikin Ashi soient prêts dès la première
+bougie live.
+
+Sources, de la plus fidèle à la moins fidèle (BACKFILL_SOURCES) :
+- `recorder` : ticks enregistrés par TickRecorder ;
+- `kraken` : historique public des trades (REST `/history`), pour combler l'écart entre le
+  dernier tick enregistré et maintenant. Les bougies de `/charts` (1m minimum) ne
+  permettent pas de reconstruire des bougies de 10s ;
+- `mongo` : bougies de stratégie persistées, pour la profondeur que les ticks ne couvrent pas.
+
+Les ticks sont rejoués par CandleAggregator.update, exactement comme en live : mêmes buckets,
+même graine HA, et la bougie partielle en cours reste ouverte pour les premiers trades live.
+Le client WebSocket ignore ensuite les trades déjà rejoués (trade_snapshot à l'abonnement) :
+ni bucket manquant, ni trade compté deux fois.
+"""
+import time
+import uuid
+from datetime import datetime, timezone
+import requests
+from services.tick_recorder import TickReader
+from utils.logger import setup_logger
+from config import (
+    BASE_URL, ORDER_TIMEOUT_SEC, TICK_RECORD_DIR, BACKFILL_CANDLES, BACKFILL_SOURCES, BACKFILL_MAX_PAGES,
+)
+
+logger = setup_logger("Backfill")
+
+HISTORY_PAGE = 100     # Trades par page de GET /history
+CATCH_UP_PASSES = 3    # Requêtes successives de l'historique REST au démarrage
+
+
+def _iso(time_ms: int) -> str:
+    return datetime.fromtimestamp(time_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _parse_ms(value) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+class KrakenTradeHistory:
+    """
+    Historique public des trades Kraken Futures (`GET /history`, sans authentification) :
+    HISTORY_PAGE trades par page, antérieurs à `lastTime`, du plus récent au plus ancien.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, session=None, max_pages: int = BACKFILL_MAX_PAGES):
+        self.url = f"{base_url}/history"
+        self.session = session or requests.Session()
+        self.max_pages = max_pages
+
+    def trades(self, symbol: str, since_ms: int, until_ms: int | None = None) -> list:
+        """Trades (time_ms, price, qty, uid, side) de [since_ms, until_ms), triés par horodatage."""
+        trades, seen = [], set()
+        last_time = until_ms
+        for _ in range(self.max_pages):
+            params = {"symbol": symbol}
+            if last_time is not None:
+                params["lastTime"] = _iso(last_time)
+            try:
+                response = self.session.get(self.url, params=params, timeout=ORDER_TIMEOUT_SEC)
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                logger.warning("[%s] Historique Kraken indisponible : %s", symbol, e)
+                break
+            if data.get("result") != "success":
+                logger.warning("[%s] Historique Kraken en erreur : %s", symbol, data.get('error'))
+                break
+            page = [(_parse_ms(t["time"]), float(t["price"]), float(t["size"]), t.get("uid"), t.get("side"))
+                    for t in data.get("history") or []]
+            # La page suivante repart de la ms la plus ancienne (incluse) : dédoublonnage par uid
+            fresh = [t for t in page if (t[3] or t[:3]) not in seen]
+            if not fresh:
+                break
+            seen.update(t[3] or t[:3] for t in fresh)
+            trades.extend(t for t in fresh if t[0] >= since_ms)
+            oldest = min(t[0] for t in page)
+            if oldest < since_ms:
+                break
+            last_time = oldest + 1
+        else:
+            logger.warning("[%s] Historique Kraken tronqué à %s pages", symbol, self.max_pages)
+        trades.sort(key=lambda t: t[0])
+        return trades
+
+
+def _uid(raw: bytes) -> str | None:
+    """uid enregistré (16 octets) -> uid Kraken (UUID)."""
+    return str(uuid.UUID(bytes=raw.ljust(16, b"\0"))) if raw else None
+
+
+class Backfill:
+    def __init__(self, candles: int = BACKFILL_CANDLES, sources=BACKFILL_SOURCES,
+                 recorder_dir: str | None = TICK_RECORD_DIR, history: KrakenTradeHistory | None = None, mongo=None):
+        self.candles = candles
+        self.sources = list(sources)
+        self.recorder_dir = recorder_dir
+        self.history = history
+        self.mongo = mongo
+
+    def warm_start(self, aggregator, engine, now_ms: int | None = None) -> dict:
+        """
+        Recharge les `candles` dernières bougies de base du symbole de `aggregator` dans son
+        historique, ses timeframes supérieurs et `engine` (DecisionEngine ou StrategySet). Retourne un résumé dont `edge`
+        (horodatage ms, uids) désigne le dernier trade rejoué.
+        """
+        symbol = aggregator.symbol
+        interval_ms = aggregator.interval * 1000
+        now_ms = now_ms or int(time.time() * 1000)
+        start_ms = (now_ms // interval_ms - self.candles) * interval_ms
+        summary = {"symbol": symbol, "recorder": 0, "kraken": 0, "mongo": 0, "gap": 0, "edge": None}
+        if self.candles <= 0:
+            return summary
+
+        times, prices, qtys, edge = [], [], [], None
+        if "recorder" in self.sources and self.recorder_dir:
+            ticks = TickReader(self.recorder_dir, symbol).read(start_ms, now_ms + 1)
+            if len(ticks):
+                times, prices, qtys = ticks["time"].tolist(), ticks["price"].tolist(), ticks["qty"].tolist()
+                last = int(ticks["time"].max())
+                edge = (last, {_uid(u) for u in ticks["uid"][ticks["time"] == last]})
+                summary["recorder"] = len(times)
+
+        if "kraken" in self.sources and self.history:
+            # Passes de rattrapage tant que le retard dépasse une page : le trade_snapshot
+            # reçu à l'abonnement (100 derniers trades) couvre alors le reste
+            for _ in range(CATCH_UP_PASSES):
+                since = edge[0] if edge else start_ms
+                fetched = [t for t in self.history.trades(symbol, since)
+                           if not edge or t[0] > edge[0] or t[3] not in edge[1]]
+                if fetched:
+                    times += [t[0] for t in fetched]
+                    prices += [t[1] for t in fetched]
+                    qtys += [t[2] for t in fetched]
+                    last = fetched[-1][0]
+                    uids = {t[3] for t in fetched if t[0] == last}
+                    edge = (last, uids | edge[1] if edge and edge[0] == last else uids)
+                    summary["kraken"] += len(fetched)
+                if len(fetched) < HISTORY_PAGE:
+                    break
+
+        # Profondeur manquante : bougies de stratégie persistées, strictement avant le premier tick
+        first_bucket = (times[0] if times else now_ms) // interval_ms * aggregator.interval
+        missing = (first_bucket * 1000 - start_ms) // interval_ms
+        if missing > 0 and "mongo" in self.sources and self.mongo:
+            stored = {}
+            for candle in self.mongo.get_candles_by_symbol(symbol, limit=self.candles):
+                if candle["timestamp"] < first_bucket:
+                    stored[candle["timestamp"]] = candle
+            restored = [stored[ts] for ts in sorted(stored)][-missing:]
+            for candle in restored:
+                aggregator.restore(candle)
+                engine.update(candle)
+            if restored and times:
+                summary["gap"] = (first_bucket - restored[-1]["timestamp"]) // aggregator.interval - 1
+            summary["mongo"] = len(restored)
+
+        for time_ms, price, qty in zip(times, prices, qtys):
+            closed = aggregator.update(price, qty, time_ms // 1000)
+            if closed:
+                for finalized in closed:
+                    engine.update(finalized)
+
+        summary["edge"] = edge
+        summary["candles"] = len(aggregator.candles)
+        summary["ready"] = engine.ready
+        return summary
@@ -0,0 +1,144 @@
+import threading
+import time
+from services.candle_store import CandleStore, to_heikin_ashi
+from services.timeframes import TimeframeRollup
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from config import OHLC_INTERVAL_SEC, USE_HEIKIN_ASHI, CANDLE_HISTORY_SIZE
+
+logger = setup_logger("WebSocket")
+
+
+class CandleAggregator:
+    """
+    Agrège les trades d'un symbole en bougies (brutes + Heikin Ashi).
+    `timeframes` : timeframes supérieurs dérivés des bougies clôturées (voir TimeframeRollup).
+
+    Les intervalles sans trade donnent une bougie plate (OHLC = dernier close, volume 0) :
+    une bougie par intervalle, sans trou, pour que les fenêtres RSI / volume restent alignées
+    sur le temps. Un trade en retard (bougie déjà clôturée) est intégré à la bougie en cours.
+    """
+
+    def __init__(self, symbol: str, interval: int = OHLC_INTERVAL_SEC, history_size: int = CANDLE_HISTORY_SIZE,
+                 timeframes=()):
+        self.symbol = symbol
+        self.interval = interval
+        self.candles = CandleStore(history_size)
+        self.current_candle = None
+        self.next_ts = None      # Début du premier intervalle non clôturé (None avant le premier trade)
+        self.last_close = None   # Prix des bougies de comblement
+        self.late = 0            # Trades arrivés après la clôture de leur bougie
+        self.filled = 0          # Bougies de comblement émises
+        self.rollup = TimeframeRollup(symbol, interval, timeframes, history_size) if timeframes else None
+        self.lock = threading.RLock()  # Réentrant : le scheduler émet sous le verrou (ordre des bougies)
+
+    def _new_candle(self, price, volume, timestamp):
+        return {
+            "symbol": self.symbol,
+            "timestamp": int(timestamp // self.interval * self.interval),
+            "open": price,
+            "high": price,
+            "low": price,
+            "close": price,
+            "volume": volume,
+        }
+
+    def update(self, price, volume, timestamp):
+        """
+        Intègre un trade. Retourne la liste des bougies clôturées (comblement compris) si le
+        trade ouvre un nouvel intervalle, sinon None.
+        """
+        with self.lock:
+            candle = self.current_candle
+            if candle is not None and timestamp < candle["timestamp"] + self.interval:
+                if timestamp < candle["timestamp"]:
+                    self.late += 1
+                candle["close"] = price
+                if price > candle["high"]:
+                    candle["high"] = price
+                if price < candle["low"]:
+                    candle["low"] = price
+                candle["volume"] += volume
+                return None
+
+            if self.next_ts is None:
+                logger.info("[WS] Premier trade reçu (%s) - Initialisation bougie à %s", self.symbol, price)
+                self.current_candle = self._new_candle(price, volume, timestamp)
+                self.next_ts = self.current_candle["timestamp"]
+                return None
+
+            closed = [self._finalize_candle()] if candle is not None else []
+            bucket = timestamp // self.interval * self.interval
+            if bucket < self.next_ts:
+                self.late += 1  # Intervalle déjà clôturé par l'horloge : bougie en cours
+                bucket = self.next_ts
+            closed += self._fill_until(bucket)
+            self.current_candle = self._new_candle(price, volume, bucket)
+            if self.rollup:
+                self.rollup.flush(bucket)
+            return closed
+
+    def close_due(self, now: float) -> list:
+        """
+        Clôture les intervalles terminés au plus tard à `now` (secondes, horloge Kraken moins
+        la marge de retard) : bougie en cours puis bougies plates des intervalles sans trade.
+        """
+        with self.lock:
+            if self.next_ts is None:
+                return []
+            closed = []
+            candle = self.current_candle
+            if candle is not None and candle["timestamp"] + self.interval <= now:
+                closed.append(self._finalize_candle())
+                self.current_candle = None
+            if self.current_candle is None:
+                closed += self._fill_until((now // self.interval) * self.interval)
+            if closed and self.rollup:
+                self.rollup.flush(self.next_ts)
+            return closed
+
+    def _fill_until(self, bucket) -> list:
+        """Bougies plates pour chaque intervalle sans trade avant `bucket` (borné à l'historique)."""
+        missing = int((bucket - self.next_ts) // self.interval)
+        if missing <= 0:
+            return []
+        if missing > self.candles.capacity:
+            # Longue coupure : seules les dernières bougies restent utiles aux indicateurs
+            self.next_ts = int(bucket - self.candles.capacity * self.interval)
+            missing = self.candles.capacity
+        closed = []
+        price = self.last_close
+        for _ in range(missing):
+            self.current_candle = self._new_candle(price, 0.0, self.next_ts)
+            closed.append(self._finalize_candle())
+        self.current_candle = None
+        self.filled += missing
+        return closed
+
+    def restore(self, candle: dict):
+        """
+        Archive une bougie clôturée persistée (bougie de stratégie : HA si USE_HEIKIN_ASHI).
+        Une bougie HA ne permet pas de retrouver la bougie brute, qui est alors approchée
+        par la HA ; la graine Heikin Ashi de la bougie suivante reste exacte.
+        """
+        with self.lock:
+            self.candles.append(candle, candle if USE_HEIKIN_ASHI else self._to_heikin_ashi(candle))
+            self.next_ts = candle["timestamp"] + self.interval
+            self.last_close = candle["close"]
+
+    def _finalize_candle(self):
+        """Archive la bougie courante (brute + HA) et retourne celle transmise à la stratégie."""
+        start = time.perf_counter_ns()
+        raw = self.current_candle.copy()
+        ha = self._to_heikin_ashi(raw)
+        self.candles.append(raw, ha)
+        self.next_ts = raw["timestamp"] + self.interval
+        self.last_close = raw["close"]
+        if self.rollup:
+            self.rollup.add(raw)
+        metrics.observe_since("candle_finalize", self.symbol, start)
+        return ha if USE_HEIKIN_ASHI else raw
+
+    def _to_heikin_ashi(self, candle):
+        return to_heikin_ashi(candle, self.candles.last("ha"))
+
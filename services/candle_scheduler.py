@@ -0,0 +1,108 @@
+"""
+Clôture des bougies aux frontières d'intervalle, sur l'horloge Kraken.
+
+- ExchangeClock : décalage entre l'horloge Kraken (horodatage des trades) et l'horloge locale,
+  estimé par le plus petit délai de réception observé (le plus proche du décalage réel),
+  qui se relâche lentement pour suivre une dérive.
+- CandleScheduler : un seul thread pour tous les symboles. Il se réveille à chaque frontière
+  + CANDLE_GRACE_SEC (marge pour les trades en retard) et clôture les bougies échues, avec
+  une bougie plate par intervalle sans trade. Les timeframes supérieurs (TimeframeRollup) se
+  clôturent en cascade depuis ces bougies de base : pas de timer par timeframe.
+  Les clôtures sont suspendues pendant une coupure du flux (pause / resume) : les intervalles
+  sans trade reçu ne sont remplis à plat qu'une fois l'historique manquant rejoué.
+"""
+import threading
+import time
+from utils.logger import setup_logger
+from config import CANDLE_GRACE_SEC
+
+logger = setup_logger("WebSocket")
+
+CLOCK_DECAY = 0.01  # Part de l'écart rattrapée par échantillon quand le délai observé augmente
+
+
+class ExchangeClock:
+    def __init__(self):
+        self.offset_ms = None  # Horloge Kraken - horloge locale (None : aucun trade reçu)
+
+    def update(self, exchange_ms: int, local_ms: float):
+        """Un échantillon par message de trades : horodatage Kraken du dernier trade, réception locale."""
+        sample = exchange_ms - local_ms
+        offset = self.offset_ms
+        if offset is None or sample > offset:
+            self.offset_ms = sample
+        else:
+            self.offset_ms = offset + (sample - offset) * CLOCK_DECAY
+
+    def now(self) -> float:
+        """Heure Kraken estimée (secondes)."""
+        return time.time() + (self.offset_ms or 0.0) / 1000
+
+
+class CandleScheduler:
+    def __init__(self, aggregators, on_candle, clock: ExchangeClock, grace_sec: float = CANDLE_GRACE_SEC):
+        self.aggregators = aggregators  # symbole -> CandleAggregator
+        self.on_candle = on_candle      # Appelé pour chaque bougie clôturée (dépôt non bloquant)
+        self.clock = clock
+        self.grace = grace_sec
+        self.stopped = threading.Event()
+        self.thread = None
+        self.closed = 0
+        self.max_lag = 0.0  # Retard max du réveil sur la frontière + marge (s)
+        self.paused_until = 0.0  # time.monotonic() : aucune clôture avant (flux coupé ou en reprise)
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="candle-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def pause(self, seconds: float = float("inf")):
+        """Suspend les clôtures `seconds` secondes (indéfiniment par défaut)."""
+        self.paused_until = time.monotonic() + seconds
+
+    def resume(self):
+        self.paused_until = 0.0
+
+    def next_deadline(self, now: float) -> float:
+        """Prochaine frontière d'intervalle (toutes bougies de base confondues) + marge."""
+        cutoff = now - self.grace
+        return min((cutoff // agg.interval + 1) * agg.interval for agg in self.aggregators.values()) + self.grace
+
+    def tick(self, now: float | None = None) -> int:
+        """Clôture les bougies échues à `now` (heure Kraken). Retourne le nombre de bougies émises."""
+        if self.paused_until and time.monotonic() < self.paused_until:
+            return 0
+        cutoff = (self.clock.now() if now is None else now) - self.grace
+        emitted = 0
+        for aggregator in self.aggregators.values():
+            # Émission sous le verrou : un trade qui ouvre l'intervalle suivant attend, ses
+            # bougies ne peuvent pas passer devant celles-ci
+            with aggregator.lock:
+                for candle in aggregator.close_due(cutoff):
+                    emitted += 1
+                    try:
+                        self.on_candle(candle)
+                    except Exception as e:
+                        logger.error("[%s] Erreur émission bougie : %s", aggregator.symbol, e)
+        self.closed += emitted
+        return emitted
+
+    def _run(self):
+        while not self.stopped.is_set():
+            deadline = self.next_deadline(self.clock.now())
+            if self.stopped.wait(max(deadline - self.clock.now(), 0.0)):
+                return
+            self.max_lag = max(self.max_lag, self.clock.now() - deadline)
+            self.tick()
+
+    def stats(self) -> dict:
+        return {
+            "closed": self.closed,
+            "max_lag_ms": self.max_lag * 1000,
+            "offset_ms": self.clock.offset_ms,
+            "late": sum(agg.late for agg in self.aggregators.values()),
+            "filled": sum(agg.filled for agg in self.aggregators.values()),
+        }
@@ -0,0 +1,116 @@
+import numpy as np
+
+RAW_COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+HA_COLUMNS = ("ha_open", "ha_high", "ha_low", "ha_close")
+COLUMNS = RAW_COLUMNS + HA_COLUMNS
+
+
+class CandleStore:
+    """
+    Historique de bougies à capacité fixe (ring buffer NumPy en colonnes).
+
+    Chaque bougie est écrite deux fois (index i et i + capacité) : les N dernières
+    bougies sont donc toujours contiguës en mémoire et `window()` retourne des vues
+    sans copie. Une vue reste valide tant que moins de `capacity - n` bougies ont
+    été ajoutées depuis sa création ; copier si on doit la conserver plus longtemps.
+    """
+
+    def __init__(self, capacity: int = 5000):
+        if capacity <= 0:
+            raise ValueError("La capacité doit être positive")
+        self.capacity = capacity
+        self._data = np.zeros((len(COLUMNS), 2 * capacity), dtype=np.float64)
+        self._index = {name: i for i, name in enumerate(COLUMNS)}
+        self._head = -1   # Position de la dernière bougie écrite dans [0, capacity)
+        self._count = 0   # Nombre total de bougies reçues
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def total(self) -> int:
+        """Nombre total de bougies ajoutées depuis le démarrage."""
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def append(self, raw: dict, ha: dict | None = None):
+        """Ajoute une bougie brute et sa version Heikin Ashi (optionnelle)."""
+        head = (self._head + 1) % self.capacity
+        row = (
+            raw["timestamp"], raw["open"], raw["high"], raw["low"], raw["close"], raw["volume"],
+            ha["open"] if ha else np.nan,
+            ha["high"] if ha else np.nan,
+            ha["low"] if ha else np.nan,
+            ha["close"] if ha else np.nan,
+        )
+        self._data[:, head] = row
+        self._data[:, head + self.capacity] = row
+        self._head = head
+        self._count += 1
+
+    def _bounds(self, n: int | None):
+        size = len(self)
+        n = size if n is None else min(n, size)
+        end = self._head + self.capacity + 1
+        return end - n, end
+
+    def column(self, name: str, n: int | None = None) -> np.ndarray:
+        """Vue en lecture seule des N dernières valeurs d'une colonne."""
+        start, end = self._bounds(n)
+        view = self._data[self._index[name], start:end]
+        view.flags.writeable = False
+        return view
+
+    def window(self, n: int | None = None, kind: str = "raw") -> dict:
+        """
+        Vues des N dernières bougies sous forme {colonne: ndarray}.
+        kind="raw" -> OHLC brut, kind="ha" -> OHLC Heikin Ashi (clés open/high/low/close).
+        """
+        if kind == "raw":
+            return {name: self.column(name, n) for name in RAW_COLUMNS}
+        if kind == "ha":
+            cols = {"timestamp": self.column("timestamp", n), "volume": self.column("volume", n)}
+            for name in HA_COLUMNS:
+                cols[name[3:]] = self.column(name, n)
+            return cols
+        raise ValueError(f"Type de bougie inconnu : {kind}")
+
+    def last(self, kind: str = "raw") -> dict | None:
+        """Dernière bougie sous forme de dict (ou None si vide)."""
+        if not self._count:
+            return None
+        row = self._data[:, self._head].tolist()
+        if kind == "raw":
+            candle = dict(zip(RAW_COLUMNS, row[:6]))
+        elif kind == "ha":
+            candle = {"timestamp": row[0], "volume": row[5]}
+            candle.update(zip(("open", "high", "low", "close"), row[6:]))
+        else:
+            raise ValueError(f"Type de bougie inconnu : {kind}")
+        candle["timestamp"] = int(candle["timestamp"])
+        return candle
+
+
+def to_heikin_ashi(candle: dict, previous: dict | None) -> dict:
+    """Bougie Heikin Ashi à partir de la bougie brute et de la bougie HA précédente (None au démarrage)."""
+    if previous is None:
+        ha_open = (candle["open"] + candle["close"]) / 2
+    else:
+        ha_open = (previous["open"] + previous["close"]) / 2
+
+    ha_close = (candle["open"] + candle["high"] + candle["low"] + candle["close"]) / 4
+    ha_high = max(candle["high"], ha_open, ha_close)
+    ha_low = min(candle["low"], ha_open, ha_close)
+
+    return {
+        "symbol": candle["symbol"],
+        "timestamp": candle["timestamp"],
+        "open": ha_open,
+        "high": ha_high,
+        "low": ha_low,
+        "close": ha_close,
+        "volume": candle["volume"],
+    }
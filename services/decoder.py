@@ -0,0 +1,165 @@
+"""
+Décodage rapide des messages WebSocket Kraken.
+
+- Préfiltre par sous-chaîne : heartbeats, events et autres flux sont écartés sans parsing JSON.
+- Backend JSON : orjson si installé (optionnel), sinon json de la bibliothèque standard.
+- Les trades sont décodés directement en tuples typés (Trade).
+
+Microbenchmark :
+    python -m services.decoder
+"""
+import json
+import time
+from typing import NamedTuple
+from utils.logger import setup_logger
+
+try:
+    import orjson
+except ImportError:  # Backend optionnel
+    orjson = None
+
+logger = setup_logger("WebSocket")
+
+
+class Trade(NamedTuple):
+    symbol: str
+    time: int      # ms
+    price: float
+    qty: float
+    side: str | None
+    uid: str | None
+
+
+_new_trade = tuple.__new__  # Construction directe, sans le surcoût de Trade.__new__
+
+
+def _backend(name: str):
+    if name == "orjson" or (name == "auto" and orjson is not None):
+        if orjson is None:
+            raise ValueError("Backend orjson demandé mais non installé")
+        return "orjson", orjson.loads
+    if name in ("auto", "json"):
+        return "json", json.loads
+    raise ValueError(f"Backend JSON inconnu : {name}")
+
+
+class TradeDecoder:
+    def __init__(self, backend: str = "auto"):
+        self.backend, self.loads = _backend(backend)
+        self.decoded = 0   # Messages de trades décodés
+        self.skipped = 0   # Messages écartés par le préfiltre
+        self.errors = 0
+
+    def decode(self, message, default_symbol: str | None = None):
+        """Retourne la liste des trades du message, ou None si ce n'est pas un message de trades."""
+        # Préfiltre : "trade" et "trade_snapshot" contiennent tous deux le motif
+        marker = b'"trade' if isinstance(message, (bytes, bytearray)) else '"trade'
+        if marker not in message:
+            self.skipped += 1
+            return None
+
+        try:
+            data = self.loads(message)
+        except ValueError as e:
+            self.errors += 1
+            logger.error("[WS] Erreur parsing JSON : %s | Message : %s", e, message)
+            return None
+
+        # Events système : info, subscribed, etc.
+        if "event" in data:
+            return None
+
+        feed = data.get("feed")
+        if feed == "trade":
+            items = (data,)
+        elif feed == "trade_snapshot":
+            items = data.get("trades", ())
+        else:
+            self.skipped += 1
+            return None
+
+        symbol = data.get("product_id", default_symbol)
+        self.decoded += 1
+        try:
+            # Chemin rapide : tout le message en une compréhension, sans try par trade
+            return [
+                _new_trade(Trade, (item.get("product_id", symbol), item["time"], float(item["price"]),
+                                   float(item["qty"]), item.get("side"), item.get("uid")))
+                for item in items
+            ]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return self._decode_slow(items, symbol)
+
+    def _decode_slow(self, items, symbol):
+        """Décodage trade par trade : on garde les trades valides d'un message partiellement invalide."""
+        trades = []
+        for item in items:
+            try:
+                trades.append(_new_trade(Trade, (item.get("product_id", symbol), item["time"], float(item["price"]),
+                                                 float(item["qty"]), item.get("side"), item.get("uid"))))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                self.errors += 1
+                logger.error("[WS] Erreur parsing trade : %s | Trade : %s", e, item)
+        return trades
+
+
+def _legacy_decode(message):
+    """Chemin historique de WebSocketClient.on_message (référence du benchmark)."""
+    data = json.loads(message)
+    if "event" in data:
+        return None
+    if data.get("feed") == "trade_snapshot":
+        trades = data.get("trades", [])
+    elif data.get("feed") == "trade":
+        trades = [data]
+    else:
+        return None
+    out = []
+    for trade in trades:
+        try:
+            out.append((float(trade["price"]), float(trade["qty"]), int(trade["time"] // 1000)))
+        except Exception:
+            pass
+    return out
+
+
+def sample_messages(snapshot_size: int = 100):
+    trade = {
+        "feed": "trade", "product_id": "PF_ETHUSD", "uid": "34d75d08-9a7d-4d65-a684-c50040374b3d",
+        "side": "buy", "type": "fill", "seq": 949933, "time": 1748927291349, "qty": 0.699, "price": 2603.6,
+    }
+    snapshot = {
+        "feed": "trade_snapshot", "product_id": "PF_ETHUSD",
+        "trades": [dict(trade, feed=None, seq=949933 - i, time=1748927291349 - i * 150) for i in range(snapshot_size)],
+    }
+    heartbeat = {"feed": "heartbeat", "time": 1748927291349}
+    return {
+        "trade": json.dumps(trade, separators=(",", ":")),
+        "snapshot": json.dumps(snapshot, separators=(",", ":")),
+        "heartbeat": json.dumps(heartbeat, separators=(",", ":")),
+    }
+
+
+def benchmark(duration: float = 1.0) -> dict:
+    """Messages/s par type de message et par décodeur."""
+    messages = sample_messages()
+    decoders = {"legacy": _legacy_decode, "json": TradeDecoder("json").decode}
+    if orjson is not None:
+        decoders["orjson"] = TradeDecoder("orjson").decode
+
+    results = {}
+    for kind, message in messages.items():
+        for name, decode in decoders.items():
+            count = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < duration:
+                for _ in range(100):
+                    decode(message)
+                count += 100
+            results[(kind, name)] = count / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    for (kind, name), rate in benchmark().items():
+        print(f"{kind:<10} {name:<7} {rate:>12,.0f} msg/s")
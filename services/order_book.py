@@ -0,0 +1,147 @@
+"""
+Carnet d'ordres L2 local, tenu à jour depuis les flux Kraken Futures `book_snapshot` / `book`.
+
+- Niveaux de prix triés (sortedcontainers.SortedDict) : mise à jour d'un niveau en O(log n),
+  meilleur bid / ask, spread et prix milieu en O(1).
+- Numéros de séquence contrôlés : un trou rend le carnet invalide jusqu'au prochain
+  `book_snapshot` (le client WebSocket se réabonne au symbole).
+- Prix moyen d'exécution attendu pondéré par la profondeur, mis en cache jusqu'à la
+  prochaine modification du carnet : O(1) pour les lectures répétées d'une même taille.
+"""
+import threading
+from sortedcontainers import SortedDict
+from utils.logger import setup_logger
+
+logger = setup_logger("WebSocket")
+
+BOOK_MARKER = '"book'  # Présent dans les messages book et book_snapshot, absent des trades
+
+
+class OrderBook:
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = SortedDict(lambda price: -price)  # Meilleur bid en tête
+        self.asks = SortedDict()
+        self.seq = None
+        self.synced = False      # Faux avant le premier snapshot et après un trou de séquence
+        self.resyncing = False   # Réabonnement demandé, snapshot attendu
+        self.timestamp = 0       # Horodatage Kraken (ms) de la dernière mise à jour
+        self.gaps = 0
+        self.updates = 0
+        self.lock = threading.Lock()  # Écrit par le thread WebSocket, lu par la stratégie
+        self._fills = {}
+
+    def apply_snapshot(self, bids, asks, seq: int, timestamp: int = 0):
+        """Remplace le carnet (listes de {"price", "qty"})."""
+        with self.lock:
+            self.bids.clear()
+            self.asks.clear()
+            for level in bids:
+                if float(level["qty"]) > 0:
+                    self.bids[float(level["price"])] = float(level["qty"])
+            for level in asks:
+                if float(level["qty"]) > 0:
+                    self.asks[float(level["price"])] = float(level["qty"])
+            self.seq = seq
+            self.timestamp = timestamp
+            self.synced = True
+            self.resyncing = False
+            self._fills = {}
+
+    def apply_delta(self, side: str, price: float, qty: float, seq: int, timestamp: int = 0) -> bool:
+        """Met à jour un niveau (qty = 0 : niveau retiré). False si un message a été perdu."""
+        with self.lock:
+            if not self.synced:
+                return True  # Deltas ignorés jusqu'au snapshot
+            if seq <= self.seq:
+                return True  # Doublon ou message antérieur au snapshot
+            if seq != self.seq + 1:
+                self.synced = False
+                self.gaps += 1
+                logger.warning("[BOOK] %s : trou de séquence (%s -> %s), carnet invalidé", self.symbol, self.seq, seq)
+                return False
+            levels = self.bids if side == "buy" else self.asks
+            if qty > 0:
+                levels[price] = qty
+            else:
+                levels.pop(price, None)
+            self.seq = seq
+            self.timestamp = timestamp
+            self.updates += 1
+            self._fills = {}
+        return True
+
+    def invalidate(self):
+        """Carnet inutilisable (déconnexion) jusqu'au prochain snapshot."""
+        with self.lock:
+            self.synced = False
+            self.resyncing = False
+
+    # ---- Lecture ----
+
+    def best_bid(self):
+        with self.lock:
+            return self.bids.peekitem(0) if self.synced and self.bids else None
+
+    def best_ask(self):
+        with self.lock:
+            return self.asks.peekitem(0) if self.synced and self.asks else None
+
+    def spread(self) -> float | None:
+        with self.lock:
+            if not (self.synced and self.bids and self.asks):
+                return None
+            return self.asks.peekitem(0)[0] - self.bids.peekitem(0)[0]
+
+    def mid(self) -> float | None:
+        with self.lock:
+            if not (self.synced and self.bids and self.asks):
+                return None
+            return (self.asks.peekitem(0)[0] + self.bids.peekitem(0)[0]) / 2
+
+    def expected_fill(self, side: str, size: float):
+        """
+        Ordre au marché `side` ("buy" consomme les asks) de taille `size` :
+        (prix moyen attendu, quantité exécutable). (None, 0.0) si le carnet est vide ou invalide.
+        """
+        key = (side, size)
+        with self.lock:
+            if not self.synced:
+                return None, 0.0
+            cached = self._fills.get(key)
+            if cached is not None:
+                return cached
+            remaining, cost = size, 0.0
+            for price, qty in (self.asks if side == "buy" else self.bids).items():
+                take = qty if qty < remaining else remaining
+                cost += take * price
+                remaining -= take
+                if remaining <= 0:
+                    break
+            filled = size - remaining
+            result = (cost / filled if filled else None, filled)
+            self._fills[key] = result
+            return result
+
+    def liquidity(self, side: str, limit_price: float) -> float:
+        """Quantité exécutable immédiatement par un ordre `side` sans dépasser `limit_price`."""
+        with self.lock:
+            if not self.synced:
+                return 0.0
+            total = 0.0
+            if side == "buy":
+                for price, qty in self.asks.items():
+                    if price > limit_price:
+                        break
+                    total += qty
+            else:
+                for price, qty in self.bids.items():
+                    if price < limit_price:
+                        break
+                    total += qty
+            return total
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"synced": self.synced, "levels": len(self.bids) + len(self.asks), "updates": self.updates,
+                    "gaps": self.gaps, "seq": self.seq}
@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+from utils.logger import setup_logger
+
+logger = setup_logger("Pipeline")
+
+# Politiques en cas de file pleine
+BLOCK = "block"              # Le producteur attend (backpressure) - jamais depuis le thread WebSocket
+DROP_OLDEST = "drop_oldest"  # On écarte l'élément le plus ancien pour faire de la place
+DROP_NEWEST = "drop_newest"  # On écarte l'élément entrant
+
+
+class Stage:
+    """
+    Étage de pipeline : une file bornée consommée par un ou plusieurs threads.
+    Les compteurs (reçus, traités, perdus, erreurs, profondeur max) permettent de
+    surveiller la saturation de chaque étage.
+    """
+
+    def __init__(self, name: str, handler, maxsize: int = 1000, workers: int = 1,
+                 policy: str = DROP_OLDEST, block_timeout: float | None = None):
+        if policy not in (BLOCK, DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Politique inconnue : {policy}")
+        self.name = name
+        self.handler = handler
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.workers = workers
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.running = False
+        self.threads = []
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    def start(self):
+        self.running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Arrête l'étage après avoir vidé la file (dans la limite du timeout)."""
+        deadline = time.time() + timeout
+        while not self.queue.empty() and time.time() < deadline:
+            time.sleep(0.01)
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=max(0.0, deadline - time.time()))
+        self.threads = []
+
+    def put(self, item) -> bool:
+        """Ajoute un élément selon la politique de l'étage. Retourne False si un élément a été perdu."""
+        with self.lock:
+            self.submitted += 1
+        accepted = True
+        try:
+            if self.policy == BLOCK:
+                self.queue.put(item, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            accepted = self._overflow(item)
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return accepted
+
+    def _overflow(self, item) -> bool:
+        with self.lock:
+            self.dropped += 1
+            dropped = self.dropped
+        if self.policy == DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                pass
+        # Log limité pour ne pas ajouter d'I/O sur le thread producteur en cas de saturation
+        if dropped == 1 or dropped % 1000 == 0:
+            logger.warning("[%s] File pleine (%s) - %s élément(s) perdu(s)", self.name, self.queue.maxsize, dropped)
+        return False
+
+    def _run(self):
+        while self.running:
+            try:
+                item = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                self.handler(item)
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                logger.error("[%s] Erreur de traitement : %s", self.name, e)
+            finally:
+                with self.lock:
+                    self.processed += 1
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "depth": self.queue.qsize(),
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+            }
+
+
+def run_job(job):
+    """Handler générique : les éléments de la file sont des callables sans argument."""
+    job()
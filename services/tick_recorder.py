@@ -0,0 +1,244 @@
+"""
+Enregistrement binaire append-only des trades bruts et relecture par memory-map.
+
+Format : un fichier par symbole et par jour UTC (`<dir>/<SYMBOL>/<YYYY-MM-DD>.ticks`),
+enregistrements de largeur fixe TICK_DTYPE (41 octets, little-endian) :
+time (ms, int64) | price (float64) | qty (float64) | side (uint8) | uid (16 octets).
+
+Usage :
+    python -m services.tick_recorder import logs/WebSocket.log* --out data/ticks
+    python -m services.tick_recorder info --dir data/ticks --symbol PF_ETHUSD
+"""
+import argparse
+import ast
+import glob
+import hashlib
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+import numpy as np
+from utils.logger import setup_logger
+
+logger = setup_logger("TickRecorder")
+
+TICK_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("price", "<f8"),
+    ("qty", "<f8"),
+    ("side", "u1"),
+    ("uid", "S16"),
+])
+SIDES = {"buy": 1, "sell": 2}
+SIDE_NAMES = {0: None, 1: "buy", 2: "sell"}
+SEGMENT_SUFFIX = ".ticks"
+
+
+def _day(time_ms: int) -> str:
+    return datetime.fromtimestamp(time_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _uid_bytes(uid) -> bytes:
+    if not uid:
+        return b""
+    try:
+        return uuid.UUID(str(uid)).bytes
+    except ValueError:
+        return hashlib.md5(str(uid).encode()).digest()
+
+
+class TickRecorder:
+    """
+    Enregistreur asynchrone : `record()` ne fait qu'un put_nowait dans une file
+    bornée, l'encodage et l'écriture disque se font sur un thread dédié.
+    Si la file est pleine, le tick est compté dans `dropped` plutôt que de bloquer.
+    """
+
+    def __init__(self, directory: str, max_queue: int = 100_000, flush_interval: float = 0.5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.running = False
+        self.thread = None
+        self.recorded = 0
+        self.dropped = 0
+        self._files = {}
+
+    def start(self):
+        if self.running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        logger.info("Enregistrement des ticks dans %s", self.directory)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        self._drain()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def record(self, symbol: str, time_ms: int, price: float, qty: float, side=None, uid=None):
+        try:
+            self.queue.put_nowait((symbol, time_ms, price, qty, side, uid))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.flush_interval)
+            self._drain()
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.error("Erreur écriture ticks : %s", e)
+
+    def _write(self, batch):
+        groups = {}
+        for symbol, time_ms, price, qty, side, uid in batch:
+            time_ms = int(time_ms)
+            groups.setdefault((symbol, _day(time_ms)), []).append(
+                (time_ms, float(price), float(qty), SIDES.get(side, 0), _uid_bytes(uid))
+            )
+        for key, rows in groups.items():
+            f = self._segment(*key)
+            f.write(np.array(rows, dtype=TICK_DTYPE).tobytes())
+            f.flush()
+            self.recorded += len(rows)
+
+    def _segment(self, symbol, day):
+        key = (symbol, day)
+        f = self._files.get(key)
+        if f is None:
+            # Rotation journalière : on ferme les segments des jours précédents du symbole
+            for old_key in [k for k in self._files if k[0] == symbol]:
+                self._files.pop(old_key).close()
+            path = os.path.join(self.directory, symbol, day + SEGMENT_SUFFIX)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path, "ab")
+            # Un crash en cours d'écriture peut laisser un enregistrement partiel
+            partial = f.tell() % TICK_DTYPE.itemsize
+            if partial:
+                f.truncate(f.tell() - partial)
+                f.seek(0, os.SEEK_END)
+            self._files[key] = f
+        return f
+
+
+class TickReader:
+    """
+    Relecture des segments par memory-map : aucune copie ni parsing, les tableaux
+    retournés sont des vues NumPy structurées (TICK_DTYPE).
+    Le découpage par plage horaire suppose les ticks triés dans chaque segment
+    (ordre de réception, à quelques ms près).
+    """
+
+    def __init__(self, directory: str, symbol: str):
+        self.directory = directory
+        self.symbol = symbol
+
+    def segments(self, start_ms: int | None = None, end_ms: int | None = None) -> list:
+        pattern = os.path.join(self.directory, self.symbol, "*" + SEGMENT_SUFFIX)
+        paths = sorted(glob.glob(pattern))
+        first = _day(start_ms) if start_ms is not None else None
+        last = _day(end_ms) if end_ms is not None else None
+        selected = []
+        for path in paths:
+            day = os.path.basename(path)[:-len(SEGMENT_SUFFIX)]
+            if (first and day < first) or (last and day > last):
+                continue
+            selected.append(path)
+        return selected
+
+    @staticmethod
+    def open_segment(path: str) -> np.ndarray:
+        count = os.path.getsize(path) // TICK_DTYPE.itemsize
+        if not count:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return np.memmap(path, dtype=TICK_DTYPE, mode="r", shape=(count,))
+
+    def iter_chunks(self, start_ms: int | None = None, end_ms: int | None = None, chunk_size: int = 1_000_000):
+        """Parcourt les ticks [start_ms, end_ms) par tranches (vues sans copie)."""
+        for path in self.segments(start_ms, end_ms):
+            ticks = self.open_segment(path)
+            lo = int(np.searchsorted(ticks["time"], start_ms, "left")) if start_ms is not None else 0
+            hi = int(np.searchsorted(ticks["time"], end_ms, "left")) if end_ms is not None else len(ticks)
+            for i in range(lo, hi, chunk_size):
+                yield ticks[i:min(i + chunk_size, hi)]
+
+    def read(self, start_ms: int | None = None, end_ms: int | None = None) -> np.ndarray:
+        """Tous les ticks de la plage (une vue si un seul segment, sinon une concaténation)."""
+        chunks = list(self.iter_chunks(start_ms, end_ms, chunk_size=2**62))
+        if not chunks:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def columns(self, start_ms: int | None = None, end_ms: int | None = None) -> dict:
+        """Ticks au format colonnes attendu par le backtest (time, price, qty)."""
+        ticks = self.read(start_ms, end_ms)
+        return {"time": ticks["time"], "price": ticks["price"], "qty": ticks["qty"]}
+
+
+def import_ws_log(paths, directory: str) -> int:
+    """Convertit les trades présents dans les logs WebSocket texte en segments binaires."""
+    recorder = TickRecorder(directory)
+    os.makedirs(directory, exist_ok=True)
+    rows = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                idx = line.find("Trade : {")
+                if idx < 0:
+                    continue
+                try:
+                    trade = ast.literal_eval(line[idx + len("Trade : "):].strip())
+                    rows.append((trade["product_id"], trade["time"], trade["price"], trade["qty"],
+                                 trade.get("side"), trade.get("uid")))
+                except Exception:
+                    continue
+    rows.sort(key=lambda r: r[1])
+    recorder._write(rows)
+    recorder.stop()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ticks binaires Kraken")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Importe les trades des logs WebSocket")
+    imp.add_argument("logs", nargs="+")
+    imp.add_argument("--out", required=True)
+    info = sub.add_parser("info", help="Résumé des segments enregistrés")
+    info.add_argument("--dir", required=True)
+    info.add_argument("--symbol", required=True)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        count = import_ws_log(args.logs, args.out)
+        print(f"{count} trades importés dans {args.out}")
+        return
+
+    reader = TickReader(args.dir, args.symbol)
+    for path in reader.segments():
+        ticks = TickReader.open_segment(path)
+        if len(ticks):
+            print(f"{os.path.basename(path)} : {len(ticks)} ticks | {ticks['time'][0]} -> {ticks['time'][-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Agrégation hiérarchique multi-timeframe (ex. 10s -> 1m -> 5m -> 15m -> 1h).
+
+Les ticks ne mettent à jour que la bougie de base (CandleAggregator). Chaque niveau
+supérieur est construit à partir des bougies *clôturées* du niveau inférieur : le coût
+par tick ne dépend pas du nombre de timeframes, et le coût par bougie de base est
+O(nombre de niveaux) au pire (cascade de clôtures aux frontières communes).
+"""
+from services.candle_store import CandleStore, to_heikin_ashi
+from utils.logger import setup_logger
+from config import CANDLE_HISTORY_SIZE, USE_HEIKIN_ASHI
+
+logger = setup_logger("WebSocket")
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_timeframe(timeframe) -> int:
+    """'10s', '1m', '15m', '1h'... -> secondes (un entier est accepté tel quel)."""
+    if isinstance(timeframe, int):
+        return timeframe
+    timeframe = timeframe.strip().lower()
+    try:
+        return int(timeframe[:-1]) * UNITS[timeframe[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f"Timeframe invalide : {timeframe}") from None
+
+
+def timeframe_label(seconds: int) -> str:
+    for unit in ("d", "h", "m"):
+        if seconds % UNITS[unit] == 0:
+            return f"{seconds // UNITS[unit]}{unit}"
+    return f"{seconds}s"
+
+
+class _Level:
+    __slots__ = ("label", "interval", "store", "current", "subscribers")
+
+    def __init__(self, label: str, interval: int, history_size: int):
+        self.label = label
+        self.interval = interval
+        self.store = CandleStore(history_size)
+        self.current = None      # Bougie en cours (jusqu'à la dernière sous-bougie clôturée)
+        self.subscribers = []    # (callback, kind)
+
+
+class TimeframeRollup:
+    """
+    Bougies brutes + Heikin Ashi des timeframes supérieurs d'un symbole.
+    Chaque timeframe doit être un multiple du précédent (et de l'intervalle de base).
+    """
+
+    def __init__(self, symbol: str, base_interval: int, timeframes, history_size: int = CANDLE_HISTORY_SIZE):
+        self.symbol = symbol
+        self.base_interval = base_interval
+        intervals = sorted({parse_timeframe(tf) for tf in timeframes})
+        self.levels = []
+        previous = base_interval
+        for interval in intervals:
+            if interval <= base_interval:
+                continue  # Le niveau de base est déjà tenu par CandleAggregator
+            if interval % previous:
+                raise ValueError(f"{timeframe_label(interval)} n'est pas un multiple de {timeframe_label(previous)}")
+            self.levels.append(_Level(timeframe_label(interval), interval, history_size))
+            previous = interval
+        self.by_label = {level.label: level for level in self.levels}
+
+    @property
+    def timeframes(self) -> list:
+        return [level.label for level in self.levels]
+
+    def _level(self, timeframe) -> _Level:
+        level = self.by_label.get(timeframe_label(parse_timeframe(timeframe)))
+        if level is None:
+            raise KeyError(f"Timeframe non agrégé pour {self.symbol} : {timeframe}")
+        return level
+
+    def subscribe(self, timeframe, callback, kind: str | None = None):
+        """
+        callback(candle) à chaque clôture du timeframe, avec la bougie HA ou brute
+        (`kind`, par défaut selon USE_HEIKIN_ASHI). Appelé depuis le thread qui clôture
+        la bougie de base (sous le verrou de l'agrégateur) : ne faire qu'empiler.
+        """
+        kind = kind or ("ha" if USE_HEIKIN_ASHI else "raw")
+        if kind not in ("raw", "ha"):
+            raise ValueError(f"Type de bougie inconnu : {kind}")
+        self._level(timeframe).subscribers.append((callback, kind))
+
+    def store(self, timeframe) -> CandleStore:
+        return self._level(timeframe).store
+
+    def current(self, timeframe) -> dict | None:
+        """Copie de la bougie en cours (agrège les sous-bougies déjà clôturées)."""
+        candle = self._level(timeframe).current
+        return dict(candle) if candle else None
+
+    # ---- Agrégation ----
+
+    def add(self, raw: dict):
+        """Intègre une bougie de base clôturée (brute)."""
+        if self.levels:
+            self._feed(0, raw)
+
+    def flush(self, boundary: int):
+        """
+        Clôture les bougies dont l'intervalle se termine au plus tard à `boundary`
+        (début de la bougie de base en cours) : aucune sous-bougie ne peut plus y entrer.
+        """
+        for index, level in enumerate(self.levels):
+            candle = level.current
+            if candle and candle["timestamp"] + level.interval <= boundary:
+                level.current = None
+                self._close(index, candle)
+
+    def _feed(self, index: int, candle: dict):
+        level = self.levels[index]
+        bucket = candle["timestamp"] // level.interval * level.interval
+        current = level.current
+        if current is not None:
+            if bucket == current["timestamp"]:
+                current["close"] = candle["close"]
+                if candle["high"] > current["high"]:
+                    current["high"] = candle["high"]
+                if candle["low"] < current["low"]:
+                    current["low"] = candle["low"]
+                current["volume"] += candle["volume"]
+                return
+            if bucket < current["timestamp"]:
+                logger.warning("[%s] Bougie %s en retard ignorée : %s", self.symbol, level.label, candle["timestamp"])
+                return
+            self._close(index, current)
+        level.current = {
+            "symbol": self.symbol,
+            "timestamp": bucket,
+            "open": candle["open"],
+            "high": candle["high"],
+            "low": candle["low"],
+            "close": candle["close"],
+            "volume": candle["volume"],
+        }
+
+    def _close(self, index: int, raw: dict):
+        level = self.levels[index]
+        ha = to_heikin_ashi(raw, level.store.last("ha"))
+        level.store.append(raw, ha)
+        for callback, kind in level.subscribers:
+            try:
+                callback(dict(ha if kind == "ha" else raw, timeframe=level.label))
+            except Exception as e:
+                logger.error("[%s] Erreur abonné %s : %s", self.symbol, level.label, e)
+        if index + 1 < len(self.levels):
+            self._feed(index + 1, raw)
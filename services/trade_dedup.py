@@ -0,0 +1,49 @@
+"""
+Dédoublonnage des trades d'un symbole entre flux live, trade_snapshot (100 derniers trades
+renvoyés à chaque abonnement) et historique REST rejoué après une coupure.
+
+Les trades Kraken arrivent dans l'ordre de leur horodatage : un trade plus récent que tous
+les précédents (cas courant) est nouveau sans recherche. Sinon son uid est cherché parmi les
+derniers trades, en deux générations de `size` uids : la plus ancienne est oubliée d'un bloc
+quand la récente est pleine (pas d'éviction par trade). Un trade antérieur aux générations
+conservées est considéré comme déjà vu.
+"""
+from config import WS_DEDUP_SIZE
+
+
+class TradeIndex:
+    __slots__ = ("size", "recent", "older", "edge", "older_edge", "floor", "duplicates")
+
+    def __init__(self, size: int = WS_DEDUP_SIZE):
+        self.size = size
+        self.recent = set()   # uids de la génération en cours
+        self.older = set()    # uids de la génération précédente
+        self.edge = -1        # Horodatage du trade le plus récent vu (ms)
+        self.older_edge = -1  # Horodatage le plus récent de la génération précédente
+        self.floor = -1       # Trades d'horodatage <= floor : hors fenêtre, considérés comme vus
+        self.duplicates = 0
+
+    def seen(self, time_ms: int, uid) -> bool:
+        """True si le trade a déjà été vu ; sinon il est mémorisé."""
+        if time_ms > self.edge:
+            self.edge = time_ms
+        elif time_ms <= self.floor or uid in self.recent or uid in self.older:
+            self.duplicates += 1
+            return True
+        if uid is not None:
+            recent = self.recent
+            recent.add(uid)
+            if len(recent) >= self.size:
+                self._rotate()
+        return False
+
+    def seed(self, time_ms: int, uids=()):
+        """Reprise après un rejeu (démarrage à chaud) : tout ce qui précède `time_ms` est déjà vu."""
+        self.floor = max(self.floor, time_ms - 1)
+        self.edge = max(self.edge, time_ms)
+        self.recent.update(uid for uid in uids if uid is not None)
+
+    def _rotate(self):
+        self.floor = max(self.floor, self.older_edge)
+        self.older_edge = self.edge
+        self.older, self.recent = self.recent, set()
@@ -1,161 +1,307 @@
 import json
+import random
 import threading
 import time
 import websocket
-from collections import deque
+from services.candle_aggregator import CandleAggregator
+from services.candle_scheduler import CandleScheduler, ExchangeClock
+from services.decoder import TradeDecoder
+from services.order_book import OrderBook, BOOK_MARKER
+from services.trade_dedup import TradeIndex
 from utils.logger import setup_logger
-from config import SYMBOL, OHLC_INTERVAL_SEC, USE_HEIKIN_ASHI
+from utils.metrics import metrics
+from config import (
+    SYMBOL, WS_JSON_BACKEND, WS_URL, TIMEFRAMES, USE_ORDER_BOOK, WS_RECONNECT_MIN_SEC, WS_RECONNECT_MAX_SEC,
+    WS_PING_SEC, WS_RESUME_TIMEOUT_SEC,
+)
 
 logger = setup_logger("WebSocket")
 
 class WebSocketClient:
-    def __init__(self, symbol: str, on_new_candle_callback):
-        self.symbol = symbol
+    def __init__(self, symbols, on_new_candle_callback, recorder=None, decoder=None, url: str = WS_URL,
+                 timeframes=TIMEFRAMES, books: bool = USE_ORDER_BOOK, exits=None, history=None, paper=None):
+        # Un seul symbole (str) ou plusieurs sur la même connexion
+        self.symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self.symbol = self.symbols[0]
+        self.url = url
+        self.recorder = recorder  # TickRecorder optionnel (ticks bruts sur disque)
+        self.decoder = decoder or TradeDecoder(WS_JSON_BACKEND)
         self.ws = None
         self.running = False
-        self.candle_data = deque()
-        self.current_candle = None
-        self.candle_start_time = None
+        self.aggregators = {symbol: CandleAggregator(symbol, timeframes=timeframes) for symbol in self.symbols}
         self.on_new_candle_callback = on_new_candle_callback
-        self.lock = threading.Lock()
+        # Clôture aux frontières d'intervalle (horloge Kraken), un seul timer pour tous les symboles
+        self.clock = ExchangeClock()
+        self.scheduler = CandleScheduler(self.aggregators, self._emit_timed, self.clock)
+        # Carnets L2 par symbole (flux book), None si désactivés
+        self.books = {symbol: OrderBook(symbol) for symbol in self.symbols} if books else None
+        # Trades déjà vus par symbole : snapshot à l'abonnement, rejeu au démarrage et après coupure
+        self.seen = {symbol: TradeIndex() for symbol in self.symbols}
+        self.exits = exits  # ExitEngine optionnel : sorties surveillées à chaque trade
+        self.paper = paper  # PaperExecutor optionnel : ordres simulés exécutés sur les trades
+        self.history = history  # KrakenTradeHistory optionnel : trades manqués pendant une coupure
+        self.stopped = threading.Event()
+        self.connected = False
+        self.attempt = 0            # Tentatives de reconnexion depuis la dernière ouverture
+        self.disconnected_at = None  # time.monotonic() de la dernière coupure
+        self.reconnects = 0
+        self.backfilled = 0         # Trades rattrapés par l'historique REST après une coupure
+        # Rattrapage en cours (thread dédié) : les trades live reçus entre-temps sont mis en attente
+        # puis fusionnés après l'historique, dans l'ordre, via le TradeIndex
+        self.backfill_lock = threading.Lock()
+        self.backfilling = False
+        self.gap_again = False      # Nouvelle coupure pendant le rattrapage : une passe de plus
+        self.buffered = []          # (received_ns, trades) reçus pendant le rattrapage
+
+    @property
+    def candles(self):
+        """Historique du premier symbole (compatibilité mono-symbole)."""
+        return self.aggregators[self.symbol].candles
+
+    def subscribe(self, timeframe, callback, symbol=None, kind=None):
+        """Abonne `callback` aux clôtures d'un timeframe supérieur (tous les symboles par défaut)."""
+        symbols = [symbol] if symbol else self.symbols
+        for name in symbols:
+            rollup = self.aggregators[name].rollup
+            if rollup is None:
+                raise KeyError(f"Aucun timeframe supérieur agrégé pour {name}")
+            rollup.subscribe(timeframe, callback, kind)
+
+    def resume_after(self, symbol: str, time_ms: int, uids=()):
+        """Ignore les trades déjà rejoués par le démarrage à chaud (renvoyés par le trade_snapshot)."""
+        self.seen[symbol].seed(time_ms, uids)
 
     def start(self):
         self.running = True
-        self.ws = websocket.WebSocketApp(
-            "wss://futures.kraken.com/ws/v1",
-            on_open=self.on_open,
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close,
-        )
-        threading.Thread(target=self.ws.run_forever, daemon=True).start()
+        self.stopped.clear()
+        if self.recorder:
+            self.recorder.start()
+        # Pas de clôture avant le premier snapshot : les bougies rejouées restent ouvertes
+        self.scheduler.pause()
+        threading.Thread(target=self._run, name="websocket", daemon=True).start()
         logger.info("WebSocket client démarré.")
-        threading.Thread(target=self._candle_loop, daemon=True).start()
+        self.scheduler.start()
 
     def stop(self):
         self.running = False
+        self.stopped.set()
+        self.scheduler.stop()
         if self.ws:
             self.ws.close()
+        if self.recorder:
+            self.recorder.stop()
+
+    def _run(self):
+        """Connexion, puis reconnexion après chaque coupure tant que le client tourne."""
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self.on_open,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close,
+            )
+            self.ws.run_forever(ping_interval=WS_PING_SEC, ping_timeout=WS_PING_SEC / 2)
+            if not self.running:
+                return
+            if self.disconnected_at is None:
+                self._disconnected()  # Échec de connexion sans on_close
+            delay = self.backoff(self.attempt)
+            self.attempt += 1
+            logger.warning("Reconnexion dans %.0fms (tentative %d)", delay * 1000, self.attempt)
+            if self.stopped.wait(delay):
+                return
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """Attente avant la tentative `attempt` : full jitter sur un plafond exponentiel."""
+        return random.uniform(0, min(WS_RECONNECT_MAX_SEC, WS_RECONNECT_MIN_SEC * 2 ** attempt))
+
+    def _disconnected(self):
+        self.connected = False
+        self.disconnected_at = time.monotonic()
+        self.scheduler.pause()  # Trades manquants : pas de bougie remplie à plat avant le rattrapage
+        for book in (self.books or {}).values():
+            book.invalidate()
 
     def on_open(self, ws):
-        logger.info("Connexion ouverte au WebSocket Kraken.")
-        logger.info(f"Abonnement au flux Kraken pour {self.symbol}")
+        logger.info("Connexion ouverte au WebSocket Kraken (%s).", self.url)
+        self.connected = True
+        self.attempt = 0
+        if self.disconnected_at is not None:
+            self.reconnects += 1
+            if self.history:
+                self._start_backfill()
+        logger.info("Abonnement au flux Kraken pour %s", ', '.join(self.symbols))
         payload = {
             "event": "subscribe",
             "feed": "trade",
-            "product_ids": [self.symbol]
+            "product_ids": self.symbols
         }
         ws.send(json.dumps(payload))
+        if self.books is not None:
+            ws.send(json.dumps({"event": "subscribe", "feed": "book", "product_ids": self.symbols}))
+        # Reprise des clôtures au premier message de trades (snapshot), ou à défaut après un délai ;
+        # pendant un rattrapage, à la fin de celui-ci
+        if not self.backfilling:
+            self.scheduler.pause(WS_RESUME_TIMEOUT_SEC)
+        if self.disconnected_at is not None:
+            metrics.observe("ws_reconnect", "all", time.monotonic() - self.disconnected_at)
+            logger.info("Flux rétabli en %.0fms (reconnexion n°%d)", (time.monotonic() - self.disconnected_at) * 1000,
+                        self.reconnects)
+            self.disconnected_at = None
+
+    def _start_backfill(self):
+        """
+        Rattrapage des trades publiés pendant la coupure (pagination REST, potentiellement
+        lente) dans un thread dédié : le thread WebSocket se réabonne aussitôt.
+        """
+        with self.backfill_lock:
+            if self.backfilling:
+                self.gap_again = True
+                return
+            self.backfilling = True
+        threading.Thread(target=self._backfill_gap, name="ws-backfill", daemon=True).start()
+
+    def _backfill_gap(self):
+        """Historique REST puis trades live mis en attente, dédoublonnés par le TradeIndex."""
+        while True:
+            try:
+                self._replay_history()
+            except Exception as e:
+                logger.error("Erreur de rattrapage après coupure : %s", e)
+            with self.backfill_lock:
+                if self.gap_again and self.running:
+                    self.gap_again = False
+                    continue
+                # Sous le verrou : les messages suivants attendent, ils ne passent pas devant
+                buffered, self.buffered = self.buffered, []
+                for received_ns, trades in buffered:
+                    self._process_trades(trades, received_ns)
+                self.backfilling = False
+                break
+        logger.info("Rattrapage terminé : %d message(s) live fusionné(s)", len(buffered))
+        if self.connected:
+            self.scheduler.resume()
+            self.scheduler.tick()  # Intervalles échus pendant la coupure, désormais complets
+
+    def _replay_history(self):
+        """Trades de chaque symbole publiés depuis le dernier vu (historique REST)."""
+        received_ns = time.perf_counter_ns()
+        for symbol, index in self.seen.items():
+            if index.edge < 0:
+                continue
+            replayed = 0
+            for time_ms, price, qty, uid, side in self.history.trades(symbol, index.edge):
+                if index.seen(time_ms, uid):
+                    continue
+                if self.recorder:
+                    self.recorder.record(symbol, time_ms, price, qty, side, uid)
+                if self.paper:
+                    self.paper.on_tick(symbol, price, time_ms)
+                if self.exits:
+                    self.exits.on_tick(symbol, price, time_ms, received_ns)
+                self._update_candle(price, qty, time_ms // 1000, symbol)
+                replayed += 1
+            self.backfilled += replayed
+            logger.info("[%s] %d trade(s) manqué(s) rattrapé(s) par l'historique", symbol, replayed)
 
     def on_message(self, ws, message):
-        try:
-            data = json.loads(message)
-        except Exception as e:
-            logger.error(f"[WS] Erreur parsing JSON : {e} | Message : {message}")
+        if self.books is not None and BOOK_MARKER in message:
+            self._on_book(message)
             return
-
-        # Events système : info, subscribed, etc.
-        if "event" in data:
-            #logger.debug(f"[WS RAW EVENT] {data}")
+        # Heartbeats, events et autres flux sont écartés par le décodeur avant parsing
+        trades = self.decoder.decode(message, self.symbol)
+        if not trades:
             return
 
-        # Selon le type de flux Kraken :
-        if data.get("feed") == "trade_snapshot":
-            trades = data.get("trades", [])
-        elif data.get("feed") == "trade":
-            trades = [data]
-        else:
-            # Autre type de message
-            #logger.debug(f"[WS RAW OTHER] {data}")
-            return
+        # Délai plateforme -> réception (horloges murales Kraken / locale), un point par message
+        last = trades[-1]
+        now = time.time()
+        metrics.observe("ws_receive", last.symbol, max(now - last.time / 1000, 0.0))
+        self.clock.update(last.time, now * 1000)
 
+        received_ns = time.perf_counter_ns() if self.exits else 0
+        if self.backfilling:
+            with self.backfill_lock:
+                if self.backfilling:
+                    self.buffered.append((received_ns, trades))
+                    return
+        self._process_trades(trades, received_ns)
+        if self.scheduler.paused_until:
+            self.scheduler.resume()
+            self.scheduler.tick()
+
+    def _process_trades(self, trades, received_ns: int):
+        seen, exits, paper = self.seen, self.exits, self.paper
         for trade in trades:
-            try:
-                price = float(trade["price"])
-                qty = float(trade["qty"])
-                ts = int(trade["time"] // 1000)
-                self._update_candle(price, qty, ts)
-            except Exception as e:
-                logger.error(f"[WS] Erreur parsing trade : {e} | Trade : {trade}")
+            index = seen.get(trade.symbol)
+            if index is not None and index.seen(trade.time, trade.uid):
+                continue  # Déjà reçu (snapshot) ou rejoué
+            if self.recorder:
+                self.recorder.record(trade.symbol, trade.time, trade.price, trade.qty, trade.side, trade.uid)
+            if paper:
+                paper.on_tick(trade.symbol, trade.price, trade.time)
+            if exits:
+                exits.on_tick(trade.symbol, trade.price, trade.time, received_ns)
+            self._update_candle(trade.price, trade.qty, trade.time // 1000, trade.symbol)
+
+    def _on_book(self, message):
+        try:
+            data = self.decoder.loads(message)
+        except ValueError as e:
+            logger.error("[WS] Erreur parsing carnet : %s", e)
+            return
+        book = self.books.get(data.get("product_id"))
+        if book is None or "event" in data:
+            return
+        feed = data.get("feed")
+        if feed == "book":
+            if not book.apply_delta(data["side"], float(data["price"]), float(data["qty"]), data["seq"],
+                                    data.get("timestamp", 0)):
+                self._resync_book(book)
+        elif feed == "book_snapshot":
+            book.apply_snapshot(data.get("bids", ()), data.get("asks", ()), data["seq"], data.get("timestamp", 0))
+            logger.info("[BOOK] Carnet %s synchronisé (%s bids / %s asks)", book.symbol, len(book.bids), len(book.asks))
+
+    def _resync_book(self, book: OrderBook):
+        """Trou de séquence : réabonnement au carnet du symbole pour recevoir un nouveau snapshot."""
+        if book.resyncing or not self.ws:
+            return
+        book.resyncing = True
+        for event in ("unsubscribe", "subscribe"):
+            self.ws.send(json.dumps({"event": event, "feed": "book", "product_ids": [book.symbol]}))
 
     def on_error(self, ws, error):
-        logger.error(f"WebSocket error : {error}")
+        logger.error("WebSocket error : %s", error)
 
     def on_close(self, ws, close_status_code, close_msg):
         logger.warning("Connexion WebSocket fermée.")
+        self._disconnected()
 
-    def _update_candle(self, price, volume, timestamp):
-        with self.lock:
-            if not self.current_candle:
-                logger.info(f"[WS] Premier trade reçu - Initialisation bougie à {price}")
-                self.current_candle = {
-                    "symbol": self.symbol,
-                    "timestamp": int(timestamp // OHLC_INTERVAL_SEC * OHLC_INTERVAL_SEC),
-                    "open": price,
-                    "high": price,
-                    "low": price,
-                    "close": price,
-                    "volume": volume,
-                }
-                return
-
-            candle_ts = self.current_candle["timestamp"]
-            if timestamp < candle_ts + OHLC_INTERVAL_SEC:
-                self.current_candle["close"] = price
-                self.current_candle["high"] = max(self.current_candle["high"], price)
-                self.current_candle["low"] = min(self.current_candle["low"], price)
-                self.current_candle["volume"] += volume
-                #logger.debug(f"[WS] Mise à jour bougie : {self.current_candle}")
-            else:
-                finalized = self.current_candle.copy()
-                if USE_HEIKIN_ASHI:
-                    finalized = self._to_heikin_ashi(finalized)
-                self.candle_data.append(finalized)
-                logger.info(f"[WS] Bougie finalisée : {finalized}")
-                # Envoi du callback pour stockage ou stratégie
-                self.on_new_candle_callback(finalized)
-                self.current_candle = {
-                    "symbol": self.symbol,
-                    "timestamp": int(timestamp // OHLC_INTERVAL_SEC * OHLC_INTERVAL_SEC),
-                    "open": price,
-                    "high": price,
-                    "low": price,
-                    "close": price,
-                    "volume": volume,
-                }
-
-    def _candle_loop(self):
-        while self.running:
-            #logger.debug("[WS] Boucle _candle_loop en cours...")
-            time.sleep(OHLC_INTERVAL_SEC + 1)
-            with self.lock:
-                if self.current_candle:
-                    now = int(time.time())
-                    if now > self.current_candle["timestamp"] + OHLC_INTERVAL_SEC:
-                        finalized = self.current_candle.copy()
-                        if USE_HEIKIN_ASHI:
-                            finalized = self._to_heikin_ashi(finalized)
-                        self.candle_data.append(finalized)
-                        logger.info(f"[WS] Bougie générée par timeout : {finalized}")
-                        self.on_new_candle_callback(finalized)
-                        self.current_candle = None
-
-    def _to_heikin_ashi(self, candle):
-        if not self.candle_data:
-            ha_open = (candle["open"] + candle["close"]) / 2
-        else:
-            ha_open = (self.candle_data[-1]["open"] + self.candle_data[-1]["close"]) / 2
-
-        ha_close = (candle["open"] + candle["high"] + candle["low"] + candle["close"]) / 4
-        ha_high = max(candle["high"], ha_open, ha_close)
-        ha_low = min(candle["low"], ha_open, ha_close)
+    def _update_candle(self, price, volume, timestamp, symbol=None):
+        aggregator = self.aggregators.get(symbol or self.symbol)
+        if aggregator is None:
+            return
+        # Émission sous le verrou, comme le scheduler : une clôture à l'échéance concurrente ne
+        # peut pas s'intercaler entre la mise à jour et l'envoi (ordre des bougies préservé)
+        with aggregator.lock:
+            closed = aggregator.update(price, volume, timestamp)
+            if closed:
+                for finalized in closed:
+                    logger.info("[WS] Bougie finalisée : %s", finalized)
+                    # Envoi du callback pour stockage ou stratégie
+                    self.on_new_candle_callback(finalized)
 
+    def stats(self) -> dict:
         return {
-            "symbol": candle["symbol"],
-            "timestamp": candle["timestamp"],
-            "open": ha_open,
-            "high": ha_high,
-            "low": ha_low,
-            "close": ha_close,
-            "volume": candle["volume"],
+            "reconnects": self.reconnects,
+            "connected": self.connected,
+            "duplicates": sum(index.duplicates for index in self.seen.values()),
+            "backfilled": self.backfilled,
         }
+
+    def _emit_timed(self, finalized):
+        """Bougie clôturée par l'horloge (intervalle échu sans trade suivant, ou sans trade du tout)."""
+        logger.info("[WS] Bougie clôturée à l'échéance : %s", finalized)
+        self.on_new_candle_callback(finalized)
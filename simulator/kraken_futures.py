@@ -0,0 +1,707 @@
+"""
+Simulateur local de Kraken Futures pour les tests de charge et d'endurance.
+
+- WebSocket (ws://) : flux `trade` avec `trade_snapshot` à l'abonnement, ticks synthétiques
+  (débit configurable, jusqu'à plusieurs dizaines de milliers par seconde) ou rejoués
+  depuis les ticks enregistrés (TickRecorder), accélérés ou non.
+- REST (http://) : `sendorder`, `batchorder`, `openpositions`, `openorders`, `instruments`
+  et l'historique public `history` (démarrage à chaud) au format Kraken, signatures vérifiées
+  si le secret est fourni, ordres au marché (et IOC dans leur limite) exécutés au dernier prix,
+  TP / SL résidents déclenchés par les trades publiés.
+- Flux privés (challenge signé vérifié si le secret est fourni) : `fills`, `open_orders`,
+  `open_positions`, `balances`, avec leurs snapshots à l'abonnement.
+- Injection de latence (REST et flux), d'erreurs Kraken, d'erreurs HTTP, de timeouts
+  et de déconnexions WebSocket.
+
+Usage :
+    python -m simulator.kraken_futures --symbols PF_ETHUSD,PF_XBTUSD --rate 20000
+    python -m simulator.kraken_futures --rate 20 --history-sec 3600   # Historique déjà disponible
+    python -m simulator.kraken_futures --replay data/ticks --speed 10 --loop \\
+        --latency-ms 5,50 --error-rate 0.01 --timeout-rate 0.001 --drop-every 3600
+    python -m simulator.kraken_futures --rate 50 --drop-every 30 --outage-sec 5   # Coupures avec trou à rattraper
+
+Puis lancer le bot contre le simulateur :
+    KRAKEN_WS_URL=ws://127.0.0.1:8765 \\
+    KRAKEN_REST_URL=http://127.0.0.1:8766/derivatives/api/v3 python main.py
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from services.account_feed import PRIVATE_FEEDS, sign_challenge
+from services.tick_recorder import TickReader, SIDE_NAMES
+from simulator.ws_server import WebSocketServer, encode_frame
+from utils.logger import setup_logger
+from utils.metrics import process_memory_bytes
+
+logger = setup_logger("Simulator")
+
+REST_PREFIX = "/derivatives/api/v3"
+SNAPSHOT_SIZE = 100  # Trades envoyés dans le trade_snapshot (comme Kraken)
+HISTORY_PAGE = 100   # Trades par page de GET /history (comme Kraken)
+HISTORY_SIZE = 100_000  # Trades conservés par symbole pour /history et le snapshot
+FILLS_SNAPSHOT = 100    # Exécutions envoyées dans le fills_snapshot
+SIM_BALANCE = 10_000.0  # Collatéral USD initial du compte simulé
+SIM_LEVERAGE = 10       # Marge utilisée = notionnel / levier
+
+
+# ---- Sources de ticks ----
+
+class SyntheticSource:
+    """Marche aléatoire par symbole à `rate_per_sec` trades par seconde et par symbole."""
+
+    def __init__(self, symbols, rate_per_sec: float, seed: int = 42, start_price: float = 2500.0,
+                 volatility: float = 0.0002):
+        self.symbols = list(symbols)
+        self.rate = rate_per_sec
+        self.volatility = volatility
+        self.rng = random.Random(seed)
+        self.prices = {symbol: start_price * (1 + i) for i, symbol in enumerate(self.symbols)}
+        self.owed = 0.0
+        self.last_ms = None
+
+    def due(self, now_ms: int) -> list:
+        """Trades (symbole, time, price, qty, side) échus depuis le dernier appel."""
+        if self.last_ms is None:
+            self.last_ms = now_ms
+            return []
+        self.owed += (now_ms - self.last_ms) / 1000 * self.rate
+        count = int(self.owed)
+        if not count:
+            return []
+        self.owed -= count
+        rng, gauss, out = self.rng, self.rng.gauss, []
+        span = now_ms - self.last_ms
+        for k in range(count):
+            time_ms = self.last_ms + span * (k + 1) // count
+            for symbol in self.symbols:
+                price = self.prices[symbol] = round(self.prices[symbol] * (1 + gauss(0, self.volatility)), 2)
+                out.append((symbol, time_ms, price, round(rng.expovariate(2), 3),
+                            "buy" if rng.random() < 0.5 else "sell"))
+        self.last_ms = now_ms
+        return out
+
+
+class ReplaySource:
+    """
+    Rejoue les ticks enregistrés (TickRecorder) de plusieurs symboles, fusionnés par horodatage,
+    recalés sur l'heure courante et accélérés de `speed`. `loop` recommence à la fin.
+    """
+
+    def __init__(self, directory: str, symbols, speed: float = 1.0, loop: bool = False):
+        self.symbols = list(symbols)
+        self.speed = speed
+        self.loop = loop
+        parts = []
+        for index, symbol in enumerate(self.symbols):
+            ticks = TickReader(directory, symbol).read()
+            if len(ticks):
+                parts.append((ticks, np.full(len(ticks), index, dtype=np.int16)))
+        if not parts:
+            raise ValueError(f"Aucun tick enregistré dans {directory} pour {', '.join(self.symbols)}")
+        ticks = np.concatenate([p[0] for p in parts])
+        owners = np.concatenate([p[1] for p in parts])
+        order = np.argsort(ticks["time"], kind="stable")
+        self.ticks = ticks[order]
+        self.owners = owners[order]
+        self.offsets = self.ticks["time"] - self.ticks["time"][0]
+        self.duration = int(self.offsets[-1]) + 1
+        self.start_ms = None
+        self.position = 0
+        self.laps = 0
+
+    def due(self, now_ms: int) -> list:
+        if self.start_ms is None:
+            self.start_ms = now_ms
+        elapsed = (now_ms - self.start_ms) * self.speed - self.laps * self.duration
+        end = int(np.searchsorted(self.offsets, elapsed, "right"))
+        out = []
+        for i in range(self.position, end):
+            tick = self.ticks[i]
+            time_ms = self.start_ms + int((self.offsets[i] + self.laps * self.duration) / self.speed)
+            out.append((self.symbols[self.owners[i]], time_ms, float(tick["price"]), float(tick["qty"]),
+                        SIDE_NAMES.get(int(tick["side"])) or "buy"))
+        self.position = end
+        if end == len(self.ticks) and self.loop:
+            self.laps += 1
+            self.position = 0
+        return out
+
+
+# ---- Bourse simulée ----
+
+class KrakenFuturesSimulator:
+    def __init__(self, source, symbols, host: str = "127.0.0.1", ws_port: int = 8765, rest_port: int = 8766,
+                 api_secret: str | None = None, latency_ms=(0.0, 0.0), feed_delay_ms=(0.0, 0.0),
+                 error_rate: float = 0.0, http_error_rate: float = 0.0, timeout_rate: float = 0.0,
+                 timeout_sec: float = 10.0, drop_every_sec: float = 0.0, tick_interval: float = 0.005,
+                 seed: int = 0, outage_sec: float = 0.0):
+        self.source = source
+        self.symbols = list(symbols)
+        self.api_secret = base64.b64decode(api_secret) if api_secret else None
+        self.latency_ms = latency_ms
+        self.feed_delay_ms = feed_delay_ms
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_sec = timeout_sec
+        self.drop_every_sec = drop_every_sec
+        self.outage_sec = outage_sec  # Connexions refusées après chaque coupure (trades manqués)
+        self.tick_interval = tick_interval
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.last_price = {}
+        # Trades publiés par symbole : (seq, time ms, price, qty, side, uid)
+        self.recent = {symbol: deque(maxlen=HISTORY_SIZE) for symbol in self.symbols}
+        self.orders = {}       # Ordres résidents (TP/SL, limites) par order_id
+        self.positions = {}    # Position nette par symbole : {"size" (signée), "price" (prix moyen), "fillTime"}
+        self.order_seq = 0
+        self.fills = deque(maxlen=FILLS_SNAPSHOT)  # Exécutions récentes (format du flux fills)
+        self.balance = SIM_BALANCE
+
+        # Compteurs
+        self.ticks_sent = 0
+        self.orders_received = 0
+        self.injected = {"latency": 0, "error": 0, "http_error": 0, "timeout": 0, "drop": 0}
+        self.auth_failures = 0
+
+        self.running = False
+        self.ws = WebSocketServer((host, ws_port), on_connect=self._on_connect, on_message=self._on_ws_message)
+        self.rest = ThreadingHTTPServer((host, rest_port), _rest_handler(self))
+        self.rest.daemon_threads = True
+
+    @property
+    def ws_url(self) -> str:
+        host, port = self.ws.server_address[:2]
+        return f"ws://{host}:{port}"
+
+    @property
+    def rest_url(self) -> str:
+        host, port = self.rest.server_address[:2]
+        return f"http://{host}:{port}{REST_PREFIX}"
+
+    def start(self):
+        self.running = True
+        self.ws.start()
+        threading.Thread(target=self.rest.serve_forever, name="sim-rest", daemon=True).start()
+        threading.Thread(target=self._feed_loop, name="sim-feed", daemon=True).start()
+        logger.info("[SIM] Kraken Futures simulé : WS %s | REST %s", self.ws_url, self.rest_url)
+        return self
+
+    def prefill(self, seconds: float):
+        """Génère `seconds` secondes de trades passés (source synthétique), servis par /history."""
+        now = int(time.time() * 1000)
+        self.source.last_ms = now - int(seconds * 1000)
+        for step_ms in range(self.source.last_ms + 1000, now + 1, 1000):
+            self._publish(self.source.due(step_ms))
+        return self
+
+    def stop(self):
+        self.running = False
+        self.ws.drop_all()
+        self.ws.shutdown()
+        self.rest.shutdown()
+        self.ws.server_close()
+        self.rest.server_close()
+
+    def _random(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def _uniform(self, bounds) -> float:
+        low, high = bounds
+        with self.rng_lock:
+            return self.rng.uniform(low, high) if high > low else low
+
+    # ---- WebSocket ----
+
+    def _on_connect(self, conn):
+        conn.send_text(json.dumps({"event": "info", "version": 1}))
+
+    def _on_ws_message(self, conn, text: str):
+        try:
+            request = json.loads(text)
+        except ValueError:
+            conn.send_text(json.dumps({"event": "error", "message": "Json Error"}))
+            return
+        event, feed = request.get("event"), request.get("feed")
+        products = request.get("product_ids") or []
+        if event == "challenge":
+            conn.challenge = str(uuid.uuid4())
+            conn.send_text(json.dumps({"event": "challenge", "message": conn.challenge}))
+            return
+        if feed in PRIVATE_FEEDS and event in ("subscribe", "unsubscribe"):
+            self._on_private(conn, event, feed, request)
+            return
+        if feed != "trade" or event not in ("subscribe", "unsubscribe"):
+            conn.send_text(json.dumps({"event": "error", "message": f"Unsupported request: {event} {feed}"}))
+            return
+        unknown = [p for p in products if p not in self.recent]
+        if unknown or not products:
+            conn.send_text(json.dumps({"event": "error", "message": "Invalid product id"}))
+            return
+
+        if event == "unsubscribe":
+            conn.subscriptions.difference_update(products)
+            conn.send_text(json.dumps({"event": "unsubscribed", "feed": feed, "product_ids": products}))
+            return
+
+        conn.send_text(json.dumps({"event": "subscribed", "feed": feed, "product_ids": products}))
+        frames = []
+        with self.lock:
+            # Snapshot puis abonnement sous le même verrou : aucun trade perdu ni dupliqué entre les deux
+            for symbol in products:
+                trades = [_trade_message(symbol, t) for t in islice(reversed(self.recent[symbol]), SNAPSHOT_SIZE)]
+                snapshot = {"feed": "trade_snapshot", "product_id": symbol, "trades": trades}
+                frames.append(encode_frame(json.dumps(snapshot, separators=(",", ":")).encode()))
+            conn.send(b"".join(frames))
+            conn.subscriptions.update(products)
+
+    def _on_private(self, conn, event: str, feed: str, request: dict):
+        if event == "unsubscribe":
+            conn.private.discard(feed)
+            conn.send_text(json.dumps({"event": "unsubscribed", "feed": feed}))
+            return
+        challenge = request.get("original_challenge")
+        signed = request.get("signed_challenge", "")
+        if not challenge or challenge != conn.challenge or (
+                self.api_secret is not None and not hmac.compare_digest(sign_challenge(self.api_secret, challenge), signed)):
+            self.auth_failures += 1
+            conn.send_text(json.dumps({"event": "alert", "message": "Failed to subscribe to authenticated feed"}))
+            return
+        conn.send_text(json.dumps({"event": "subscribed", "feed": feed}))
+        with self.lock:
+            if feed == "fills":
+                snapshot = {"feed": "fills_snapshot", "account": "sim", "fills": list(self.fills)}
+            elif feed == "open_orders":
+                snapshot = {"feed": "open_orders_snapshot", "account": "sim",
+                            "orders": [self._private_order(o) for o in self.orders.values()]}
+            elif feed == "open_positions":
+                snapshot = self._positions_message()
+            else:
+                snapshot = dict(self._balances_message(), feed="balances_snapshot")
+            conn.send_text(json.dumps(snapshot))
+            conn.private.add(feed)
+
+    def _push_private(self, feed: str, message: dict):
+        """Message de flux privé vers les connexions abonnées (appelé sous self.lock : ordre préservé)."""
+        with self.ws.lock:
+            connections = [conn for conn in self.ws.connections if feed in conn.private]
+        if connections:
+            text = json.dumps(message)
+            for conn in connections:
+                conn.send_text(text)
+
+    @staticmethod
+    def _private_order(order: dict) -> dict:
+        return {"instrument": order["symbol"], "time": order["receivedTime"], "last_update_time": order["receivedTime"],
+                "qty": float(order["size"]), "filled": 0.0, "limit_price": order.get("limitPrice"),
+                "stop_price": order.get("stopPrice"), "type": "stop" if order["orderType"] == "stp" else order["orderType"],
+                "order_id": order["order_id"], "cli_ord_id": order.get("cliOrdId"),
+                "direction": 0 if order["side"] == "buy" else 1, "reduce_only": bool(order.get("reduceOnly")),
+                "triggerSignal": order.get("triggerSignal", "last")}
+
+    def _positions_message(self) -> dict:
+        return {"feed": "open_positions", "account": "sim", "positions": [
+            {"instrument": symbol, "balance": p["size"], "entry_price": p["price"],
+             "mark_price": self.last_price.get(symbol, p["price"]),
+             "pnl": (self.last_price.get(symbol, p["price"]) - p["price"]) * p["size"]}
+            for symbol, p in self.positions.items()
+        ]}
+
+    def _balances_message(self) -> dict:
+        used = sum(abs(p["size"]) * self.last_price.get(symbol, p["price"]) for symbol, p in self.positions.items())
+        unrealized = sum((self.last_price.get(symbol, p["price"]) - p["price"]) * p["size"]
+                         for symbol, p in self.positions.items())
+        return {"feed": "balances", "account": "sim", "flex_futures": {
+            "currencies": {"USD": {"quantity": self.balance, "value": self.balance, "available": self.balance}},
+            "balance_value": self.balance,
+            "portfolio_value": self.balance + unrealized,
+            "available_margin": self.balance + unrealized - used / SIM_LEVERAGE,
+        }}
+
+    def _feed_loop(self):
+        delayed = deque()  # (échéance, trames par symbole) pour la latence du flux
+        next_drop = time.monotonic() + self.drop_every_sec if self.drop_every_sec else None
+        while self.running:
+            time.sleep(self.tick_interval)
+            now = time.monotonic()
+            if next_drop and now >= next_drop:
+                self.injected["drop"] += self.ws.drop_all(self.outage_sec)
+                next_drop = now + self.drop_every_sec
+
+            trades = self.source.due(int(time.time() * 1000))
+            if trades:
+                delay = self._uniform(self.feed_delay_ms) / 1000
+                # Jamais avant le lot précédent : l'ordre des trades est préservé
+                due = max(now + delay, delayed[-1][0]) if delayed else now + delay
+                delayed.append((due, self._publish(trades)))
+            while delayed and delayed[0][0] <= now:
+                self._broadcast(delayed.popleft()[1])
+
+    def _publish(self, trades) -> dict:
+        """Met à jour l'état du marché et encode les trames par symbole."""
+        frames = {}
+        with self.lock:
+            for symbol, time_ms, price, qty, side in trades:
+                self.seq += 1
+                seq = self.seq
+                uid = f"00000000-0000-4000-8000-{seq:012x}"
+                message = (f'{{"feed":"trade","product_id":"{symbol}","uid":"{uid}","side":"{side}",'
+                           f'"type":"fill","seq":{seq},"time":{time_ms},"qty":{qty},"price":{price}}}')
+                frames.setdefault(symbol, []).append(encode_frame(message.encode()))
+                self.last_price[symbol] = price
+                self.recent[symbol].append((seq, time_ms, price, qty, side, uid))
+                if self.orders:
+                    self._trigger(symbol, price, time_ms)
+        self.ticks_sent += len(trades)
+        return {symbol: b"".join(parts) for symbol, parts in frames.items()}
+
+    def _broadcast(self, frames: dict):
+        with self.ws.lock:
+            connections = list(self.ws.connections)
+        for conn in connections:
+            data = b"".join(frames[s] for s in conn.subscriptions if s in frames)
+            if data:
+                conn.send(data)
+
+    # ---- REST ----
+
+    def check_auth(self, headers, body: bytes) -> bool:
+        if self.api_secret is None:
+            return True
+        nonce = headers.get("Nonce", "")
+        expected = base64.b64encode(hmac.new(self.api_secret, nonce.encode() + body, hashlib.sha256).digest()).decode()
+        return hmac.compare_digest(expected, headers.get("Authent", ""))
+
+    def _next_order_id(self) -> str:
+        self.order_seq += 1
+        return f"sim-{self.order_seq:08d}"
+
+    def place(self, order: dict) -> dict:
+        """Traite une instruction (envoi ou annulation). Retourne le statut au format Kraken."""
+        now = int(time.time() * 1000)
+        with self.lock:
+            if order.get("order") == "cancel":
+                found = self.orders.pop(order.get("order_id"), None)
+                if found:
+                    self._push_private("open_orders", {"feed": "open_orders", "order_id": order.get("order_id"),
+                                                       "is_cancel": True, "reason": "cancelled_by_user"})
+                return {"order_id": order.get("order_id"), "status": "cancelled" if found else "notFound"}
+
+            symbol, side, size = order.get("symbol"), order.get("side"), float(order.get("size", 0))
+            status = {"order_id": self._next_order_id(), "receivedTime": now, "orderEvents": []}
+            if "order_tag" in order:
+                status["order_tag"] = order["order_tag"]
+            if symbol not in self.recent or side not in ("buy", "sell") or size <= 0:
+                return dict(status, status="invalidArgument")
+            order_type = order.get("orderType")
+            if order_type in ("mkt", "ioc"):
+                price = self.last_price.get(symbol)
+                if price is None:
+                    return dict(status, status="marketSuspended")
+                if order_type == "ioc":
+                    limit = float(order.get("limitPrice", 0))
+                    if (price > limit) if side == "buy" else (price < limit):
+                        return dict(status, status="iocWouldNotExecute")
+                error = self._fill(dict(order, order_id=status["order_id"]), price, now)
+                if error:
+                    return dict(status, status=error)
+                status["orderEvents"].append({"type": "EXECUTION", "price": price, "amount": size})
+                return dict(status, status="placed")
+            if order_type in ("lmt", "stp", "take_profit"):
+                resting = self.orders[status["order_id"]] = dict(order, order_id=status["order_id"], receivedTime=now)
+                self._push_private("open_orders", {"feed": "open_orders", "order": self._private_order(resting),
+                                                   "is_cancel": False, "reason": "new_placed_order_by_user"})
+                status["orderEvents"].append({"type": "PLACE", "order": {"orderId": status["order_id"]}})
+                return dict(status, status="placed")
+            return dict(status, status="invalidOrderType")
+
+    def _fill(self, order: dict, price: float, now: int) -> str | None:
+        """Exécute un ordre au marché (sous self.lock). Retourne le statut d'erreur Kraken, ou None."""
+        symbol, side, size = order["symbol"], order["side"], float(order["size"])
+        signed = size if side == "buy" else -size
+        held = self.positions.get(symbol, {"size": 0.0, "price": price})
+        position = held["size"]
+        if order.get("reduceOnly"):
+            if position == 0 or (position > 0) == (signed > 0):
+                return "wouldNotReducePosition"
+            size = min(size, abs(position))
+            signed = size if side == "buy" else -size
+        if position and (position > 0) != (signed > 0):
+            self.balance += (price - held["price"]) * min(abs(position), size) * (1 if position > 0 else -1)
+        new_size = round(position + signed, 10)
+        if new_size == 0:
+            self.positions.pop(symbol, None)
+        elif position == 0 or (new_size > 0) != (position > 0):
+            self.positions[symbol] = {"size": new_size, "price": price, "fillTime": _server_time()}
+        elif abs(new_size) > abs(position):
+            average = (held["price"] * abs(position) + price * size) / abs(new_size)
+            self.positions[symbol] = dict(held, size=new_size, price=average)
+        else:
+            self.positions[symbol] = dict(held, size=new_size)
+        fill = {"instrument": symbol, "time": now, "price": price, "seq": len(self.fills), "buy": side == "buy",
+                "qty": size, "order_id": order["order_id"], "cli_ord_id": order.get("cliOrdId"),
+                "fill_id": str(uuid.uuid4()), "fill_type": "taker", "fee_paid": 0.0, "fee_currency": "USD"}
+        self.fills.append(fill)
+        self._push_private("fills", {"feed": "fills", "username": "sim", "fills": [fill]})
+        self._push_private("open_positions", self._positions_message())
+        self._push_private("balances", self._balances_message())
+        return None
+
+    def _trigger(self, symbol: str, price: float, time_ms: int):
+        """TP / SL résidents franchis par un trade publié (sous self.lock) : exécutés au marché."""
+        for order_id, order in list(self.orders.items()):
+            if order["symbol"] != symbol or order["orderType"] not in ("stp", "take_profit"):
+                continue
+            stop = float(order["stopPrice"])
+            above = (order["orderType"] == "take_profit") == (order["side"] == "sell")
+            if (price >= stop) if above else (price <= stop):
+                del self.orders[order_id]
+                self._push_private("open_orders", {"feed": "open_orders", "order_id": order_id, "is_cancel": True,
+                                                   "reason": "stop_order_triggered"})
+                self._fill(order, price, time_ms)
+
+    def history(self, symbol: str, last_time_ms: int | None = None) -> list:
+        """Page de GET /history : les HISTORY_PAGE trades antérieurs à `last_time_ms`, du plus récent au plus ancien."""
+        with self.lock:
+            recent = self.recent[symbol]
+            end = len(recent)
+            if last_time_ms is not None:
+                # Recherche dichotomique sur l'horodatage (trades publiés dans l'ordre)
+                lo = 0
+                while lo < end:
+                    mid = (lo + end) // 2
+                    if recent[mid][1] < last_time_ms:
+                        lo = mid + 1
+                    else:
+                        end = mid
+            page = [recent[i] for i in range(end - 1, max(end - HISTORY_PAGE, 0) - 1, -1)]
+        return [{"time": _iso_time(time_ms), "trade_id": seq, "price": price, "size": qty, "side": side,
+                 "type": "fill", "uid": uid} for seq, time_ms, price, qty, side, uid in page]
+
+    def open_positions(self) -> list:
+        with self.lock:
+            return [
+                {"side": "long" if p["size"] > 0 else "short", "symbol": symbol, "price": p["price"],
+                 "fillTime": p["fillTime"], "size": abs(p["size"]), "unrealizedFunding": 0.0}
+                for symbol, p in self.positions.items()
+            ]
+
+    def open_orders(self) -> list:
+        with self.lock:
+            return [
+                {"order_id": order_id, "cliOrdId": o.get("cliOrdId"), "symbol": o["symbol"], "side": o["side"],
+                 "orderType": "stop" if o["orderType"] == "stp" else o["orderType"],
+                 "limitPrice": o.get("limitPrice"), "stopPrice": o.get("stopPrice"),
+                 "unfilledSize": float(o["size"]), "filledSize": 0, "reduceOnly": bool(o.get("reduceOnly")),
+                 "status": "untouched", "receivedTime": o["receivedTime"]}
+                for order_id, o in self.orders.items()
+            ]
+
+    def stats(self) -> dict:
+        with self.ws.lock:
+            connections = list(self.ws.connections)
+        return {
+            "ticks_sent": self.ticks_sent,
+            "clients": len(connections),
+            "backlog_bytes": sum(c.backlog for c in connections),
+            "max_backlog_bytes": max((c.max_seen for c in connections), default=0),
+            "orders": self.orders_received,
+            "resting": len(self.orders),
+            "injected": dict(self.injected, refused=self.ws.refused),
+            "auth_failures": self.auth_failures,
+            "rss_bytes": process_memory_bytes(),
+        }
+
+
+def _rest_handler(sim: KrakenFuturesSimulator):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, comme l'API réelle
+        disable_nagle_algorithm = True  # En-têtes et corps écrits séparément : pas d'attente d'ACK retardé
+
+        def _reply(self, data: dict, code: int = 200):
+            body = json.dumps(data).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _inject(self) -> bool:
+            """Applique latence et erreurs configurées. True si la réponse a déjà été envoyée."""
+            delay = sim._uniform(sim.latency_ms)
+            if delay:
+                sim.injected["latency"] += 1
+                time.sleep(delay / 1000)
+            if sim.timeout_rate and sim._random() < sim.timeout_rate:
+                sim.injected["timeout"] += 1
+                time.sleep(sim.timeout_sec)
+            if sim.http_error_rate and sim._random() < sim.http_error_rate:
+                sim.injected["http_error"] += 1
+                self._reply({"result": "error", "error": "Service Unavailable"}, 503)
+                return True
+            if sim.error_rate and sim._random() < sim.error_rate:
+                sim.injected["error"] += 1
+                self._reply({"result": "error", "error": "apiLimitExceeded", "serverTime": _server_time()})
+                return True
+            return False
+
+        def do_GET(self):
+            endpoint = self.path.split("?")[0]
+            if endpoint == f"{REST_PREFIX}/instruments":
+                instruments = [{"symbol": s, "type": "flexible_futures", "tradeable": True} for s in sim.symbols]
+                self._reply({"result": "success", "instruments": instruments, "serverTime": _server_time()})
+                return
+            if endpoint == f"{REST_PREFIX}/history":
+                query = parse_qs(urlsplit(self.path).query)
+                symbol = query.get("symbol", [""])[0]
+                if symbol not in sim.recent:
+                    self._reply({"result": "error", "error": "invalidArgument", "serverTime": _server_time()})
+                    return
+                if self._inject():
+                    return
+                last_time = query.get("lastTime", [None])[0]
+                last_ms = int(datetime.fromisoformat(last_time.replace("Z", "+00:00")).timestamp() * 1000) if last_time else None
+                self._reply({"result": "success", "history": sim.history(symbol, last_ms), "serverTime": _server_time()})
+                return
+            private = {f"{REST_PREFIX}/openpositions": ("openPositions", sim.open_positions),
+                       f"{REST_PREFIX}/openorders": ("openOrders", sim.open_orders)}
+            if endpoint not in private:
+                self._reply({"result": "error", "error": "Not Found"}, 404)
+                return
+            if not sim.check_auth(self.headers, b""):
+                sim.auth_failures += 1
+                self._reply({"result": "error", "error": "authenticationError", "serverTime": _server_time()})
+                return
+            if self._inject():
+                return
+            key, read = private[endpoint]
+            self._reply({"result": "success", key: read(), "serverTime": _server_time()})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            endpoint = self.path.split("?")[0]
+            if endpoint not in (f"{REST_PREFIX}/sendorder", f"{REST_PREFIX}/batchorder"):
+                self._reply({"result": "error", "error": "Not Found"}, 404)
+                return
+            if not sim.check_auth(self.headers, body):
+                sim.auth_failures += 1
+                self._reply({"result": "error", "error": "authenticationError", "serverTime": _server_time()})
+                return
+            if self._inject():
+                return
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self._reply({"result": "error", "error": "invalidJson", "serverTime": _server_time()})
+                return
+
+            if endpoint.endswith("/sendorder"):
+                sim.orders_received += 1
+                status = sim.place(dict(payload, order="send"))
+                self._reply({"result": "success", "sendStatus": status, "serverTime": _server_time()})
+            else:
+                instructions = payload.get("batchOrder", [])
+                sim.orders_received += len(instructions)
+                statuses = [sim.place(instruction) for instruction in instructions]
+                self._reply({"result": "success", "batchStatus": statuses, "serverTime": _server_time()})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _trade_message(symbol: str, trade: tuple) -> dict:
+    seq, time_ms, price, qty, side, uid = trade
+    return {"feed": None, "product_id": symbol, "uid": uid, "side": side, "type": "fill", "seq": seq,
+            "time": time_ms, "qty": qty, "price": price}
+
+
+def _iso_time(time_ms: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(time_ms / 1000)) + f".{time_ms % 1000:03d}Z"
+
+
+def _server_time() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+def _bounds(value: str):
+    parts = [float(v) for v in value.split(",")]
+    return (parts[0], parts[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulateur local Kraken Futures (WS trade + REST ordres)")
+    parser.add_argument("--symbols", default="PF_ETHUSD", help="Symboles séparés par des virgules")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ws-port", type=int, default=8765)
+    parser.add_argument("--rest-port", type=int, default=8766)
+    parser.add_argument("--rate", type=float, default=20, help="Trades/s par symbole (flux synthétique)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--replay", help="Dossier de ticks enregistrés à rejouer (au lieu du flux synthétique)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Accélération du rejeu")
+    parser.add_argument("--loop", action="store_true", help="Rejoue en boucle")
+    parser.add_argument("--api-secret", help="Vérifie les signatures REST avec ce secret (base64)")
+    parser.add_argument("--latency-ms", type=_bounds, default=(0.0, 0.0), help="Latence REST min,max")
+    parser.add_argument("--feed-delay-ms", type=_bounds, default=(0.0, 0.0), help="Retard du flux WS min,max")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Part des requêtes en erreur Kraken")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Part des requêtes en HTTP 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Part des requêtes sans réponse avant --timeout-sec")
+    parser.add_argument("--timeout-sec", type=float, default=10.0)
+    parser.add_argument("--drop-every", type=float, default=0.0, help="Coupe les connexions WS toutes les N secondes")
+    parser.add_argument("--outage-sec", type=float, default=0.0,
+                        help="Après chaque coupure, refuse les connexions WS pendant N secondes")
+    parser.add_argument("--history-sec", type=float, default=0.0,
+                        help="Historique synthétique généré au démarrage (servi par GET /history)")
+    parser.add_argument("--stats-every", type=float, default=10.0)
+    args = parser.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    if args.replay:
+        source = ReplaySource(args.replay, symbols, speed=args.speed, loop=args.loop)
+    else:
+        source = SyntheticSource(symbols, args.rate, seed=args.seed)
+    sim = KrakenFuturesSimulator(
+        source, symbols, host=args.host, ws_port=args.ws_port, rest_port=args.rest_port,
+        api_secret=args.api_secret, latency_ms=args.latency_ms, feed_delay_ms=args.feed_delay_ms,
+        error_rate=args.error_rate, http_error_rate=args.http_error_rate, timeout_rate=args.timeout_rate,
+        timeout_sec=args.timeout_sec, drop_every_sec=args.drop_every, seed=args.seed,
+        outage_sec=args.outage_sec,
+    )
+    if args.history_sec and not args.replay:
+        sim.prefill(args.history_sec)
+    sim.start()
+
+    try:
+        last = sim.stats()
+        while True:
+            time.sleep(args.stats_every)
+            stats = sim.stats()
+            rate = (stats["ticks_sent"] - last["ticks_sent"]) / args.stats_every
+            logger.info("📈 [SIM] ticks=%s (%.0f/s) | clients=%s | backlog=%s o (max %s) | ordres=%s (résidents %s) | "
+                        "injections=%s | RSS=%.0fMB", stats["ticks_sent"], rate, stats["clients"],
+                        stats["backlog_bytes"], stats["max_backlog_bytes"], stats["orders"], stats["resting"],
+                        stats["injected"], stats["rss_bytes"] / 1e6)
+            last = stats
+    except KeyboardInterrupt:
+        sim.stop()
+
+
+if __name__ == "__main__":
+    main()
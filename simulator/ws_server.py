@@ -0,0 +1,225 @@
+"""
+Serveur WebSocket minimal (RFC 6455, bibliothèque standard uniquement) pour le simulateur.
+
+Messages texte uniquement, pas d'extensions (permessage-deflate) ni de TLS : suffisant pour
+websocket-client en ws://. Chaque connexion a un thread de lecture et un thread d'écriture ;
+les envois passent par une file bornée en octets, un client trop lent est déconnecté
+(comme le fait Kraken) plutôt que de ralentir les autres.
+"""
+import base64
+import hashlib
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from utils.logger import setup_logger
+
+logger = setup_logger("Simulator")
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+def encode_frame(payload: bytes, opcode: int = OP_TEXT) -> bytes:
+    """Trame serveur -> client (jamais masquée)."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("Connexion fermée par le client")
+        data += chunk
+    return data
+
+
+def read_frame(sock):
+    """Lit une trame client (masquée). Retourne (opcode, payload)."""
+    first, second = _recv_exact(sock, 2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if second & 0x80 else None
+    payload = _recv_exact(sock, length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class Connection:
+    """Connexion cliente : file d'envoi bornée en octets, vidée par un thread dédié."""
+
+    def __init__(self, sock, address, max_backlog: int):
+        self.sock = sock
+        self.address = address
+        self.max_backlog = max_backlog
+        self.outbox = deque()
+        self.backlog = 0        # Octets en attente d'envoi
+        self.max_seen = 0       # Backlog max observé
+        self.sent_bytes = 0
+        self.open = True
+        self.subscriptions = set()
+        self.private = set()    # Flux privés abonnés (fills, open_orders, ...)
+        self.challenge = None   # Challenge envoyé pour l'authentification des flux privés
+        self.cond = threading.Condition()
+
+    def send(self, data: bytes) -> bool:
+        """Empile une ou plusieurs trames déjà encodées. False si la connexion est fermée ou saturée."""
+        with self.cond:
+            if not self.open:
+                return False
+            if self.backlog + len(data) > self.max_backlog:
+                logger.warning("[SIM] Client %s trop lent (%s octets en attente) - déconnexion", self.address,
+                               self.backlog)
+                self.open = False
+                self.cond.notify()
+                return False
+            self.outbox.append(data)
+            self.backlog += len(data)
+            self.max_seen = max(self.max_seen, self.backlog)
+            self.cond.notify()
+        return True
+
+    def send_text(self, text: str) -> bool:
+        return self.send(encode_frame(text.encode()))
+
+    def close(self):
+        with self.cond:
+            self.open = False
+            self.cond.notify()
+
+    def writer(self):
+        try:
+            while True:
+                with self.cond:
+                    while self.open and not self.outbox:
+                        self.cond.wait()
+                    if not self.open:
+                        break
+                    chunks = list(self.outbox)
+                    self.outbox.clear()
+                data = b"".join(chunks)
+                self.sock.sendall(data)  # Une seule écriture pour toutes les trames en attente
+                with self.cond:
+                    self.backlog -= len(data)
+                self.sent_bytes += len(data)
+        except OSError:
+            pass
+        finally:
+            self.open = False
+            try:
+                self.sock.sendall(encode_frame(b"", OP_CLOSE))
+            except OSError:
+                pass
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class WebSocketServer(socketserver.ThreadingTCPServer):
+    """
+    `on_connect(conn)` et `on_message(conn, text)` sont appelés depuis le thread de lecture
+    de la connexion ; `on_disconnect(conn)` à sa fermeture.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, on_connect=None, on_message=None, on_disconnect=None,
+                 max_backlog: int = 16 * 1024 * 1024):
+        self.on_connect = on_connect or (lambda conn: None)
+        self.on_message = on_message or (lambda conn, text: None)
+        self.on_disconnect = on_disconnect or (lambda conn: None)
+        self.max_backlog = max_backlog
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.refuse_until = 0.0  # time.monotonic() : connexions refusées avant (panne simulée)
+        self.refused = 0
+        super().__init__(address, _Handler)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="sim-ws", daemon=True).start()
+        return self
+
+    def drop_all(self, outage_sec: float = 0.0):
+        """Coupe toutes les connexions (injection de déconnexion), puis refuse les nouvelles `outage_sec` secondes."""
+        self.refuse_until = time.monotonic() + outage_sec
+        with self.lock:
+            connections = list(self.connections)
+        for conn in connections:
+            conn.close()
+        return len(connections)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if time.monotonic() < server.refuse_until:
+            server.refused += 1
+            return  # Panne : fermeture avant la poignée de main
+        if not self._handshake(sock):
+            return
+        conn = Connection(sock, self.client_address, server.max_backlog)
+        writer = threading.Thread(target=conn.writer, name="sim-ws-writer", daemon=True)
+        writer.start()
+        with server.lock:
+            server.connections.add(conn)
+        try:
+            server.on_connect(conn)
+            while conn.open:
+                opcode, payload = read_frame(sock)
+                if opcode == OP_TEXT:
+                    server.on_message(conn, payload.decode())
+                elif opcode == OP_PING:
+                    conn.send(encode_frame(payload, OP_PONG))
+                elif opcode == OP_CLOSE:
+                    break
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            conn.close()
+            with server.lock:
+                server.connections.discard(conn)
+            server.on_disconnect(conn)
+
+    @staticmethod
+    def _handshake(sock) -> bool:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        headers = {}
+        for line in request.decode(errors="replace").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            sock.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+        sock.sendall(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        return True
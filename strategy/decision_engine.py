@@ -1,77 +1,84 @@
 from typing import Tuple
-import pandas as pd
+from strategy.indicators import StreamingIndicators
 from utils.logger import setup_logger
 
 logger = setup_logger("DecisionEngine")
 
+# Poids des signaux du score et bandes RSI par défaut
+DEFAULT_WEIGHTS = {"trend": 30, "rsi": 30, "body": 20, "volume": 10}
+RSI_LOW = 35
+RSI_HIGH = 65
+
 class DecisionEngine:
-    def __init__(self, rsi_period=14, score_threshold=60):
+    def __init__(self, rsi_period=14, score_threshold=60, rsi_mode="sma",
+                 weights=None, rsi_low=RSI_LOW, rsi_high=RSI_HIGH, indicators=None):
         self.rsi_period = rsi_period
         self.score_threshold = score_threshold
-        self.df = pd.DataFrame()
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.rsi_low = rsi_low
+        self.rsi_high = rsi_high
+        # Indicateurs partageables entre stratégies (voir strategy.registry) : mis à jour une seule fois par bougie
+        self.indicators = indicators or StreamingIndicators(rsi_period=rsi_period, rsi_mode=rsi_mode)
 
     def update(self, new_candle: dict):
-        """Ajoute une bougie et maintient un historique limité."""
-        self.df = pd.concat([self.df, pd.DataFrame([new_candle])], ignore_index=True)
-        self.df = self.df.tail(100)  # Garde les 100 dernières bougies
-
-    def compute_rsi(self):
-        if len(self.df) < self.rsi_period + 1:
-            self.df["rsi"] = 50  # Valeur neutre par défaut si pas assez de données
-            return
+        """Intègre une bougie dans les indicateurs incrémentaux (O(1) par bougie)."""
+        self.indicators.update(new_candle)
 
-        delta = self.df["close"].diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
+    @property
+    def ready(self) -> bool:
+        return self.indicators.ready
 
-        avg_gain = gain.rolling(self.rsi_period, min_periods=1).mean()
-        avg_loss = loss.rolling(self.rsi_period, min_periods=1).mean()
+    def load_history(self, window: dict):
+        """
+        Rejoue un historique en colonnes (ex. `CandleStore.window(kind="ha")`)
+        sans passer par des dicts par bougie ni un DataFrame.
+        """
+        columns = [window[name].tolist() for name in ("timestamp", "open", "high", "low", "close", "volume")]
+        for ts, o, h, l, c, v in zip(*columns):
+            self.indicators.update({"timestamp": ts, "open": o, "high": h, "low": l, "close": c, "volume": v})
 
-        rs = avg_gain / (avg_loss + 1e-9)  # éviter la division par zéro
-        rsi = 100 - (100 / (1 + rs))
-        self.df["rsi"] = rsi
+    def compute_rsi(self) -> float:
+        return self.indicators.rsi
 
     def compute_score(self):
         """Retourne un score positif pour achat, négatif pour vente."""
-        if len(self.df) < self.rsi_period + 1:
+        ind = self.indicators
+        if not ind.ready:
             return 0  # Pas assez de données
 
-        self.compute_rsi()
-        latest = self.df.iloc[-1]
-        previous = self.df.iloc[-2]
+        latest = ind.latest
+        previous = ind.previous
+        rsi = ind.rsi
+        w = self.weights
         score = 0
 
         # ---- Signaux d'achat (score positif) ----
         # Heikin Ashi ou bougies classiques haussières
         if latest["close"] > latest["open"] and previous["close"] > previous["open"]:
-            score += 30
+            score += w["trend"]
 
         # RSI bas = possible rebond (achat)
-        if latest["rsi"] < 35:
-            score += 30
+        if rsi < self.rsi_low:
+            score += w["rsi"]
         # Bougie verte forte (achat)
-        if latest["close"] - latest["open"] > (latest["high"] - latest["low"]) * 0.6:
-            score += 20
+        if latest["body"] > latest["range"] * 0.6:
+            score += w["body"]
 
         # ---- Signaux de vente (score négatif) ----
         # Heikin Ashi ou bougies baissières
         if latest["close"] < latest["open"] and previous["close"] < previous["open"]:
-            score -= 30
+            score -= w["trend"]
 
         # RSI haut = surachat (vente)
-        if latest["rsi"] > 65:
-            score -= 30
+        if rsi > self.rsi_high:
+            score -= w["rsi"]
         # Bougie rouge forte (vente)
-        if latest["open"] - latest["close"] > (latest["high"] - latest["low"]) * 0.6:
-            score -= 20
+        if -latest["body"] > latest["range"] * 0.6:
+            score -= w["body"]
 
         # Volume supérieur à la moyenne (appuie la force du mouvement)
-        if len(self.df) >= 10:
-            avg_vol = self.df["volume"].rolling(10, min_periods=1).mean().iloc[-1]
-        else:
-            avg_vol = self.df["volume"].mean()
-        if latest["volume"] > avg_vol:
-            score += 10 if score > 0 else -10  # Accentue le sens dominant
+        if latest["volume"] > ind.avg_volume:
+            score += w["volume"] if score > 0 else -w["volume"]  # Accentue le sens dominant
 
         return score
 
@@ -83,11 +90,17 @@ class DecisionEngine:
         - hold : entre les deux
         """
         score = self.compute_score()
+        action = self.classify(score)
+        if action == "buy":
+            logger.debug("Signal d'achat détecté | Score=%s", score)
+        elif action == "sell":
+            logger.debug("Signal de vente détecté | Score=%s", score)
+        return action, score
+
+    def classify(self, score) -> str:
+        """Action associée à un score (sans journalisation : évaluation en lot des stratégies fantômes)."""
         if score >= self.score_threshold:
-            logger.debug(f"Signal d'achat détecté | Score={score}")
-            return "buy", score
-        elif score <= -self.score_threshold:
-            logger.debug(f"Signal de vente détecté | Score={score}")
-            return "sell", score
-        else:
-            return "hold", score
+            return "buy"
+        if score <= -self.score_threshold:
+            return "sell"
+        return "hold"
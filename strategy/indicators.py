@@ -0,0 +1,129 @@
+import math
+from collections import deque
+
+
+class StreamingIndicators:
+    """
+    Indicateurs mis à jour en temps constant à chaque nouvelle bougie :
+    - RSI (moyenne glissante simple comme l'ancien calcul pandas, ou lissage de Wilder)
+    - Volume moyen glissant
+    - Corps / range de la bougie (Heikin Ashi ou classique)
+    """
+
+    def __init__(self, rsi_period=14, volume_window=10, rsi_mode="sma"):
+        if rsi_mode not in ("sma", "wilder"):
+            raise ValueError(f"Mode RSI inconnu : {rsi_mode}")
+        self.rsi_period = rsi_period
+        self.volume_window = volume_window
+        self.rsi_mode = rsi_mode
+
+        self.count = 0
+        self.latest = None
+        self.previous = None
+        self.rsi = 50.0  # Valeur neutre tant que l'historique est insuffisant
+
+        self._prev_close = None
+        self._gains = deque(maxlen=rsi_period)
+        self._losses = deque(maxlen=rsi_period)
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        self._avg_gain = None  # Mode Wilder
+        self._avg_loss = None
+        self._volumes = deque(maxlen=volume_window)
+        self._volume_sum = 0.0
+        self._since_resync = 0
+        self._volume_since_resync = 0
+
+    @property
+    def ready(self) -> bool:
+        """Assez de bougies pour scorer (même règle que l'ancien moteur pandas)."""
+        return self.count >= self.rsi_period + 1
+
+    @property
+    def avg_volume(self) -> float:
+        if not self._volumes:
+            return 0.0
+        # Dérive négative possible après des bougies de volume nul (comblement) : 0 exact
+        return max(self._volume_sum, 0.0) / len(self._volumes)
+
+    def update(self, candle: dict):
+        """Intègre une bougie finalisée (dict open/high/low/close/volume)."""
+        open_, high, low = float(candle["open"]), float(candle["high"]), float(candle["low"])
+        close, volume = float(candle["close"]), float(candle["volume"])
+
+        self.previous = self.latest
+        self.latest = {
+            "timestamp": candle.get("timestamp"),
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+            "body": close - open_,
+            "range": high - low,
+        }
+        self.count += 1
+
+        self._push_volume(volume)
+        if self._prev_close is not None:
+            self._push_delta(close - self._prev_close)
+        self._prev_close = close
+        self._refresh_rsi()
+
+    def _push_volume(self, volume):
+        if len(self._volumes) == self.volume_window:
+            self._volume_sum -= self._volumes[0]
+        self._volumes.append(volume)
+        self._volume_sum += volume
+
+        # Resynchronisation périodique (tous modes RSI) pour borner la dérive de la somme glissante
+        self._volume_since_resync += 1
+        if self._volume_since_resync >= self.volume_window:
+            self._volume_sum = math.fsum(self._volumes)
+            self._volume_since_resync = 0
+
+    def _push_delta(self, delta):
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+
+        if self.rsi_mode == "wilder":
+            if self._avg_gain is None:
+                self._gains.append(gain)
+                self._losses.append(loss)
+                if len(self._gains) == self.rsi_period:
+                    self._avg_gain = math.fsum(self._gains) / self.rsi_period
+                    self._avg_loss = math.fsum(self._losses) / self.rsi_period
+            else:
+                n = self.rsi_period
+                self._avg_gain = (self._avg_gain * (n - 1) + gain) / n
+                self._avg_loss = (self._avg_loss * (n - 1) + loss) / n
+            return
+
+        if len(self._gains) == self.rsi_period:
+            self._gain_sum -= self._gains[0]
+            self._loss_sum -= self._losses[0]
+        self._gains.append(gain)
+        self._losses.append(loss)
+        self._gain_sum += gain
+        self._loss_sum += loss
+
+        # Resynchronisation périodique pour borner la dérive des sommes glissantes
+        self._since_resync += 1
+        if self._since_resync >= self.rsi_period:
+            self._gain_sum = math.fsum(self._gains)
+            self._loss_sum = math.fsum(self._losses)
+            self._since_resync = 0
+
+    def _refresh_rsi(self):
+        if not self.ready:
+            self.rsi = 50.0
+            return
+
+        if self.rsi_mode == "wilder":
+            avg_gain, avg_loss = self._avg_gain, self._avg_loss
+        else:
+            avg_gain = max(self._gain_sum, 0.0) / len(self._gains)
+            avg_loss = max(self._loss_sum, 0.0) / len(self._losses)
+
+        rs = avg_gain / (avg_loss + 1e-9)  # éviter la division par zéro
+        self.rsi = 100 - (100 / (1 + rs))
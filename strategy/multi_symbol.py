@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from memory.position_manager import PositionManager
+from strategy.registry import StrategySet
+from utils.logger import setup_logger
+from utils.metrics import LatencyStats
+
+logger = setup_logger("StrategyPool")
+
+
+class SymbolContext:
+    """
+    État propre à un symbole : stratégies (live + fantômes), position, file de bougies et latences.
+    La file n'est pas bornée : une bougie écartée désynchroniserait les indicateurs glissants
+    (RSI, volume moyen). `max_pending` n'est qu'un seuil d'alerte.
+    """
+
+    def __init__(self, symbol: str, max_pending: int = 100, position_manager=None):
+        self.symbol = symbol
+        self.strategies = StrategySet(symbol)
+        self.engine = self.strategies.live  # Seule stratégie qui passe des ordres
+        # Journalisée et rejouée au démarrage (injectable : PositionManager() reste en mémoire)
+        self.position_manager = position_manager or PositionManager(symbol)
+        self.pending = deque()
+        self.max_pending = max_pending
+        self.jobs = deque()  # Tâches prioritaires (sorties au tick), jamais écrasées
+        self.scheduled = False
+        self.max_depth = 0
+        self.latency = LatencyStats()
+        self.received_ns = 0  # Réception de la bougie en cours (time.perf_counter_ns)
+
+
+class StrategyPool:
+    """
+    Évalue la stratégie de chaque symbole sur un pool de threads.
+    Les bougies d'un même symbole sont traitées dans l'ordre et jamais en parallèle,
+    les symboles différents s'exécutent en parallèle : un symbole lent ne retarde pas les autres.
+    """
+
+    def __init__(self, symbols, handler, max_workers: int = 4, max_pending: int = 100, after=None):
+        self.handler = handler  # handler(context, candle)
+        # after(context, candle, retour du handler) : travail non urgent (stratégies fantômes), exécuté
+        # avant la bougie suivante du symbole mais hors de la latence mesurée
+        self.after = after
+        self.contexts = {symbol: SymbolContext(symbol, max_pending) for symbol in symbols}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="strategy")
+        self.lock = threading.Lock()
+
+    def submit(self, candle: dict):
+        ctx = self.contexts.get(candle["symbol"])
+        if ctx is None:
+            logger.warning("Bougie reçue pour un symbole inconnu : %s", candle['symbol'])
+            return
+        with self.lock:
+            ctx.pending.append((time.perf_counter_ns(), candle))
+            depth = len(ctx.pending)
+            if depth > ctx.max_depth:
+                ctx.max_depth = depth
+                if depth == ctx.max_pending:
+                    logger.warning("[%s] %s bougies en attente : la stratégie ne suit pas", ctx.symbol, depth)
+            if ctx.scheduled:
+                return
+            ctx.scheduled = True
+        self.executor.submit(self._drain, ctx)
+
+    def call(self, symbol: str, job):
+        """
+        Exécute job(ctx) dans la file du symbole, avant les bougies en attente : jamais en
+        parallèle d'une décision du même symbole (position partagée sans verrou).
+        """
+        ctx = self.contexts[symbol]
+        with self.lock:
+            ctx.jobs.append(job)
+            if ctx.scheduled:
+                return
+            ctx.scheduled = True
+        self.executor.submit(self._drain, ctx)
+
+    def _drain(self, ctx: SymbolContext):
+        while True:
+            with self.lock:
+                if ctx.jobs:
+                    job, candle = ctx.jobs.popleft(), None
+                elif ctx.pending:
+                    job, (received, candle) = None, ctx.pending.popleft()
+                else:
+                    ctx.scheduled = False
+                    return
+            if job is not None:
+                try:
+                    job(ctx)
+                except Exception as e:
+                    logger.error("[%s] Erreur tâche : %s", ctx.symbol, e)
+                continue
+            ctx.received_ns = received
+            try:
+                result = self.handler(ctx, candle)
+            except Exception as e:
+                logger.error("[%s] Erreur stratégie : %s", ctx.symbol, e)
+                continue
+            finally:
+                ctx.latency.add((time.perf_counter_ns() - received) / 1e6)
+            if self.after is not None:
+                try:
+                    self.after(ctx, candle, result)
+                except Exception as e:
+                    logger.error("[%s] Erreur tâche différée : %s", ctx.symbol, e)
+
+    def stats(self) -> dict:
+        return {
+            symbol: dict(ctx.latency.snapshot(), pending=len(ctx.pending), max_pending=ctx.max_depth)
+            for symbol, ctx in self.contexts.items()
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,144 @@
+"""
+Vérification de parité entre le moteur incrémental et l'ancien moteur pandas.
+
+Usage :
+    python -m strategy.parity [nb_bougies]
+"""
+import random
+import sys
+import pandas as pd
+from strategy.decision_engine import DecisionEngine
+
+
+class PandasDecisionEngine:
+    """Ancienne implémentation pandas, conservée uniquement comme référence."""
+
+    def __init__(self, rsi_period=14, score_threshold=60):
+        self.rsi_period = rsi_period
+        self.score_threshold = score_threshold
+        self.df = pd.DataFrame()
+
+    def update(self, new_candle: dict):
+        self.df = pd.concat([self.df, pd.DataFrame([new_candle])], ignore_index=True)
+        self.df = self.df.tail(100)
+
+    def compute_rsi(self):
+        if len(self.df) < self.rsi_period + 1:
+            self.df["rsi"] = 50
+            return
+
+        delta = self.df["close"].diff()
+        gain = delta.clip(lower=0)
+        loss = -delta.clip(upper=0)
+
+        avg_gain = gain.rolling(self.rsi_period, min_periods=1).mean()
+        avg_loss = loss.rolling(self.rsi_period, min_periods=1).mean()
+
+        rs = avg_gain / (avg_loss + 1e-9)
+        rsi = 100 - (100 / (1 + rs))
+        self.df["rsi"] = rsi
+
+    def compute_score(self):
+        if len(self.df) < self.rsi_period + 1:
+            return 0
+
+        self.compute_rsi()
+        latest = self.df.iloc[-1]
+        previous = self.df.iloc[-2]
+        score = 0
+
+        if latest["close"] > latest["open"] and previous["close"] > previous["open"]:
+            score += 30
+        if latest["rsi"] < 35:
+            score += 30
+        if latest["close"] - latest["open"] > (latest["high"] - latest["low"]) * 0.6:
+            score += 20
+
+        if latest["close"] < latest["open"] and previous["close"] < previous["open"]:
+            score -= 30
+        if latest["rsi"] > 65:
+            score -= 30
+        if latest["open"] - latest["close"] > (latest["high"] - latest["low"]) * 0.6:
+            score -= 20
+
+        if len(self.df) >= 10:
+            avg_vol = self.df["volume"].rolling(10, min_periods=1).mean().iloc[-1]
+        else:
+            avg_vol = self.df["volume"].mean()
+        if latest["volume"] > avg_vol:
+            score += 10 if score > 0 else -10
+
+        return score
+
+    def decide(self):
+        score = self.compute_score()
+        if score >= self.score_threshold:
+            return "buy", score
+        elif score <= -self.score_threshold:
+            return "sell", score
+        return "hold", score
+
+
+def synthetic_candles(n: int, seed: int = 42, start_price: float = 2500.0):
+    """Génère des bougies Heikin Ashi à partir d'une marche aléatoire."""
+    rng = random.Random(seed)
+    price = start_price
+    candles = []
+    prev_ha = None
+    for i in range(n):
+        open_ = price
+        closes = [price]
+        for _ in range(rng.randint(1, 20)):
+            price = round(price * (1 + rng.gauss(0, 0.0008)), 2)
+            closes.append(price)
+        raw = {
+            "open": open_,
+            "high": max(closes),
+            "low": min(closes),
+            "close": price,
+        }
+        if prev_ha is None:
+            ha_open = (raw["open"] + raw["close"]) / 2
+        else:
+            ha_open = (prev_ha["open"] + prev_ha["close"]) / 2
+        ha_close = (raw["open"] + raw["high"] + raw["low"] + raw["close"]) / 4
+        candle = {
+            "symbol": "PF_ETHUSD",
+            "timestamp": 1_748_900_000 + i * 10,
+            "open": ha_open,
+            "high": max(raw["high"], ha_open, ha_close),
+            "low": min(raw["low"], ha_open, ha_close),
+            "close": ha_close,
+            "volume": round(rng.expovariate(0.5), 3),
+        }
+        candles.append(candle)
+        prev_ha = candle
+    return candles
+
+
+def check_parity(candles, rsi_period=14, score_threshold=60):
+    """
+    Rejoue les bougies dans les deux moteurs et retourne la liste des écarts
+    (index, décision incrémentale, décision pandas). Liste vide = parité.
+    """
+    fast = DecisionEngine(rsi_period=rsi_period, score_threshold=score_threshold)
+    reference = PandasDecisionEngine(rsi_period=rsi_period, score_threshold=score_threshold)
+    mismatches = []
+    for i, candle in enumerate(candles):
+        fast.update(candle)
+        reference.update(candle)
+        got = fast.decide()
+        expected = reference.decide()
+        if got != expected:
+            mismatches.append((i, got, expected))
+    return mismatches
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    mismatches = check_parity(synthetic_candles(n))
+    if mismatches:
+        for i, got, expected in mismatches[:20]:
+            print(f"❌ Bougie {i} : incrémental={got} | pandas={expected}")
+        sys.exit(1)
+    print(f"✅ Parité OK sur {n} bougies.")
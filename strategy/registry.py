@@ -0,0 +1,140 @@
+"""
+Registre de stratégies : une stratégie live et des stratégies fantômes évaluées sur le
+même flux de bougies d'un symbole.
+
+- Les indicateurs (StreamingIndicators) sont partagés : un jeu par couple (rsi_period,
+  rsi_mode), mis à jour une seule fois par bougie quel que soit le nombre de stratégies.
+- Seule la décision live part vers les ordres ; les fantômes sont évaluées ensuite, en lot,
+  et tradées sur papier (PaperBook) avec les règles de main.on_new_candle.
+"""
+from strategy.decision_engine import DecisionEngine
+from strategy.indicators import StreamingIndicators
+from strategy.rules import pnl_percent, should_close, tp_sl_levels
+from utils.logger import setup_logger
+from config import STRATEGIES, LIVE_STRATEGY, SHADOW_STRATEGIES, TP_PCT, SL_PCT, MIN_GAIN_POUR_CLOTURE
+
+logger = setup_logger("Strategies")
+
+
+class PaperBook:
+    """
+    Position virtuelle d'une stratégie : ouverture sur signal, clôture sur signal opposé
+    ou gain >= min_gain, retournement immédiat, TP/SL testés sur le high/low de la bougie
+    suivante (SL prioritaire), comme Backtester.simulate. PnL en % cumulés.
+    """
+
+    def __init__(self, tp_pct=TP_PCT, sl_pct=SL_PCT, min_gain=MIN_GAIN_POUR_CLOTURE, fee_pct: float = 0.0):
+        self.tp_pct = tp_pct
+        self.sl_pct = sl_pct
+        self.min_gain = min_gain
+        self.fee_pct = fee_pct
+        self.position = None
+        self.trades = 0
+        self.wins = 0
+        self.pnl_percent = 0.0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+
+    def step(self, action: str, candle: dict) -> list:
+        """Applique la décision de la bougie. Retourne les trades virtuels clôturés."""
+        closed = []
+        price, ts = candle["close"], candle["timestamp"]
+        position = self.position
+        if position and position["tp"] is not None:
+            long = position["side"] == "long"
+            if (candle["low"] <= position["sl"]) if long else (candle["high"] >= position["sl"]):
+                closed.append(self._close(position["sl"], ts, "sl"))
+            elif (candle["high"] >= position["tp"]) if long else (candle["low"] <= position["tp"]):
+                closed.append(self._close(position["tp"], ts, "tp"))
+
+        if not self.position:
+            if action in ("buy", "sell"):
+                self._open(action, price, ts)
+            return closed
+
+        pnl = pnl_percent(self.position["side"], self.position["entry_price"], price)
+        if should_close(self.position["side"], action, pnl, self.min_gain):
+            closed.append(self._close(price, ts, "signal" if action != "hold" else "min_gain"))
+            if action in ("buy", "sell"):
+                self._open(action, price, ts)
+        return closed
+
+    def _open(self, action: str, price: float, ts):
+        side = "long" if action == "buy" else "short"
+        tp, sl = tp_sl_levels(side, price, self.tp_pct, self.sl_pct)
+        self.position = {"side": side, "entry_price": price, "timestamp": ts, "tp": tp, "sl": sl}
+
+    def _close(self, exit_price: float, ts, reason: str) -> dict:
+        position, self.position = self.position, None
+        pnl = pnl_percent(position["side"], position["entry_price"], exit_price) - 2 * self.fee_pct
+        self.trades += 1
+        self.wins += pnl > 0
+        self.pnl_percent += pnl
+        self.peak = max(self.peak, self.pnl_percent)
+        self.max_drawdown = max(self.max_drawdown, self.peak - self.pnl_percent)
+        return {
+            "side": position["side"],
+            "entry_price": position["entry_price"],
+            "exit_price": exit_price,
+            "entry_timestamp": position["timestamp"],
+            "timestamp": ts,
+            "pnl_percent": round(pnl, 4),
+            "reason": reason,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "trades": self.trades,
+            "pnl_percent": self.pnl_percent,
+            "max_drawdown_percent": self.max_drawdown,
+            "win_rate": self.wins / self.trades if self.trades else 0.0,
+            "position": self.position["side"] if self.position else None,
+        }
+
+
+class StrategySet:
+    """Stratégies d'un symbole : indicateurs partagés, une live, des fantômes."""
+
+    def __init__(self, symbol: str, strategies: dict = STRATEGIES, live: str = LIVE_STRATEGY,
+                 shadows=SHADOW_STRATEGIES):
+        unknown = [name for name in [live, *shadows] if name not in strategies]
+        if unknown:
+            raise KeyError(f"Stratégie(s) inconnue(s) : {', '.join(unknown)}")
+        self.symbol = symbol
+        self.live_name = live
+        self.indicators = {}   # (rsi_period, rsi_mode) -> StreamingIndicators
+        self.engines = {}      # nom -> DecisionEngine (live en premier)
+        for name in dict.fromkeys([live, *shadows]):
+            params = strategies[name]
+            key = (params.get("rsi_period", 14), params.get("rsi_mode", "sma"))
+            indicators = self.indicators.get(key)
+            if indicators is None:
+                indicators = self.indicators[key] = StreamingIndicators(rsi_period=key[0], rsi_mode=key[1])
+            self.engines[name] = DecisionEngine(indicators=indicators, **params)
+        self.live = self.engines[live]
+        self.shadows = [(name, engine) for name, engine in self.engines.items() if name != live]
+        # PnL papier pour toutes, live comprise : comparaison à règles identiques
+        self.papers = {name: PaperBook() for name in self.engines}
+
+    @property
+    def ready(self) -> bool:
+        return all(indicators.ready for indicators in self.indicators.values())
+
+    def update(self, candle: dict):
+        """Intègre une bougie dans chaque jeu d'indicateurs (une fois par bougie)."""
+        for indicators in self.indicators.values():
+            indicators.update(candle)
+
+    def evaluate(self, candle: dict, live_action: str) -> list:
+        """
+        Évalue les fantômes en lot (après la décision live, hors du chemin des ordres) et
+        avance toutes les positions papier. Retourne [(nom, trade virtuel clôturé)].
+        """
+        closed = [(self.live_name, trade) for trade in self.papers[self.live_name].step(live_action, candle)]
+        for name, engine in self.shadows:
+            action = engine.classify(engine.compute_score())
+            closed += [(name, trade) for trade in self.papers[name].step(action, candle)]
+        return closed
+
+    def stats(self) -> dict:
+        return {name: paper.stats() for name, paper in self.papers.items()}
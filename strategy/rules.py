@@ -0,0 +1,32 @@
+"""Règles de gestion de position partagées entre le bot live et le backtest."""
+
+
+def pnl_percent(side: str, entry_price: float, price: float) -> float:
+    """PnL en % d'une position au prix donné."""
+    if side == "long":
+        return ((price - entry_price) / entry_price) * 100
+    if side == "short":
+        return ((entry_price - price) / entry_price) * 100
+    return 0
+
+
+def should_close(side: str, action: str, pnl_pct: float, min_gain: float) -> bool:
+    """Fermeture si signal opposé ou gain suffisant."""
+    if side == "long" and action == "sell":
+        return True
+    if side == "short" and action == "buy":
+        return True
+    return pnl_pct >= min_gain
+
+
+def tp_sl_levels(side: str, entry_price: float, tp_pct, sl_pct):
+    """
+    Niveaux de Take Profit / Stop Loss pour une position.
+    Retourne (None, None) si TP/SL désactivés.
+    """
+    if not tp_pct or not sl_pct:
+        return None, None
+    tp_pct, sl_pct = float(tp_pct), float(sl_pct)
+    if side == "long":
+        return entry_price * (1 + tp_pct / 100), entry_price * (1 - sl_pct / 100)
+    return entry_price * (1 - tp_pct / 100), entry_price * (1 + sl_pct / 100)
@@ -1,28 +1,182 @@
+import queue
+import threading
+import time
 import requests
-from config import TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+from config import (
+    TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, TELEGRAM_QUEUE_SIZE, TELEGRAM_RATE_PER_SEC,
+    TELEGRAM_BURST, TELEGRAM_COALESCE_SEC, TELEGRAM_TIMEOUT_SEC,
+)
 from utils.logger import setup_logger
+from utils.metrics import metrics
 
 logger = setup_logger("Telegram")
 
+MAX_MESSAGE_LENGTH = 4096  # Limite Telegram par message
+
+
+class TokenBucket:
+    """Limiteur de débit : `rate` jetons par seconde, au plus `burst` en réserve."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def wait_time(self) -> float:
+        """Temps d'attente avant le prochain jeton disponible (0 si disponible)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Vide la réserve après un 429 Telegram (retry_after)."""
+        self.tokens = -seconds * self.rate
+        self.updated = time.monotonic()
+
+
 class TelegramNotifier:
-    def __init__(self, token: str | None = TELEGRAM_TOKEN, chat_id: str | None = TELEGRAM_CHAT_ID):
+    """
+    Notifications Telegram non bloquantes : `send_message` ne fait qu'empiler dans une
+    file bornée. Un thread dédié envoie via une session persistante, respecte le débit
+    autorisé par chat et regroupe les rafales en un seul message récapitulatif.
+    """
+
+    def __init__(self, token: str | None = TELEGRAM_TOKEN, chat_id: str | None = TELEGRAM_CHAT_ID,
+                 max_queue: int = TELEGRAM_QUEUE_SIZE, rate_per_sec: float = TELEGRAM_RATE_PER_SEC,
+                 burst: int = TELEGRAM_BURST, coalesce_sec: float = TELEGRAM_COALESCE_SEC,
+                 base_url: str | None = None):
         if not token or not chat_id:
             raise ValueError("Token Telegram ou chat_id manquant")
         self.token: str = token
         self.chat_id: str = chat_id
-        self.base_url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        self.base_url = base_url or f"https://api.telegram.org/bot{self.token}/sendMessage"
+        self.session = requests.Session()
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.coalesce_sec = coalesce_sec
+
+        # Compteurs
+        self.sent = 0            # Requêtes Telegram envoyées
+        self.coalesced = 0       # Messages fusionnés dans un récapitulatif
+        self.dropped = 0         # Messages perdus (file pleine ou échec d'envoi)
+        self.delayed = 0         # Messages retardés par la limite de débit
+        self.max_delay_sec = 0.0
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+        self.thread.start()
 
     def send_message(self, message: str, parse_mode: str = "HTML"):
+        """Empile le message sans jamais bloquer l'appelant."""
+        try:
+            self.queue.put_nowait((time.monotonic(), message, parse_mode))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("File Telegram pleine - message ignoré.")
+
+    def stop(self, timeout: float = 5.0):
+        """Envoie les messages en attente puis arrête le thread."""
+        self.running = False
+        self.thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "delayed": self.delayed,
+            "max_delay_sec": self.max_delay_sec,
+        }
+
+    def _run(self):
+        while self.running or not self.queue.empty():
+            try:
+                first = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            # Fenêtre de regroupement : les messages d'une même rafale partent ensemble
+            time.sleep(self.coalesce_sec if self.running else 0)
+            batch = [first]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            wait = self.bucket.wait_time()
+            if wait > 0:
+                self.delayed += len(batch)
+                time.sleep(wait)
+                # Ce qui est arrivé pendant l'attente rejoint le même récapitulatif
+                while True:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+            for parse_mode, text, count, oldest in self._digests(batch):
+                if count > 1:
+                    self.coalesced += count
+                for _ in range(2):  # Un nouvel essai après un 429
+                    time.sleep(self.bucket.wait_time())
+                    self.bucket.consume()
+                    self.max_delay_sec = max(self.max_delay_sec, time.monotonic() - oldest)
+                    result = self._post(text, parse_mode)
+                    if result is not None:
+                        break
+                if not result:
+                    self.dropped += count
+
+    @staticmethod
+    def _digests(batch):
+        """Regroupe les messages par parse_mode en textes de moins de 4096 caractères."""
+        groups = {}
+        for queued_at, message, parse_mode in batch:
+            groups.setdefault(parse_mode, []).append((queued_at, message))
+        for parse_mode, items in groups.items():
+            parts, length, count, oldest = [], 0, 0, None
+            for queued_at, message in items:
+                message = message[:MAX_MESSAGE_LENGTH]
+                if parts and length + len(message) + 2 > MAX_MESSAGE_LENGTH:
+                    yield parse_mode, "\n\n".join(parts), count, oldest
+                    parts, length, count, oldest = [], 0, 0, None
+                parts.append(message)
+                length += len(message) + 2
+                count += 1
+                oldest = queued_at if oldest is None else oldest
+            if parts:
+                yield parse_mode, "\n\n".join(parts), count, oldest
+
+    def _post(self, message: str, parse_mode: str) -> bool | None:
+        """Envoie un message. Retourne None si Telegram demande d'attendre (429)."""
         payload = {
             "chat_id": self.chat_id,
             "text": message,
             "parse_mode": parse_mode
         }
+        start = time.perf_counter_ns()
         try:
-            response = requests.post(self.base_url, data=payload)
+            response = self.session.post(self.base_url, data=payload, timeout=TELEGRAM_TIMEOUT_SEC)
+            metrics.observe_since("telegram_send", "all", start)
+            self.sent += 1
+            if response.status_code == 429:
+                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                logger.warning("Limite Telegram atteinte, pause de %ss", retry_after)
+                self.bucket.pause(retry_after)
+                return None
             if response.status_code != 200:
-                logger.warning(f"Erreur Telegram : {response.text}")
-            else:
-                logger.info("Message Telegram envoyé avec succès.")
+                logger.warning("Erreur Telegram : %s", response.text)
+                return False
+            logger.info("Message Telegram envoyé avec succès.")
+            return True
         except Exception as e:
-            logger.error(f"Erreur envoi Telegram : {e}")
+            logger.error("Erreur envoi Telegram : %s", e)
+            return False
@@ -0,0 +1,77 @@
+"""
+Configuration commune des tests : variables d'environnement exigées par config.py (valeurs
+factices, aucun appel réseau) et journaux des composants écrits hors du dépôt.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key, value in {
+    "KRAKEN_API_KEY": "test",
+    "KRAKEN_API_SECRET": "c2VjcmV0",
+    "TELEGRAM_TOKEN": "test",
+    "TELEGRAM_CHAT_ID": "0",
+}.items():
+    os.environ.setdefault(key, value)
+
+import utils.logger  # noqa: E402
+
+utils.logger.LOG_DIR = tempfile.mkdtemp(prefix="bot-logs-")
+
+import pytest  # noqa: E402
+
+
+class _Collection:
+    def __init__(self):
+        self.documents = []
+
+    def create_index(self, keys, **options):
+        return "test"
+
+    def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+
+class _Database(dict):
+    def __missing__(self, name):
+        return self.setdefault(name, _Collection())
+
+
+class _MongoClient(dict):
+    """Remplace pymongo.MongoClient pour l'import de main.py : client[db][collection] en mémoire."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+
+    def __missing__(self, name):
+        return self.setdefault(name, _Database())
+
+
+class _Notifier:
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, message: str, parse_mode: str = "HTML"):
+        self.messages.append(message)
+
+
+class InlineStage:
+    """Étage d'exécution synchrone : les ordres partent dans le thread du test."""
+
+    def put(self, job):
+        job()
+        return True
+
+
+@pytest.fixture(scope="session")
+def main_module():
+    """main.py importé sans I/O : MongoDB en mémoire, Telegram muet, étage d'exécution synchrone."""
+    import db.mongo_manager
+    db.mongo_manager.MongoClient = _MongoClient
+    import main
+    main.notifier.stop(timeout=0)
+    main.notifier = _Notifier()
+    main.execution = InlineStage()
+    return main
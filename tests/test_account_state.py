@@ -0,0 +1,148 @@
+import pytest
+from memory.position_manager import PositionManager
+from services.account_feed import AccountState
+from strategy.multi_symbol import SymbolContext
+from trading.exit_engine import ExitEngine
+
+SYMBOL = "PF_ETHUSD"
+
+
+def _fill(fill_id, order_id, qty, price, time, buy=True):
+    return {"fill_id": fill_id, "order_id": order_id, "instrument": SYMBOL, "buy": buy, "qty": qty, "price": price,
+            "time": time, "fill_type": "maker", "fee_paid": 0.01}
+
+
+def _fills(*fills, snapshot=False):
+    return {"feed": "fills_snapshot" if snapshot else "fills", "fills": list(fills)}
+
+
+def _positions(*positions):
+    return {"feed": "open_positions", "positions": [
+        {"instrument": SYMBOL, "balance": balance, "entry_price": price} for balance, price in positions
+    ]}
+
+
+def _order(order_id, direction=1, order_type="stop"):
+    return {"order_id": order_id, "instrument": SYMBOL, "direction": direction, "type": order_type, "qty": 1,
+            "filled": 0, "stop_price": 95.0, "reduce_only": True, "time": 1}
+
+
+def test_fills_are_aggregated_per_order_and_deduplicated():
+    state = AccountState()
+    assert state.apply(_fills(_fill("f1", "o1", 1, 100.0, 1), _fill("f2", "o1", 3, 104.0, 2))) == [SYMBOL]
+    assert state.apply(_fills(_fill("f1", "o1", 1, 100.0, 1), snapshot=True)) == []
+    assert state.fill("o1") == {"qty": 4, "price": 103.0, "time": 2}
+    assert state.last_fill(SYMBOL)["fill_id"] == "f2"
+    assert state.fill("unknown") is None
+
+
+def test_fill_history_is_bounded():
+    state = AccountState(fill_history=2)
+    state.apply(_fills(*(_fill(f"f{i}", f"o{i}", 1, 100.0, i) for i in range(3))))
+    assert list(state.fills) == ["f1", "f2"] and list(state.order_fills) == ["o1", "o2"]
+
+
+def test_open_orders_snapshot_update_and_cancel():
+    state = AccountState()
+    state.apply({"feed": "open_orders_snapshot", "orders": [_order("tp-1", order_type="take_profit")]})
+    state.apply({"feed": "open_orders", "order": _order("sl-1")})
+    assert state.order("sl-1")["side"] == "sell" and state.order("tp-1")["type"] == "take_profit"
+    state.apply({"feed": "open_orders", "order_id": "tp-1", "is_cancel": True})
+    assert state.order("tp-1") is None
+    state.apply({"feed": "open_orders_snapshot", "orders": []})
+    assert state.orders == {}
+
+
+def test_positions_return_only_changed_symbols():
+    state = AccountState()
+    assert state.apply(_positions((1.0, 100.0))) == [SYMBOL]
+    assert state.position(SYMBOL)["side"] == "long"
+    assert state.apply(_positions((1.0, 100.0))) == []
+    assert state.apply(_positions((-2.0, 99.0))) == [SYMBOL]
+    assert state.apply(_positions((0, 0))) == [SYMBOL]
+    assert state.position(SYMBOL) is None
+
+
+def test_balances_margin_and_readiness():
+    state = AccountState()
+    state.apply({"feed": "balances_snapshot", "holding": {"USD": 5},
+                 "flex_futures": {"currencies": {"USDC": {"quantity": 250}}, "available_margin": 200}})
+    assert state.balance("USDC") == 250 and state.balance("USD") == 5
+    assert state.available_margin() == 200.0
+    assert not state.ready and state.apply({"feed": "unknown"}) == []
+    for feed in ("fills", "open_orders", "open_positions"):
+        state.apply({"feed": f"{feed}_snapshot"})
+    assert state.ready and state.stats()["max_age_sec"] is not None
+
+
+# ---- sync_account : fills et open_positions reçus dans n'importe quel ordre ----
+
+class RecordingExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def cancel_orders(self, order_ids):
+        self.calls.append(("cancel_orders", list(order_ids)))
+        return {}
+
+
+class RecordingMongo:
+    def __init__(self):
+        self.trades = []
+
+    def save_trade(self, trade):
+        self.trades.append(trade)
+
+
+@pytest.fixture
+def ctx(main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "executor", RecordingExecutor())
+    monkeypatch.setattr(main_module, "account", AccountState())
+    monkeypatch.setattr(main_module, "unconfirmed", {})
+    monkeypatch.setattr(main_module, "mongo", RecordingMongo())
+    monkeypatch.setattr(main_module, "exits", ExitEngine())
+    ctx = SymbolContext(SYMBOL, position_manager=PositionManager())
+    ctx.position_manager.open_position(SYMBOL, "long", 100.0, 1.0, "tp-1", "sl-1")
+    ctx.position_manager.set_fill(100.0, 1.0)
+    account = main_module.account
+    account.apply(_fills(_fill("f-entry", "entry-1", 1, 100.0, 1)))
+    account.apply({"feed": "open_orders_snapshot", "orders": [_order("tp-1", order_type="take_profit"), _order("sl-1")]})
+    return ctx
+
+
+def test_position_update_before_the_tp_fill_waits_for_it(main_module, ctx):
+    account = main_module.account
+    account.apply(_positions())
+    main_module.sync_account(ctx)
+    assert ctx.position_manager.get_position() is not None and SYMBOL in main_module.unconfirmed
+    assert main_module.executor.calls == []
+
+    account.apply(_fills(_fill("f-tp", "tp-1", 1, 100.5, 2, buy=False)))
+    main_module.sync_account(ctx)
+    assert ctx.position_manager.get_position() is None and main_module.unconfirmed == {}
+    assert main_module.executor.calls == [("cancel_orders", ["sl-1"])]
+    assert (main_module.mongo.trades[-1]["reason"], main_module.mongo.trades[-1]["exit_price"]) == ("tp", 100.5)
+
+
+def test_tp_fill_before_the_position_update(main_module, ctx):
+    account = main_module.account
+    account.apply(_positions((1.0, 100.0)))
+    account.apply(_fills(_fill("f-sl", "sl-1", 1, 95.0, 2, buy=False)))
+    main_module.sync_account(ctx)
+    assert ctx.position_manager.get_position() is not None
+    account.apply(_positions())
+    main_module.sync_account(ctx)
+    assert (main_module.mongo.trades[-1]["reason"], main_module.mongo.trades[-1]["exit_price"]) == ("sl", 95.0)
+    assert main_module.executor.calls == [("cancel_orders", ["tp-1"])]
+
+
+def test_position_gone_without_tp_sl_fill_closes_after_the_grace_delay(main_module, ctx, monkeypatch):
+    main_module.account.apply(_positions())
+    main_module.sync_account(ctx)
+    position, since = main_module.unconfirmed[SYMBOL]
+    monkeypatch.setitem(main_module.unconfirmed, SYMBOL, (position, since - main_module.ACCOUNT_CLOSE_GRACE_SEC))
+    main_module.sync_account(ctx)
+    assert ctx.position_manager.get_position() is None
+    # La dernière exécution est l'entrée : elle ne donne pas le prix de sortie
+    assert (main_module.mongo.trades[-1]["reason"], main_module.mongo.trades[-1]["exit_price"]) == ("kraken", 100.0)
+    assert main_module.executor.calls == [("cancel_orders", ["tp-1", "sl-1"])]
@@ -0,0 +1,123 @@
+import threading
+import pytest
+from services.candle_aggregator import CandleAggregator
+from services.candle_scheduler import CandleScheduler, ExchangeClock, CLOCK_DECAY
+
+SYMBOL = "PF_ETHUSD"
+START = 1_748_908_800  # Frontière de 10 s
+
+
+class FakeClock(ExchangeClock):
+    """Horloge Kraken pilotée par le test (secondes)."""
+
+    def __init__(self, now: float):
+        super().__init__()
+        self.value = now
+
+    def now(self) -> float:
+        return self.value
+
+
+@pytest.fixture
+def scheduler():
+    emitted = []
+    aggregator = CandleAggregator(SYMBOL, interval=10)
+    scheduler = CandleScheduler({SYMBOL: aggregator}, emitted.append, FakeClock(START), grace_sec=0.5)
+    scheduler.emitted = emitted
+    return scheduler
+
+
+def _trade(scheduler, price, volume, timestamp):
+    """Trade reçu par le thread WebSocket : bougies clôturées émises sous le verrou (comme _update_candle)."""
+    aggregator = scheduler.aggregators[SYMBOL]
+    with aggregator.lock:
+        for candle in aggregator.update(price, volume, timestamp) or ():
+            scheduler.on_candle(candle)
+
+
+def _raw(scheduler):
+    window = scheduler.aggregators[SYMBOL].candles.window()
+    return list(zip(window["timestamp"].tolist(), window["open"].tolist(), window["high"].tolist(),
+                    window["low"].tolist(), window["close"].tolist(), window["volume"].tolist()))
+
+
+def test_candle_closes_on_the_exchange_clock_after_the_grace(scheduler):
+    _trade(scheduler, 100.0, 1.0, START + 1)
+    _trade(scheduler, 101.0, 2.0, START + 4)
+    assert scheduler.tick(START + 10.4) == 0  # Frontière passée, marge pas encore écoulée
+    assert scheduler.tick(START + 10.5) == 1
+    assert _raw(scheduler) == [(START, 100.0, 101.0, 100.0, 101.0, 3.0)]
+    scheduler.clock.value = START + 10.6
+    assert scheduler.tick() == 0  # Déjà clôturée
+
+
+def test_empty_intervals_produce_flat_candles(scheduler):
+    _trade(scheduler, 100.0, 1.0, START + 1)
+    _trade(scheduler, 102.0, 1.0, START + 9)
+    assert scheduler.tick(START + 40.5) == 4
+    assert _raw(scheduler)[1:] == [(START + 10 * i, 102.0, 102.0, 102.0, 102.0, 0.0) for i in (1, 2, 3)]
+    assert scheduler.stats()["filled"] == 3 and scheduler.closed == 4
+    assert [c["timestamp"] for c in scheduler.emitted] == [START, START + 10, START + 20, START + 30]
+
+
+def test_late_trade_merges_into_the_current_candle(scheduler):
+    _trade(scheduler, 100.0, 1.0, START + 1)
+    scheduler.tick(START + 20.5)  # [START, START + 10) et [START + 10, START + 20) clôturées
+    _trade(scheduler, 99.0, 0.5, START + 19)  # En retard : son intervalle est déjà clôturé
+    _trade(scheduler, 98.0, 0.25, START + 21)
+    scheduler.tick(START + 30.5)
+    aggregator = scheduler.aggregators[SYMBOL]
+    assert aggregator.late == 1
+    assert _raw(scheduler)[-1] == (START + 20, 99.0, 99.0, 98.0, 98.0, 0.75)
+    assert [c["timestamp"] for c in scheduler.emitted] == [START, START + 10, START + 20]
+
+
+def test_trade_in_a_later_interval_fills_the_gap_before_the_scheduler(scheduler):
+    _trade(scheduler, 100.0, 1.0, START + 1)
+    _trade(scheduler, 105.0, 1.0, START + 31)  # Flux en avance sur le réveil du scheduler
+    assert [c["timestamp"] for c in scheduler.emitted] == [START, START + 10, START + 20]
+    assert scheduler.tick(START + 30.5) == 0
+    assert _raw(scheduler)[-1] == (START + 20, 100.0, 100.0, 100.0, 100.0, 0.0)
+
+
+def test_pause_suspends_closes(scheduler):
+    _trade(scheduler, 100.0, 1.0, START + 1)
+    scheduler.pause()
+    assert scheduler.tick(START + 60) == 0
+    scheduler.resume()
+    assert scheduler.tick(START + 60) == 5  # Intervalles jusqu'à START + 50 (marge déduite)
+
+
+def test_next_deadline_is_the_next_boundary_plus_grace(scheduler):
+    assert scheduler.next_deadline(START + 3) == START + 10.5
+    assert scheduler.next_deadline(START + 10.2) == START + 10.5
+    assert scheduler.next_deadline(START + 10.6) == START + 20.5
+
+
+def test_exchange_clock_tracks_the_smallest_delay():
+    clock = ExchangeClock()
+    clock.update(10_000, 9_900)   # Échantillon +100 ms
+    clock.update(10_150, 10_000)  # Délai de réception plus court : +150 ms retenu immédiatement
+    assert clock.offset_ms == 150
+    clock.update(10_050, 10_000)  # Délai plus long : l'estimation ne se relâche que lentement
+    assert clock.offset_ms == pytest.approx(150 - 100 * CLOCK_DECAY)
+
+
+def test_concurrent_trades_and_ticks_emit_candles_in_order(scheduler):
+    """Trades (thread WebSocket) et clôtures à l'échéance (scheduler) en parallèle : ni doublon ni inversion."""
+    done = threading.Event()
+
+    def closes():
+        while not done.is_set():
+            scheduler.tick(scheduler.clock.value)
+
+    thread = threading.Thread(target=closes)
+    thread.start()
+    for i in range(2_000):
+        timestamp = START + i * 0.7
+        scheduler.clock.value = timestamp
+        _trade(scheduler, 100.0 + i % 7, 1.0, timestamp)
+    done.set()
+    thread.join()
+    timestamps = [c["timestamp"] for c in scheduler.emitted]
+    assert timestamps == list(range(START, START + 10 * len(timestamps), 10))
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from services.candle_store import CandleStore, to_heikin_ashi
+
+CAPACITY = 8
+
+
+def _raw(i):
+    return {"symbol": "PF_ETHUSD", "timestamp": 1_000 + i, "open": 100.0 + i, "high": 102.0 + i, "low": 99.0 + i,
+            "close": 101.0 + i, "volume": float(i)}
+
+
+def _store(count, capacity=CAPACITY):
+    store, ha = CandleStore(capacity), None
+    for i in range(count):
+        ha = to_heikin_ashi(_raw(i), ha)
+        store.append(_raw(i), ha)
+    return store
+
+
+def test_wraparound_keeps_the_last_capacity_candles_in_order():
+    store = _store(CAPACITY * 3 + 3)
+    assert len(store) == CAPACITY and store.total == CAPACITY * 3 + 3
+    expected = np.arange(CAPACITY * 2 + 3, CAPACITY * 3 + 3, dtype=np.float64)
+    assert np.array_equal(store.column("volume"), expected)
+    last = _raw(CAPACITY * 3 + 2)
+    del last["symbol"]
+    assert store.last() == last
+
+
+@pytest.mark.parametrize("count", [CAPACITY - 1, CAPACITY, CAPACITY + 3, CAPACITY * 2 - 1])
+def test_window_is_a_contiguous_read_only_view_across_the_wrap(count):
+    store = _store(count)
+    window = store.window(5)
+    for name, column in window.items():
+        assert np.shares_memory(column, store._data), name  # Vue, pas de copie
+        assert column.flags.c_contiguous and not column.flags.writeable
+    assert window["volume"].tolist() == [float(i) for i in range(count - 5, count)]
+    ha = store.window(5, kind="ha")
+    assert set(ha) == {"timestamp", "open", "high", "low", "close", "volume"}
+    raw = _raw(count - 1)
+    assert ha["close"][-1] == pytest.approx((raw["open"] + raw["high"] + raw["low"] + raw["close"]) / 4)
+
+
+def test_window_larger_than_the_history_returns_what_exists():
+    assert _store(0).window(3)["close"].size == 0
+    assert _store(0).last() is None
+    store = _store(3)
+    assert store.window(10)["timestamp"].tolist() == [1_000.0, 1_001.0, 1_002.0]
+    assert store.window()["timestamp"].size == 3
+    assert _store(CAPACITY + 5).window(CAPACITY * 4)["timestamp"].size == CAPACITY
+
+
+def test_view_stays_valid_until_capacity_minus_n_appends():
+    store = _store(CAPACITY + 2)
+    view = store.column("volume", 3)
+    snapshot = view.copy()
+    for i in range(CAPACITY + 2, CAPACITY + 2 + CAPACITY - 3):
+        store.append(_raw(i))
+    assert np.array_equal(view, snapshot)
+
+
+def test_raw_only_candles_have_no_heikin_ashi_values():
+    store = CandleStore(2)
+    store.append(_raw(0))
+    assert np.isnan(store.last("ha")["close"])
+    with pytest.raises(ValueError):
+        store.window(kind="renko")
+    with pytest.raises(ValueError):
+        CandleStore(0)
@@ -0,0 +1,100 @@
+import pytest
+from memory.position_manager import PositionManager
+from services.account_feed import AccountState
+from strategy.multi_symbol import SymbolContext
+from trading.exit_engine import ExitEngine
+
+SYMBOL = "PF_ETHUSD"
+
+
+def _ack(tag, ok=True, order_id=None, status="placed", error=None):
+    return {"ok": ok, "order_id": order_id or f"{tag}-1", "cli_ord_id": None, "status": status, "tag": tag,
+            "error": None if ok else error or status, "latency_ms": 1.0}
+
+
+class ScriptedExecutor:
+    """Retourne les accusés préparés par le test et enregistre les envois."""
+
+    def __init__(self, acks):
+        self.acks = acks
+        self.calls = []
+
+    def plan_entry(self, symbol, side, size):
+        return {"size": size, "limit_price": None, "expected_price": None}
+
+    def open_with_tp_sl(self, symbol, action, size, tp=None, sl=None, limit_price=None):
+        self.calls.append(("open_with_tp_sl", action, size))
+        return self.acks
+
+    def reverse_position(self, symbol, side, size, action, new_size, tp=None, sl=None, cancel_ids=(), limit_price=None):
+        self.calls.append(("reverse_position", side, action, tuple(cancel_ids)))
+        return self.acks
+
+    def cancel_orders(self, order_ids):
+        self.calls.append(("cancel_orders", list(order_ids)))
+        return {}
+
+
+@pytest.fixture
+def ctx(main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "exits", ExitEngine())
+    monkeypatch.setattr(main_module, "account", AccountState())
+    return SymbolContext(SYMBOL, position_manager=PositionManager())
+
+
+def _open(main_module, monkeypatch, ctx, acks, reverse_from=None):
+    executor = ScriptedExecutor(acks)
+    monkeypatch.setattr(main_module, "executor", executor)
+    main_module.open_position(ctx, "buy", 100.0, 0, reverse_from=reverse_from)
+    return executor
+
+
+def test_accepted_entry_records_tp_sl_ids(main_module, monkeypatch, ctx):
+    _open(main_module, monkeypatch, ctx, {"entry": _ack("entry"), "tp": _ack("tp"), "sl": _ack("sl")})
+    assert ctx.position_manager.get_tp_sl_ids() == ("tp-1", "sl-1")
+    assert SYMBOL in main_module.exits.watches
+
+
+@pytest.mark.parametrize("entry", [
+    _ack("entry", ok=False, status="insufficientAvailableFunds"),
+    _ack("entry", ok=False, order_id=None, status=None, error="Read timed out"),
+])
+def test_failed_entry_drops_the_local_position_and_cancels_tp_sl(main_module, monkeypatch, ctx, entry):
+    messages = len(main_module.notifier.messages)
+    executor = _open(main_module, monkeypatch, ctx, {"entry": entry, "tp": _ack("tp"), "sl": _ack("sl")})
+    assert ctx.position_manager.get_position() is None
+    assert SYMBOL not in main_module.exits.watches
+    assert executor.calls[-1] == ("cancel_orders", ["tp-1", "sl-1"])
+    # Étage d'exécution synchrone : annulation notifiée avant l'ouverture ; aucun trade clôturé
+    sent = main_module.notifier.messages[messages:]
+    assert len(sent) == 2 and "Entrée non exécutée" in sent[0] and "ouvert" in sent[1]
+
+
+def test_failed_entry_only_cancels_accepted_tp_sl(main_module, monkeypatch, ctx):
+    acks = {"entry": _ack("entry", ok=False, status="iocWouldNotExecute"),
+            "tp": _ack("tp", ok=False, status="invalidPrice"), "sl": _ack("sl")}
+    executor = _open(main_module, monkeypatch, ctx, acks)
+    assert executor.calls[-1] == ("cancel_orders", ["sl-1"])
+
+
+def test_failed_entry_of_a_reversal_leaves_the_account_flat(main_module, monkeypatch, ctx):
+    ctx.position_manager.open_position(SYMBOL, "short", 101.0, 1.0, "old-tp", "old-sl")
+    previous = ctx.position_manager.get_position()
+    ctx.position_manager.close_position()  # Clôture locale faite par on_new_candle avant le retournement
+    acks = {"cancel_0": _ack("cancel_0", status="cancelled"), "close": _ack("close"),
+            "entry": _ack("entry", ok=False, status="iocWouldNotExecute"), "tp": _ack("tp"), "sl": _ack("sl")}
+    executor = _open(main_module, monkeypatch, ctx, acks, reverse_from=previous)
+    assert executor.calls[0] == ("reverse_position", "short", "buy", ("old-tp", "old-sl"))
+    assert executor.calls[-1] == ("cancel_orders", ["tp-1", "sl-1"])
+    assert ctx.position_manager.get_position() is None and main_module.exits.watches == {}
+    assert main_module.notifier.messages[-2].endswith("Position à plat")
+
+
+def test_late_failure_does_not_touch_a_newer_position(main_module, monkeypatch, ctx):
+    _open(main_module, monkeypatch, ctx, {"entry": _ack("entry"), "tp": _ack("tp"), "sl": _ack("sl")})
+    newer = ctx.position_manager.get_position()
+    stale = dict(newer)
+    main_module.record_tp_sl(ctx, stale, {"entry": _ack("entry", ok=False, status="marketSuspended"),
+                                          "tp": _ack("tp", order_id="tp-9"), "sl": _ack("sl", order_id="sl-9")})
+    assert ctx.position_manager.get_position() is newer and SYMBOL in main_module.exits.watches
+    assert main_module.executor.calls[-1] == ("cancel_orders", ["tp-9", "sl-9"])
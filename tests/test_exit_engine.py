@@ -0,0 +1,131 @@
+import pytest
+from memory.position_manager import PositionManager
+from strategy.multi_symbol import SymbolContext
+from trading.exit_engine import ExitEngine
+
+SYMBOL = "PF_ETHUSD"
+
+
+def _position(side="long", tp_id=None, sl_id=None):
+    return {"symbol": SYMBOL, "side": side, "entry_price": 100.0, "size": 1.0, "tp_id": tp_id, "sl_id": sl_id}
+
+
+def _engine(events):
+    return ExitEngine(on_exit=events.append, tp_pct=1, sl_pct=1, min_gain=0, trail_pct=0)
+
+
+def test_ticks_inside_the_band_do_not_fire():
+    events = []
+    exits = _engine(events)
+    exits.arm(_position())
+    for price in (99.5, 100.0, 100.9):
+        exits.on_tick(SYMBOL, price, 1_000, 0)
+    assert events == [] and exits.stats()["armed"] == 1
+    assert exits.last_price(SYMBOL) == 100.9
+
+
+def test_take_profit_and_stop_loss_fire_once():
+    events = []
+    exits = _engine(events)
+    position = exits.arm(_position()).position
+    exits.on_tick(SYMBOL, 101.0, 1_000, 0)
+    exits.on_tick(SYMBOL, 102.0, 1_001, 0)
+    assert [(e["reason"], e["price"], e["level"]) for e in events] == [("tp", 101.0, 101.0)]
+    assert events[0]["position"] is position
+
+    exits.arm(_position(side="short"))
+    exits.on_tick(SYMBOL, 101.0, 1_002, 0)
+    assert events[-1]["reason"] == "sl"
+    assert exits.stats() == {"armed": 0, "fired": {"tp": 1, "sl": 1}}
+
+
+def test_arming_uses_the_exchange_clock():
+    """Un trade antérieur au dernier trade vu à l'armement (snapshot rejoué) ne déclenche rien."""
+    events = []
+    exits = _engine(events)
+    exits.on_tick(SYMBOL, 100.0, 5_000, 0)
+    watch = exits.arm(_position())
+    assert watch.armed_ms == 5_000
+    exits.on_tick(SYMBOL, 98.0, 4_999, 0)
+    assert events == []
+    exits.on_tick(SYMBOL, 98.0, 5_000, 0)
+    assert events[0]["reason"] == "sl"
+
+
+def test_disarm_only_removes_the_given_position():
+    exits = _engine([])
+    exits.arm(_position())
+    exits.disarm(SYMBOL, _position())
+    assert exits.stats()["armed"] == 1
+    exits.disarm(SYMBOL)
+    assert exits.stats()["armed"] == 0
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def close_position(self, symbol, side, size, cancel_ids=()):
+        self.calls.append(("close_position", symbol, side, size, tuple(cancel_ids)))
+        return {}
+
+    def cancel_orders(self, order_ids):
+        self.calls.append(("cancel_orders", list(order_ids)))
+        return {}
+
+
+@pytest.fixture
+def ctx(main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "executor", RecordingExecutor())
+    return SymbolContext(SYMBOL, position_manager=PositionManager())
+
+
+def _open(ctx, tp_id, sl_id):
+    ctx.position_manager.open_position(SYMBOL, "long", 100.0, 1.0, tp_id, sl_id)
+    return ctx.position_manager.get_position()
+
+
+def _event(position, reason):
+    return {"symbol": SYMBOL, "position": position, "side": position["side"], "reason": reason, "price": 101.0,
+            "level": 101.0, "high": 101.0, "low": 100.0, "time_ms": 1_000, "delay_ms": 1.0, "received_ns": 0}
+
+
+def test_tp_with_resting_orders_only_cancels_the_sibling(main_module, ctx):
+    position = _open(ctx, "tp-1", "sl-1")
+    main_module.close_on_exit(ctx, _event(position, "tp"))
+    assert main_module.executor.calls == [("cancel_orders", ["sl-1"])]
+    assert ctx.position_manager.get_position() is None
+
+
+@pytest.mark.parametrize("tp_id, sl_id, reason", [
+    (None, None, "tp"),      # Réconciliation sans ordres résidents, ou accusé du lot en vol
+    (None, "sl-1", "tp"),    # TP refusé dans le lot : seul le SL existe
+    ("tp-1", None, "sl"),
+])
+def test_tp_or_sl_without_its_resting_order_closes_at_market(main_module, ctx, tp_id, sl_id, reason):
+    position = _open(ctx, tp_id, sl_id)
+    main_module.close_on_exit(ctx, _event(position, reason))
+    assert main_module.executor.calls == [("close_position", SYMBOL, "long", 1.0, (tp_id, sl_id))]
+    assert ctx.position_manager.get_position() is None
+
+
+def test_local_exit_closes_at_market_and_cancels_both(main_module, ctx):
+    position = _open(ctx, "tp-1", "sl-1")
+    main_module.close_on_exit(ctx, _event(position, "trailing"))
+    assert main_module.executor.calls == [("close_position", SYMBOL, "long", 1.0, ("tp-1", "sl-1"))]
+
+
+def test_stale_exit_event_is_ignored(main_module, ctx):
+    old = _open(ctx, "tp-1", "sl-1")
+    _open(ctx, "tp-2", "sl-2")
+    main_module.close_on_exit(ctx, _event(old, "tp"))
+    assert main_module.executor.calls == []
+    assert ctx.position_manager.get_tp_sl_ids() == ("tp-2", "sl-2")
+
+
+def test_tp_sl_acked_after_the_exit_are_cancelled(main_module, ctx):
+    position = _open(ctx, None, None)
+    main_module.close_on_exit(ctx, _event(position, "tp"))
+    acks = {"tp": {"ok": True, "order_id": "tp-late"}, "sl": {"ok": True, "order_id": "sl-late"}}
+    main_module.record_tp_sl(ctx, position, acks)
+    assert main_module.executor.calls[-1] == ("cancel_orders", ["tp-late", "sl-late"])
@@ -0,0 +1,71 @@
+import math
+import pandas as pd
+import pytest
+from strategy.indicators import StreamingIndicators
+from strategy.parity import check_parity, synthetic_candles
+
+N_CANDLES = 3000
+RSI_PERIOD = 14
+VOLUME_WINDOW = 10
+
+
+@pytest.fixture(scope="module")
+def candles():
+    candles = synthetic_candles(N_CANDLES, seed=7)
+    # Volumes d'ordres de grandeur très différents puis bougies de comblement (volume nul) :
+    # les pires cas pour la dérive des sommes glissantes
+    for i, candle in enumerate(candles):
+        if i % 97 < 5:
+            candle["volume"] = 1e9 + i
+        elif i % 211 < 15:
+            candle["volume"] = 0.0
+    return candles
+
+
+def _reference(candles, rsi_mode):
+    """RSI et volume moyen recalculés en entier par pandas (SMA glissante ou lissage de Wilder)."""
+    df = pd.DataFrame(candles)
+    delta = df["close"].diff().iloc[1:]
+    gain, loss = delta.clip(lower=0), -delta.clip(upper=0)
+    if rsi_mode == "sma":
+        avg_gain = gain.rolling(RSI_PERIOD).mean()
+        avg_loss = loss.rolling(RSI_PERIOD).mean()
+    else:
+        # Moyenne simple des `period` premiers écarts, puis avg = (avg * (n - 1) + x) / n
+        def wilder(values):
+            seed = values.iloc[:RSI_PERIOD].mean()
+            series = pd.concat([pd.Series([seed]), values.iloc[RSI_PERIOD:]], ignore_index=True)
+            smoothed = series.ewm(alpha=1 / RSI_PERIOD, adjust=False).mean()
+            return pd.Series([math.nan] * (RSI_PERIOD - 1) + smoothed.tolist(), index=values.index)
+        avg_gain, avg_loss = wilder(gain), wilder(loss)
+    rsi = (100 - 100 / (1 + avg_gain / (avg_loss + 1e-9))).reindex(df.index)
+    avg_volume = df["volume"].rolling(VOLUME_WINDOW, min_periods=1).mean()
+    return rsi, avg_volume
+
+
+@pytest.mark.parametrize("rsi_mode", ["sma", "wilder"])
+def test_streaming_indicators_match_pandas(candles, rsi_mode):
+    indicators = StreamingIndicators(RSI_PERIOD, VOLUME_WINDOW, rsi_mode)
+    rsi, avg_volume = _reference(candles, rsi_mode)
+    for i, candle in enumerate(candles):
+        indicators.update(candle)
+        if indicators.ready:
+            assert indicators.rsi == pytest.approx(rsi[i], rel=1e-9, abs=1e-6), i
+        else:
+            assert indicators.rsi == 50.0
+        assert indicators.avg_volume == pytest.approx(avg_volume[i], rel=1e-9, abs=1e-6), i
+
+
+@pytest.mark.parametrize("rsi_mode", ["sma", "wilder"])
+def test_volume_sum_is_resynced(candles, rsi_mode):
+    """Après les volumes de 1e9, une fenêtre de bougies vides donne un volume moyen nul (aux arrondis près)."""
+    indicators = StreamingIndicators(RSI_PERIOD, VOLUME_WINDOW, rsi_mode)
+    for candle in candles:
+        indicators.update(candle)
+        if list(indicators._volumes) == [0.0] * VOLUME_WINDOW:
+            assert indicators.avg_volume < 1e-12
+    assert indicators._volume_sum == pytest.approx(math.fsum(indicators._volumes), abs=1e-6)
+
+
+def test_decisions_match_the_pandas_engine(candles):
+    assert check_parity(candles) == []
@@ -0,0 +1,62 @@
+import time
+import pytest
+from services.account_feed import AccountState
+from services.order_book import OrderBook
+from simulator.kraken_futures import KrakenFuturesSimulator, SyntheticSource
+from memory.position_manager import PositionManager
+from strategy.multi_symbol import SymbolContext
+from trading.exit_engine import ExitEngine
+from trading.order_executor import OrderExecutor, IOC_NOT_FILLED
+from trading.paper_executor import PaperExecutor
+
+SYMBOL = "PF_ETHUSD"
+
+
+def _stale_book():
+    """Carnet local en retard sur le marché (2500) et peu profond : plan_entry choisit une limite IOC."""
+    book = OrderBook(SYMBOL)
+    book.apply_snapshot(bids=[{"price": 2399.0, "qty": 5}],
+                        asks=[{"price": 2400.0, "qty": 0.01}, {"price": 2450.0, "qty": 5}], seq=1)
+    return book
+
+
+@pytest.fixture
+def simulator():
+    sim = KrakenFuturesSimulator(SyntheticSource([SYMBOL], rate_per_sec=0), [SYMBOL], ws_port=0, rest_port=0)
+    sim.start()
+    sim._publish([(SYMBOL, int(time.time() * 1000), 2500.0, 1.0, "buy")])
+    yield sim
+    sim.stop()
+
+
+@pytest.fixture
+def ctx(main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "exits", ExitEngine())
+    monkeypatch.setattr(main_module, "account", AccountState())
+    return SymbolContext(SYMBOL, position_manager=PositionManager())
+
+
+def test_ioc_entry_rejected_by_the_simulator_leaves_nothing_behind(main_module, monkeypatch, simulator, ctx):
+    executor = OrderExecutor(base_url=simulator.rest_url, books={SYMBOL: _stale_book()})
+    monkeypatch.setattr(main_module, "executor", executor)
+    assert executor.plan_entry(SYMBOL, "buy", 0.02)["limit_price"] is not None
+
+    main_module.open_position(ctx, "buy", 2400.0, time.perf_counter_ns())
+
+    assert ctx.position_manager.get_position() is None
+    assert main_module.exits.watches == {}
+    assert simulator.open_orders() == [] and simulator.open_positions() == []
+    assert any("IOC non exécuté" in message for message in main_module.notifier.messages)
+
+
+def test_paper_executor_rejects_the_ioc_when_it_is_sent(main_module, monkeypatch, ctx):
+    paper = PaperExecutor(latency_ms=0, books={SYMBOL: _stale_book()})
+    paper.on_tick(SYMBOL, 2500.0, 1_000)
+    monkeypatch.setattr(main_module, "executor", paper)
+
+    main_module.open_position(ctx, "buy", 2400.0, time.perf_counter_ns())
+
+    assert ctx.position_manager.get_position() is None and main_module.exits.watches == {}
+    assert paper.get_open_orders() == [] and paper.pending.get(SYMBOL, []) == []
+    acks = paper.open_with_tp_sl(SYMBOL, "buy", 0.01, 2600.0, 2300.0, limit_price=2401.2)
+    assert acks["entry"]["status"] == IOC_NOT_FILLED and acks["tp"]["ok"]
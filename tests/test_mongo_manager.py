@@ -0,0 +1,114 @@
+import json
+import os
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+from config import TRADE_COLLECTION, CANDLE_COLLECTION
+from db.mongo_manager import MongoManager, DUPLICATE_KEY
+
+
+class FakeCollection:
+    def __init__(self, server):
+        self.server = server
+        self.documents = []
+        self.indexes = []
+
+    def create_index(self, keys, **options):
+        self.server.check()
+        self.indexes.append(keys)
+
+    def insert_many(self, documents, ordered=True):
+        self.server.check()
+        errors = [{"index": i, "code": code, "errmsg": "rejeté"}
+                  for i, document in enumerate(documents) if (code := document.get("reject"))]
+        rejected = {err["index"] for err in errors}
+        self.documents.extend(d for i, d in enumerate(documents) if i not in rejected)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(documents) - len(errors)})
+
+
+class FakeServer(dict):
+    """client[db][collection] en mémoire ; `down` simule une base injoignable."""
+
+    def __init__(self, down=False):
+        super().__init__()
+        self.down = down
+
+    def check(self):
+        if self.down:
+            raise ServerSelectionTimeoutError("localhost:27017: connection refused")
+
+    def collection(self, name):
+        return self.setdefault(name, FakeCollection(self))
+
+
+class FakeClient:
+    def __init__(self, server):
+        self.server = server
+
+    def __getitem__(self, db_name):
+        return type("Database", (), {"__getitem__": lambda _, name: self.server.collection(name)})()
+
+
+def _manager(server, spool_dir):
+    # Thread d'écriture en attente (flush_sec long) : les flush sont déclenchés par le test
+    return MongoManager(client=FakeClient(server), batch_size=1000, flush_sec=3600, spool_dir=str(spool_dir))
+
+
+def _spooled(spool_dir, collection):
+    path = os.path.join(spool_dir, f"{collection}.jsonl")
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_failed_flush_spools_and_is_replayed_on_next_start(tmp_path):
+    down = FakeServer(down=True)
+    mongo = _manager(down, tmp_path)
+    for i in range(3):
+        mongo.save_trade({"symbol": "PF_ETHUSD", "timestamp": i, "pnl_percent": 0.1 * i})
+    mongo.save_candle({"symbol": "PF_ETHUSD", "timestamp": 10, "close": 2500.0})
+    mongo.flush()
+    assert mongo.stats() == {"pending": 0, "written": 0, "spooled": 4, "dropped": 0}
+    assert [d["timestamp"] for d in _spooled(tmp_path, TRADE_COLLECTION)] == [0, 1, 2]
+    mongo.close()  # Rejeu en échec à l'arrêt : documents remis au spool, rien de perdu
+    assert not mongo.indexed and mongo.dropped == 0
+
+    up = FakeServer()
+    restarted = _manager(up, tmp_path)
+    restarted.close()  # Dernier cycle du thread d'écriture : flush puis rejeu du spool
+    assert [d["timestamp"] for d in up.collection(TRADE_COLLECTION).documents] == [0, 1, 2]
+    assert up.collection(CANDLE_COLLECTION).documents == [{"symbol": "PF_ETHUSD", "timestamp": 10, "close": 2500.0}]
+    assert restarted.written == 4 and restarted.indexed
+    assert os.listdir(tmp_path) == []
+
+
+def test_replay_keeps_the_spool_while_the_base_is_down(tmp_path):
+    mongo = _manager(FakeServer(down=True), tmp_path)
+    mongo.save_trade({"symbol": "PF_ETHUSD", "timestamp": 1})
+    mongo.flush()
+    mongo._replay_spool()
+    assert [d["timestamp"] for d in _spooled(tmp_path, TRADE_COLLECTION)] == [1]
+    assert os.listdir(tmp_path) == [f"{TRADE_COLLECTION}.jsonl"]
+    mongo.close()
+
+
+def test_only_failed_documents_are_spooled(tmp_path):
+    server = FakeServer()
+    mongo = _manager(server, tmp_path)
+    mongo.save_trade({"timestamp": 1})
+    mongo.save_trade({"timestamp": 2, "reject": DUPLICATE_KEY})  # Doublon : ignoré
+    mongo.save_trade({"timestamp": 3, "reject": 121})             # Validation : mis au spool
+    mongo.save_trade({"timestamp": 4})
+    mongo.flush()
+    assert [d["timestamp"] for d in server.collection(TRADE_COLLECTION).documents] == [1, 4]
+    assert [d["timestamp"] for d in _spooled(tmp_path, TRADE_COLLECTION)] == [3]
+    assert (mongo.written, mongo.spooled) == (2, 1)
+    mongo.close()
+
+
+def test_buffer_overflow_drops_the_oldest(tmp_path):
+    server = FakeServer()
+    mongo = MongoManager(client=FakeClient(server), batch_size=1000, flush_sec=3600, buffer_max=2,
+                         spool_dir=str(tmp_path))
+    for i in range(3):
+        mongo.save_decision({"timestamp": i})
+    mongo.close()
+    assert mongo.stats() == {"pending": 0, "written": 2, "spooled": 0, "dropped": 1}
@@ -0,0 +1,59 @@
+from services.order_book import OrderBook
+
+
+def _book():
+    book = OrderBook("PF_ETHUSD")
+    book.apply_snapshot(bids=[{"price": 99.0, "qty": 2}, {"price": 98.0, "qty": 3}, {"price": 97.0, "qty": 0}],
+                        asks=[{"price": 101.0, "qty": 1}, {"price": 102.0, "qty": 4}], seq=10, timestamp=1000)
+    return book
+
+
+def test_snapshot_ignores_empty_levels():
+    book = _book()
+    assert book.best_bid() == (99.0, 2.0)
+    assert book.best_ask() == (101.0, 1.0)
+    assert book.spread() == 2.0
+    assert book.mid() == 100.0
+    assert book.stats()["levels"] == 4
+
+
+def test_deltas_update_and_remove_levels():
+    book = _book()
+    assert book.apply_delta("buy", 99.5, 1.0, seq=11)
+    assert book.apply_delta("sell", 101.0, 0.0, seq=12)
+    assert book.best_bid() == (99.5, 1.0)
+    assert book.best_ask() == (102.0, 4.0)
+    assert book.seq == 12 and book.updates == 2
+
+
+def test_stale_and_duplicate_deltas_are_ignored():
+    book = _book()
+    assert book.apply_delta("buy", 99.0, 5.0, seq=10)
+    assert book.apply_delta("buy", 99.0, 5.0, seq=3)
+    assert book.best_bid() == (99.0, 2.0)
+    assert book.synced and book.gaps == 0
+
+
+def test_sequence_gap_invalidates_until_next_snapshot():
+    book = _book()
+    assert not book.apply_delta("buy", 99.5, 1.0, seq=12)
+    assert not book.synced and book.gaps == 1
+    assert book.best_bid() is None
+    assert book.expected_fill("buy", 1.0) == (None, 0.0)
+    assert book.apply_delta("buy", 99.6, 1.0, seq=13)  # Ignoré jusqu'au snapshot
+    assert book.seq == 10
+
+    book.apply_snapshot(bids=[{"price": 98.0, "qty": 1}], asks=[{"price": 100.0, "qty": 1}], seq=20)
+    assert book.synced
+    assert book.best_bid() == (98.0, 1.0)
+    assert book.apply_delta("sell", 100.5, 2.0, seq=21)
+
+
+def test_expected_fill_walks_the_depth_and_is_refreshed_by_deltas():
+    book = _book()
+    assert book.expected_fill("buy", 3.0) == ((101.0 + 2 * 102.0) / 3, 3.0)
+    assert book.expected_fill("sell", 10.0) == ((2 * 99.0 + 3 * 98.0) / 5, 5.0)
+    book.apply_delta("sell", 100.0, 3.0, seq=11)
+    assert book.expected_fill("buy", 3.0) == (100.0, 3.0)
+    assert book.liquidity("buy", 101.0) == 4.0
+    assert book.liquidity("sell", 98.5) == 2.0
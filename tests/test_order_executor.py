@@ -0,0 +1,54 @@
+from trading.order_executor import OrderExecutor
+
+
+class RecordingExecutor(OrderExecutor):
+    """Réponses batchorder fournies par le test (aucun appel réseau)."""
+
+    def __init__(self, respond):
+        super().__init__()
+        self.respond = respond
+        self.sent = []
+
+    def _post(self, endpoint, payload):
+        self.sent.append(payload)
+        return {"result": "success", "batchStatus": self.respond(payload["batchOrder"])}, None, 1.0
+
+
+def _status(instruction, order_id, status="placed"):
+    if instruction["order"] == "cancel":
+        return {"order_id": instruction["order_id"], "status": status}
+    return {"order_id": order_id, "order_tag": instruction["order_tag"], "status": status}
+
+
+def test_batch_statuses_are_matched_by_tag_not_position():
+    def respond(batch):
+        statuses = [_status(o, f"id-{o.get('order_tag', o.get('order_id'))}") for o in batch]
+        return statuses[::-1]  # Kraken ne garantit pas l'ordre du lot
+
+    executor = RecordingExecutor(respond)
+    acks = executor.reverse_position("PF_ETHUSD", "long", 1.0, "sell", 1.0, tp=90.0, sl=110.0,
+                                     cancel_ids=("old-tp", "old-sl"))
+    assert [o["order_tag"] for o in executor.sent[0]["batchOrder"] if o["order"] == "send"] == [
+        "close", "entry", "tp", "sl"]
+    assert all(ack["ok"] for ack in acks.values())
+    assert acks["entry"]["order_id"] == "id-entry"
+    assert acks["tp"]["order_id"] == "id-tp"
+    assert acks["sl"]["order_id"] == "id-sl"
+    assert acks["cancel_0"]["order_id"] == "old-tp"
+    assert acks["cancel_1"]["order_id"] == "old-sl"
+
+
+def test_missing_or_rejected_status_fails_only_its_order():
+    def respond(batch):
+        statuses = []
+        for o in batch:
+            if o.get("order_tag") == "sl":
+                continue  # Aucun statut renvoyé pour le SL
+            statuses.append(_status(o, f"id-{o['order_tag']}", "iocWouldNotExecute" if o["order_tag"] == "entry"
+                                    else "placed"))
+        return statuses
+
+    acks = RecordingExecutor(respond).open_with_tp_sl("PF_ETHUSD", "buy", 1.0, tp=110.0, sl=90.0, limit_price=100.0)
+    assert not acks["entry"]["ok"] and acks["entry"]["error"] == "iocWouldNotExecute"
+    assert acks["tp"]["ok"] and acks["tp"]["order_id"] == "id-tp"
+    assert not acks["sl"]["ok"] and acks["sl"]["order_id"] is None
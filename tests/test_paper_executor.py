@@ -0,0 +1,73 @@
+import pytest
+from trading.paper_executor import PaperExecutor
+
+SYMBOL = "PF_ETHUSD"
+
+
+@pytest.fixture
+def paper():
+    executor = PaperExecutor(latency_ms=50, fee_pct=0.0, balance=1_000.0)
+    executor.on_tick(SYMBOL, 100.0, 1_000)
+    return executor
+
+
+def _open_long(paper, tp=110.0, sl=95.0):
+    acks = paper.open_with_tp_sl(SYMBOL, "buy", 1.0, tp, sl)
+    assert all(ack["ok"] for ack in acks.values())
+    paper.on_tick(SYMBOL, 100.0, 1_050)  # Premier trade après la latence : entrée exécutée
+    return acks
+
+
+def test_market_order_fills_after_latency_on_the_trade_clock(paper):
+    paper.open_with_tp_sl(SYMBOL, "buy", 1.0)
+    paper.on_tick(SYMBOL, 101.0, 1_049)
+    assert paper.positions == {}
+    paper.on_tick(SYMBOL, 102.0, 1_050)
+    assert paper.positions[SYMBOL]["size"] == 1.0
+    assert paper.positions[SYMBOL]["price"] == 102.0
+
+
+def test_ticks_inside_the_band_leave_resting_orders(paper):
+    _open_long(paper)
+    for price, time_ms in ((109.9, 1_100), (95.1, 1_200)):
+        paper.on_tick(SYMBOL, price, time_ms)
+    assert paper.stats()["resting"] == 2 and paper.counts["triggered"] == 0
+
+
+def test_take_profit_triggers_and_closes_the_position(paper):
+    acks = _open_long(paper)
+    paper.on_tick(SYMBOL, 110.5, 1_100)
+    assert paper.counts["triggered"] == 1
+    assert SYMBOL not in paper.positions
+    assert paper.fills[-1]["order_id"] == acks["tp"]["order_id"]
+    assert paper.realized == pytest.approx(10.5)
+    assert paper.balance == pytest.approx(1_010.5)
+    # Le SL reste résident (annulé par le bot) et ne peut plus réduire une position inexistante
+    paper.on_tick(SYMBOL, 90.0, 1_200)
+    assert paper.counts["rejected"] == 1 and SYMBOL not in paper.positions
+
+
+def test_stop_loss_triggers_for_a_short(paper):
+    acks = paper.open_with_tp_sl(SYMBOL, "sell", 1.0, 90.0, 105.0)
+    paper.on_tick(SYMBOL, 100.0, 1_050)
+    paper.on_tick(SYMBOL, 105.0, 1_100)
+    assert paper.fills[-1]["order_id"] == acks["sl"]["order_id"]
+    assert paper.realized == pytest.approx(-5.0)
+    assert SYMBOL not in paper.positions
+
+
+def test_cancelled_orders_no_longer_trigger(paper):
+    acks = _open_long(paper)
+    paper.cancel_orders([acks["tp"]["order_id"], acks["sl"]["order_id"]])
+    assert paper.bands == {} and paper.stats()["resting"] == 0
+    paper.on_tick(SYMBOL, 120.0, 1_100)
+    assert paper.positions[SYMBOL]["size"] == 1.0
+
+
+def test_open_positions_and_orders_use_kraken_formats(paper):
+    acks = _open_long(paper)
+    positions = paper.get_open_positions()
+    orders = paper.get_open_orders()
+    assert positions == [dict(positions[0], side="long", symbol=SYMBOL, size=1.0, price=100.0)]
+    assert {o["order_id"]: o["orderType"] for o in orders} == {acks["tp"]["order_id"]: "take_profit",
+                                                                 acks["sl"]["order_id"]: "stop"}
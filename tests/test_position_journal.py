@@ -0,0 +1,80 @@
+import os
+import zlib
+from memory.position_manager import PositionJournal, PositionManager
+
+POSITION = {"symbol": "PF_ETHUSD", "side": "long", "entry_price": 2000.0, "size": 0.5, "open_time": "t",
+            "tp_id": None, "sl_id": None}
+
+
+def _journal(tmp_path, **kwargs):
+    journal = PositionJournal(str(tmp_path / "PF_ETHUSD.journal"), **kwargs)
+    journal.replay()
+    return journal
+
+
+def test_replay_applies_every_operation(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append("open", POSITION, position=POSITION)
+    journal.append("tp_sl", POSITION, tp_id="tp-1", sl_id="sl-1")
+    journal.append("fill", POSITION, entry_price=2001.5, size=0.4)
+    journal.close()
+
+    replayed = PositionJournal(journal.path)
+    position = replayed.replay()
+    assert position == dict(POSITION, tp_id="tp-1", sl_id="sl-1", entry_price=2001.5, size=0.4, filled=True)
+    assert replayed.seq == 3
+    replayed.append("close", None)
+    replayed.close()
+    assert PositionJournal(journal.path).replay() is None
+
+
+def test_replay_truncates_a_torn_last_line(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append("open", POSITION, position=POSITION)
+    journal.close()
+    good_size = os.path.getsize(journal.path)
+    with open(journal.path, "ab") as f:
+        f.write(PositionJournal._encode({"seq": 2, "op": "close"})[:-10])  # Crash au milieu du write
+
+    replayed = PositionJournal(journal.path)
+    assert replayed.replay() == POSITION
+    replayed.close()
+    assert os.path.getsize(journal.path) == good_size
+
+
+def test_replay_stops_at_a_crc_mismatch(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append("open", POSITION, position=POSITION)
+    journal.close()
+    data = b'{"seq":2,"op":"close"}'
+    with open(journal.path, "ab") as f:
+        f.write(f"{zlib.crc32(data) ^ 1:08x} ".encode() + data + b"\n")
+        f.write(PositionJournal._encode({"seq": 3, "op": "close"}))  # Jamais appliquée après une ligne corrompue
+
+    replayed = PositionJournal(journal.path)
+    assert replayed.replay() == POSITION
+    replayed.close()
+
+
+def test_compaction_keeps_the_current_state(tmp_path):
+    journal = _journal(tmp_path, compact_every=3)
+    journal.append("open", POSITION, position=POSITION)
+    journal.append("tp_sl", dict(POSITION, tp_id="tp-1", sl_id="sl-1"), tp_id="tp-1", sl_id="sl-1")
+    journal.append("fill", dict(POSITION, tp_id="tp-1", sl_id="sl-1", size=0.4), entry_price=2000.0, size=0.4)
+    journal.close()
+
+    with open(journal.path, "rb") as f:
+        assert len(f.readlines()) == 1
+    assert PositionJournal(journal.path).replay() == dict(POSITION, tp_id="tp-1", sl_id="sl-1", size=0.4)
+
+
+def test_position_manager_restores_from_its_journal(tmp_path):
+    manager = PositionManager("PF_ETHUSD", directory=str(tmp_path))
+    manager.open_position("PF_ETHUSD", "short", 2000.0, 0.5)
+    manager.set_tp_sl("tp-1", "sl-1")
+    manager.journal.close()
+
+    restored = PositionManager("PF_ETHUSD", directory=str(tmp_path))
+    assert restored.get_position() == manager.get_position()
+    assert restored.get_tp_sl_ids() == ("tp-1", "sl-1")
+    restored.journal.close()
@@ -0,0 +1,62 @@
+import os
+import numpy as np
+from services.tick_recorder import TickRecorder, TickReader, TICK_DTYPE
+
+SYMBOL = "PF_ETHUSD"
+MIDNIGHT_MS = 1_748_908_800_000  # 2025-06-03T00:00:00Z
+# Ticks toutes les 10 s de 23:59:00 à 00:00:50 : deux segments journaliers
+TIMES = [MIDNIGHT_MS - 60_000 + i * 10_000 for i in range(12)]
+
+
+def _record(directory):
+    recorder = TickRecorder(str(directory), flush_interval=0.01)
+    recorder.start()
+    for i, time_ms in enumerate(TIMES):
+        recorder.record(SYMBOL, time_ms, 2500.0 + i, 0.1 * (i + 1), "buy" if i % 2 else "sell",
+                        f"00000000-0000-0000-0000-{i:012d}")
+    recorder.stop()
+    return recorder
+
+
+def test_ticks_are_split_into_daily_segments(tmp_path):
+    recorder = _record(tmp_path)
+    assert (recorder.recorded, recorder.dropped) == (len(TIMES), 0)
+    segments = TickReader(str(tmp_path), SYMBOL).segments()
+    assert [os.path.basename(p) for p in segments] == ["2025-06-02.ticks", "2025-06-03.ticks"]
+    sizes = [os.path.getsize(p) // TICK_DTYPE.itemsize for p in segments]
+    assert sizes == [6, 6]
+
+
+def test_columns_round_trip_across_the_day_boundary(tmp_path):
+    _record(tmp_path)
+    columns = TickReader(str(tmp_path), SYMBOL).columns()
+    assert columns["time"].tolist() == TIMES
+    assert columns["price"].tolist() == [2500.0 + i for i in range(len(TIMES))]
+    assert np.allclose(columns["qty"], [0.1 * (i + 1) for i in range(len(TIMES))])
+    ticks = TickReader(str(tmp_path), SYMBOL).read()
+    assert ticks["side"].tolist() == [2, 1] * 6
+    assert ticks["uid"][3] == bytes(15) + b"\x03"
+
+
+def test_columns_filter_on_a_half_open_time_range(tmp_path):
+    _record(tmp_path)
+    reader = TickReader(str(tmp_path), SYMBOL)
+    # [23:59:30, 00:00:20) : chevauche les deux segments
+    start, end = MIDNIGHT_MS - 30_000, MIDNIGHT_MS + 20_000
+    assert reader.columns(start, end)["time"].tolist() == [t for t in TIMES if start <= t < end]
+    # Plage contenue dans un seul jour : un seul segment ouvert, vue sans copie
+    assert len(reader.segments(MIDNIGHT_MS, MIDNIGHT_MS + 30_000)) == 1
+    assert reader.columns(MIDNIGHT_MS, MIDNIGHT_MS + 30_000)["time"].tolist() == TIMES[6:9]
+    assert isinstance(reader.read(MIDNIGHT_MS, MIDNIGHT_MS + 30_000), np.memmap)
+    assert reader.columns(MIDNIGHT_MS + 3_600_000)["time"].size == 0
+
+
+def test_partial_record_is_truncated_on_reopen(tmp_path):
+    _record(tmp_path)
+    path = TickReader(str(tmp_path), SYMBOL).segments()[-1]
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 7)  # Écriture interrompue
+    recorder = TickRecorder(str(tmp_path))
+    recorder.record(SYMBOL, TIMES[-1] + 1, 1.0, 1.0)
+    recorder.stop()
+    assert TickReader(str(tmp_path), SYMBOL).columns(MIDNIGHT_MS)["time"].tolist() == TIMES[6:] + [TIMES[-1] + 1]
@@ -0,0 +1,88 @@
+import random
+import numpy as np
+import pytest
+from services.candle_aggregator import CandleAggregator
+from services.timeframes import TimeframeRollup, parse_timeframe, timeframe_label
+
+SYMBOL = "PF_ETHUSD"
+START = 1_748_908_800  # Aligné sur 5 minutes
+MINUTES = 120
+
+
+def _ticks(seed=3):
+    """
+    Trades sur MINUTES minutes. Un bloc de 5 minutes sur quatre est entièrement vide, les autres
+    minutes sont actives ou non (sauf la première du bloc) et ont des intervalles de 10 s vides.
+    Chaque minute active a un trade dans ses 10 premières secondes : l'ouverture agrégée
+    directement (premier trade) est alors aussi celle de la première bougie de base.
+    """
+    rng = random.Random(seed)
+    price, ticks = 2500.0, []
+    for minute in range(MINUTES):
+        block = minute // 5
+        if block % 4 == 3 or (minute % 5 and rng.random() < 0.3):
+            continue
+        seconds = sorted({rng.randrange(0, 10)} | {rng.randrange(10, 60) for _ in range(rng.randint(0, 8))})
+        for second in seconds:
+            price = round(price * (1 + rng.gauss(0, 0.001)), 2)
+            ticks.append((price, round(rng.expovariate(2), 3), START + minute * 60 + second + rng.random() * 0.9))
+    return ticks
+
+
+def _run(aggregator, ticks):
+    for price, volume, timestamp in ticks:
+        aggregator.update(price, volume, timestamp)
+    aggregator.close_due(START + MINUTES * 60)  # Horloge : clôture jusqu'à la fin, comblement compris
+    return aggregator
+
+
+@pytest.fixture(scope="module")
+def ticks():
+    return _ticks()
+
+
+@pytest.mark.parametrize("timeframe", ["1m", "5m"])
+@pytest.mark.parametrize("kind", ["raw", "ha"])
+def test_rolled_up_candles_equal_direct_aggregation(ticks, timeframe, kind):
+    base = _run(CandleAggregator(SYMBOL, interval=10, history_size=5000, timeframes=["1m", "5m"]), ticks)
+    direct = _run(CandleAggregator(SYMBOL, interval=parse_timeframe(timeframe), history_size=5000), ticks)
+    rolled = base.rollup.store(timeframe).window(kind=kind)
+    expected = direct.candles.window(kind=kind)
+    assert len(rolled["timestamp"]) == MINUTES * 60 // parse_timeframe(timeframe)
+    assert np.array_equal(rolled["timestamp"], expected["timestamp"])
+    for column in ("open", "high", "low", "close"):
+        assert np.array_equal(rolled[column], expected[column]), column
+    assert np.allclose(rolled["volume"], expected["volume"], rtol=1e-12)
+
+
+def test_gap_filled_candles_are_flat(ticks):
+    base = _run(CandleAggregator(SYMBOL, interval=10, history_size=5000, timeframes=["1m", "5m"]), ticks)
+    window = base.rollup.store("5m").window()
+    empty = window["volume"] == 0
+    assert empty.sum() == len(window["volume"]) // 4  # Un bloc sur quatre sans trade
+    for column in ("open", "high", "low"):
+        assert np.array_equal(window[column][empty], window["close"][empty])
+    # Prix de comblement : clôture de la bougie précédente
+    previous_close = np.roll(window["close"], 1)[empty]
+    assert np.array_equal(window["close"][empty], previous_close)
+
+
+def test_subscribers_receive_each_closed_candle():
+    rollup = TimeframeRollup(SYMBOL, 10, ["1m", "5m"])
+    received = []
+    rollup.subscribe("5m", received.append, kind="raw")
+    for i in range(60):
+        rollup.add({"symbol": SYMBOL, "timestamp": START + i * 10, "open": 1.0, "high": 2.0, "low": 0.5,
+                    "close": 1.5, "volume": 1.0})
+    rollup.flush(START + 600)
+    assert [(c["timestamp"], c["volume"], c["timeframe"]) for c in received] == [
+        (START, 30.0, "5m"), (START + 300, 30.0, "5m")]
+    assert rollup.current("1m") is None
+
+
+def test_timeframes_must_be_multiples():
+    assert timeframe_label(parse_timeframe("60m")) == "1h"
+    with pytest.raises(ValueError):
+        TimeframeRollup(SYMBOL, 10, ["1m", "90s"])
+    with pytest.raises(KeyError):
+        TimeframeRollup(SYMBOL, 10, ["1m"]).store("5m")
@@ -0,0 +1,52 @@
+from services.trade_dedup import TradeIndex
+
+
+def test_trades_in_timestamp_order_are_new():
+    index = TradeIndex(size=10)
+    assert not any(index.seen(t, f"u{t}") for t in range(100))
+    assert index.duplicates == 0 and index.edge == 99
+
+
+def test_snapshot_replay_is_detected_by_uid():
+    index = TradeIndex(size=10)
+    for t in range(5):
+        index.seen(t, f"u{t}")
+    assert [index.seen(t, f"u{t}") for t in range(5)] == [True] * 5
+    assert index.duplicates == 5
+    assert not index.seen(4, "other-at-same-ms")
+    assert not index.seen(2, "late-but-unseen")
+
+
+def test_older_generation_is_still_searched_after_rotation():
+    index = TradeIndex(size=4)
+    for t in range(6):  # Rotation au 4e uid : u0..u3 passent dans la génération précédente
+        index.seen(t, f"u{t}")
+    assert index.seen(1, "u1")
+    assert index.seen(5, "u5")
+    assert not index.seen(3, "u3-bis")
+
+
+def test_trades_older_than_both_generations_count_as_seen():
+    index = TradeIndex(size=4)
+    for t in range(8):  # Deux rotations : u0..u3 oubliés, plancher à leur horodatage max
+        index.seen(t, f"u{t}")
+    assert index.floor == 3
+    assert index.seen(2, "never-seen-but-too-old")
+    assert index.seen(5, "u5")
+    assert not index.seen(6, "u6-bis")
+
+
+def test_seed_marks_the_replayed_history_as_seen():
+    index = TradeIndex(size=10)
+    index.seed(1_000, ["a", "b"])
+    assert index.seen(999, "x")
+    assert index.seen(1_000, "a")
+    assert not index.seen(1_000, "c")
+    assert not index.seen(1_001, "d")
+
+
+def test_trades_without_uid_rely_on_timestamps():
+    index = TradeIndex(size=10)
+    assert not index.seen(10, None)
+    assert not index.seen(10, None)  # Même ms, pas d'uid : impossible de trancher, gardé
+    assert not index.seen(11, None)
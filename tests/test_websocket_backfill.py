@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from services.websocket_client import WebSocketClient
+
+SYMBOL = "PF_ETHUSD"
+
+
+class SlowHistory:
+    """Historique REST dont la réponse est retenue jusqu'à `release`."""
+
+    def __init__(self, trades):
+        self.trades_ = trades
+        self.release = threading.Event()
+        self.calls = []
+
+    def trades(self, symbol, since_ms, until_ms=None):
+        self.calls.append((symbol, since_ms))
+        assert self.release.wait(5)
+        return [t for t in self.trades_ if t[0] >= since_ms]
+
+
+class Recorder:
+    def __init__(self):
+        self.uids = []
+
+    def record(self, symbol, time_ms, price, qty, side, uid):
+        self.uids.append(uid)
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, payload):
+        self.sent.append(json.loads(payload))
+
+
+def _message(*trades, snapshot=False):
+    items = [{"feed": "trade", "product_id": SYMBOL, "time": t, "price": 100.0, "qty": 1.0, "side": "buy", "uid": uid}
+             for t, uid in trades]
+    if snapshot:
+        return json.dumps({"feed": "trade_snapshot", "product_id": SYMBOL, "trades": items})
+    return json.dumps(items[0])
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_gap_is_backfilled_off_the_websocket_thread_and_merged_in_order():
+    base = 1_700_000_000_000
+    history = SlowHistory([(base + t, 100.0, 1.0, f"u{t}", "buy") for t in range(1, 6)])
+    recorder = Recorder()
+    client = WebSocketClient([SYMBOL], lambda candle: None, recorder=recorder, books=False, history=history)
+    client.running = True
+    client.on_message(None, _message((base, "u0")))
+    client.on_close(None, None, None)
+
+    ws = FakeSocket()
+    client.on_open(ws)  # Ne bloque pas sur l'historique
+    assert ws.sent[0]["event"] == "subscribe" and client.backfilling
+    # Snapshot à l'abonnement (chevauche la coupure) puis flux live, reçus pendant le rattrapage
+    client.on_message(ws, _message((base + 4, "u4"), (base + 5, "u5"), snapshot=True))
+    client.on_message(ws, _message((base + 6, "u6")))
+    assert recorder.uids == ["u0"]
+    assert client.scheduler.paused_until
+
+    history.release.set()
+    _wait(lambda: not client.backfilling)
+    assert recorder.uids == ["u0", "u1", "u2", "u3", "u4", "u5", "u6"]
+    assert history.calls == [(SYMBOL, base)]
+    assert client.stats()["backfilled"] == 5
+    assert client.stats()["duplicates"] == 2
+    assert not client.scheduler.paused_until
+
+    client.on_message(ws, _message((base + 7, "u7")))
+    assert recorder.uids[-1] == "u7"
+
+
+def test_second_outage_during_backfill_triggers_another_pass():
+    base = 1_700_000_000_000
+    history = SlowHistory([(base + t, 100.0, 1.0, f"u{t}", "buy") for t in range(1, 4)])
+    recorder = Recorder()
+    client = WebSocketClient([SYMBOL], lambda candle: None, recorder=recorder, books=False, history=history)
+    client.running = True
+    client.on_message(None, _message((base, "u0")))
+    client.on_close(None, None, None)
+    client.on_open(FakeSocket())
+    client.on_close(None, None, None)
+    client.on_open(FakeSocket())
+
+    history.release.set()
+    _wait(lambda: not client.backfilling)
+    assert len(history.calls) == 2
+    assert recorder.uids == ["u0", "u1", "u2", "u3"]
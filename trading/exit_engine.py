@@ -0,0 +1,168 @@
+"""
+Surveillance des sorties au tick : chaque trade reçu est comparé aux niveaux de sortie de la
+position ouverte du symbole, sans attendre la clôture de la bougie (ni son close Heikin Ashi).
+
+- Niveaux précalculés à l'ouverture : TP / SL (ordres résidents Kraken), gain minimal
+  (MIN_GAIN_POUR_CLOTURE) et stop suiveur optionnel (TRAILING_STOP_PCT). Ils sont réduits à
+  une bande [lower, upper] : un tick à l'intérieur coûte une comparaison chaînée.
+- Les plus haut / plus bas depuis l'entrée (watermarks) font partie de la bande quand le
+  stop suiveur est actif : un nouvel extrême sort de la bande, déplace le stop puis la bande.
+- Un niveau franchi retire la surveillance et appelle `on_exit(event)` dans le thread
+  WebSocket : le callback ne doit faire qu'un dépôt (pas d'I/O).
+"""
+import threading
+import time
+from strategy.rules import tp_sl_levels
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from config import TP_PCT, SL_PCT, MIN_GAIN_POUR_CLOTURE, TRAILING_STOP_PCT
+
+logger = setup_logger("ExitEngine")
+
+INF = float("inf")
+
+
+class ExitWatch:
+    """Niveaux de sortie d'une position ouverte (None : niveau désactivé)."""
+
+    __slots__ = ("position", "symbol", "side", "entry_price", "tp", "sl", "gain", "trail_pct", "trail",
+                 "high", "low", "lower", "upper", "armed_ms")
+
+    def __init__(self, position: dict, tp, sl, min_gain, trail_pct, armed_ms: int = 0):
+        self.position = position  # Identité de la position surveillée (dict du PositionManager)
+        self.symbol = position["symbol"]
+        self.side = position["side"]
+        self.entry_price = entry = float(position["entry_price"])
+        # Arrondis comme les stopPrice des ordres résidents : le tick qui franchit le niveau local
+        # déclenche aussi l'ordre Kraken (triggerSignal "last")
+        self.tp = round(tp, 2) if tp is not None else None
+        self.sl = round(sl, 2) if sl is not None else None
+        long = self.side == "long"
+        self.gain = (entry * (1 + min_gain / 100) if long else entry * (1 - min_gain / 100)) if min_gain else None
+        self.trail_pct = trail_pct
+        self.trail = None
+        self.high = self.low = entry
+        self.armed_ms = armed_ms  # Horloge Kraken : horodatage du dernier trade vu à l'armement
+        self._refresh()
+
+    def _refresh(self):
+        """Recalcule le stop suiveur et la bande [lower, upper] hors de laquelle un tick est examiné."""
+        if self.side == "long":
+            if self.trail_pct:
+                self.trail = self.high * (1 - self.trail_pct / 100)
+            exits_up = [level for level in (self.tp, self.gain) if level is not None]
+            exits_down = [level for level in (self.sl, self.trail) if level is not None]
+            if self.trail_pct:
+                exits_up.append(self.high)  # Nouveau plus haut : le stop suit
+            self.upper = min(exits_up, default=INF)
+            self.lower = max(exits_down, default=-INF)
+        else:
+            if self.trail_pct:
+                self.trail = self.low * (1 + self.trail_pct / 100)
+            exits_up = [level for level in (self.sl, self.trail) if level is not None]
+            exits_down = [level for level in (self.tp, self.gain) if level is not None]
+            if self.trail_pct:
+                exits_down.append(self.low)
+            self.upper = min(exits_up, default=INF)
+            self.lower = max(exits_down, default=-INF)
+
+    def cross(self, price: float):
+        """Tick hors de la bande : raison de sortie, ou None (nouvel extrême, bande déplacée)."""
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        if self.side == "long":
+            if self.sl is not None and price <= self.sl:
+                return "sl"
+            if self.trail is not None and price <= self.trail:
+                return "trailing"
+            if self.tp is not None and price >= self.tp:
+                return "tp"
+            if self.gain is not None and price >= self.gain:
+                return "min_gain"
+        else:
+            if self.sl is not None and price >= self.sl:
+                return "sl"
+            if self.trail is not None and price >= self.trail:
+                return "trailing"
+            if self.tp is not None and price <= self.tp:
+                return "tp"
+            if self.gain is not None and price <= self.gain:
+                return "min_gain"
+        self._refresh()
+        return None
+
+
+class ExitEngine:
+    def __init__(self, on_exit=None, tp_pct=TP_PCT, sl_pct=SL_PCT, min_gain=MIN_GAIN_POUR_CLOTURE,
+                 trail_pct=TRAILING_STOP_PCT):
+        self.on_exit = on_exit  # on_exit(event), appelé dans le thread des ticks
+        self.tp_pct = tp_pct
+        self.sl_pct = sl_pct
+        self.min_gain = min_gain
+        self.trail_pct = trail_pct
+        self.watches = {}   # symbole -> ExitWatch
+        self.last = {}      # symbole -> dernier prix échangé
+        self.last_ms = {}   # symbole -> horodatage Kraken (ms) du dernier trade
+        self.fired = {}     # raison -> nombre de sorties déclenchées
+        self.lock = threading.Lock()  # arm / disarm (stratégie) contre déclenchement (ticks)
+
+    def arm(self, position: dict, tp=None, sl=None) -> ExitWatch:
+        """Surveille `position` ; TP / SL recalculés depuis le prix d'entrée s'ils ne sont pas fournis."""
+        if tp is None and sl is None:
+            tp, sl = tp_sl_levels(position["side"], float(position["entry_price"]), self.tp_pct, self.sl_pct)
+        watch = ExitWatch(position, tp, sl, self.min_gain, float(self.trail_pct or 0),
+                          self.last_ms.get(position["symbol"], 0))
+        with self.lock:
+            self.watches[watch.symbol] = watch
+        logger.info("[%s] Sorties armées (%s @ %s) : bande %.2f / %.2f", watch.symbol, watch.side,
+                    watch.entry_price, watch.lower, watch.upper)
+        return watch
+
+    def disarm(self, symbol: str, position: dict | None = None):
+        """Retire la surveillance du symbole (seulement celle de `position` si fournie)."""
+        with self.lock:
+            watch = self.watches.get(symbol)
+            if watch is not None and (position is None or watch.position is position):
+                del self.watches[symbol]
+
+    def last_price(self, symbol: str, default=None):
+        return self.last.get(symbol, default)
+
+    def on_tick(self, symbol: str, price: float, time_ms: int, received_ns: int):
+        """Chemin chaud : appelé pour chaque trade. `received_ns` : réception (time.perf_counter_ns)."""
+        self.last[symbol] = price
+        self.last_ms[symbol] = time_ms
+        watch = self.watches.get(symbol)
+        if watch is None or watch.lower < price < watch.upper or time_ms < watch.armed_ms:
+            return  # Pas de position, dans la bande, ou trade antérieur à l'entrée (snapshot)
+        with self.lock:
+            if self.watches.get(symbol) is not watch:
+                return  # Désarmée entre-temps
+            reason = watch.cross(price)
+            if reason is None:
+                return
+            del self.watches[symbol]
+        self.fired[reason] = self.fired.get(reason, 0) + 1
+        metrics.observe_since("exit_trigger", symbol, received_ns)
+        event = {
+            "symbol": symbol,
+            "position": watch.position,
+            "side": watch.side,
+            "reason": reason,
+            "price": price,
+            "level": {"tp": watch.tp, "sl": watch.sl, "trailing": watch.trail, "min_gain": watch.gain}[reason],
+            "high": watch.high,
+            "low": watch.low,
+            "time_ms": time_ms,
+            "delay_ms": max(time.time() * 1000 - time_ms, 0.0),  # Horodatage Kraken du trade -> déclenchement
+            "received_ns": received_ns,
+        }
+        logger.info("[%s] Sortie %s déclenchée au tick %s (niveau %s, %.1fms après le trade)", symbol, reason,
+                    price, event["level"], event["delay_ms"])
+        if self.on_exit:
+            self.on_exit(event)
+
+    def stats(self) -> dict:
+        return {"armed": len(self.watches), "fired": dict(self.fired)}
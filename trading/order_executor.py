@@ -1,57 +1,220 @@
 import time
 import uuid
+import threading
 import requests
 import hmac
 import base64
 import hashlib
 import json
-from config import KRAKEN_API_KEY, KRAKEN_API_SECRET, SYMBOL, BASE_URL
+import logging
+import math
+from requests.adapters import HTTPAdapter
+from config import (
+    KRAKEN_API_KEY, KRAKEN_API_SECRET, SYMBOL, BASE_URL, ORDER_TIMEOUT_SEC, ORDER_KEEPALIVE_SEC,
+    MAX_SLIPPAGE_PCT, MIN_ORDER_SIZE,
+)
 from utils.logger import setup_logger
+from utils.metrics import LatencyStats, metrics
 
 logger = setup_logger("OrderExecutor")
 
+IOC_NOT_FILLED = "iocWouldNotExecute"  # Statut Kraken d'une limite IOC sans contrepartie (carnet déplacé)
+
 class OrderExecutor:
-    def __init__(self):
+    """
+    Envoi d'ordres Kraken Futures sur une session HTTP persistante (keep-alive).
+    Chaque envoi retourne un accusé structuré (dict) :
+    {"ok", "order_id", "cli_ord_id", "status", "tag", "error", "latency_ms"}.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, timeout=ORDER_TIMEOUT_SEC, pool_size: int = 4, books=None):
         self.api_key = KRAKEN_API_KEY
         self.api_secret = KRAKEN_API_SECRET
+        self.base_url = base_url
+        self.timeout = timeout
         self.session = requests.Session()
-        self.base_url = BASE_URL
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.latency = {"sendorder": LatencyStats(), "batchorder": LatencyStats()}
+        self._keepalive_running = False
+        self.books = books or {}  # Carnets L2 locaux par symbole (WebSocketClient.books)
+
+    # ---- Connexion ----
+
+    def warm_up(self):
+        """Ouvre la connexion TLS à l'avance (endpoint public) pour que le premier ordre ne paie pas le handshake."""
+        try:
+            start = time.perf_counter()
+            self.session.get(f"{self.base_url}/instruments", timeout=self.timeout)
+            logger.info("Connexion Kraken préchauffée en %.1fms", (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            logger.warning("Préchauffage de la connexion impossible : %s", e)
+
+    def start_keepalive(self, interval: float = ORDER_KEEPALIVE_SEC):
+        """Garde la connexion ouverte en période calme (le serveur ferme les connexions inactives)."""
+        self._keepalive_running = True
 
-    def open_long_market(self, symbol: str, size: float):
+        def loop():
+            while self._keepalive_running:
+                time.sleep(interval)
+                self.warm_up()
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop_keepalive(self):
+        self._keepalive_running = False
+
+    # ---- Construction des ordres ----
+
+    @staticmethod
+    def _market(symbol: str, side: str, size: float, reduce_only: bool = False) -> dict:
         payload = {
             "orderType": "mkt",
             "symbol": symbol,
-            "side": "buy",
+            "side": side,
             "size": float(size),
             "cliOrdId": str(uuid.uuid4())
         }
-        self._send_order(payload)
+        if reduce_only:
+            payload["reduceOnly"] = True
+        return payload
 
-    def open_short_market(self, symbol: str, size: float):
-        payload = {
-            "orderType": "mkt",
+    def _entry(self, symbol: str, side: str, size: float, limit_price=None) -> dict:
+        """Entrée au marché, ou limite IOC (immediate-or-cancel) si `limit_price` est fourni."""
+        payload = self._market(symbol, side, size)
+        if limit_price is not None:
+            payload["orderType"] = "ioc"
+            payload["limitPrice"] = limit_price
+        return payload
+
+    def plan_entry(self, symbol: str, side: str, size: float) -> dict:
+        """
+        Choisit l'ordre d'entrée d'après le carnet local : au marché si toute la taille s'exécute
+        à un prix moyen dans MAX_SLIPPAGE_PCT du meilleur prix, sinon limite IOC au bord de
+        cette bande avec une taille plafonnée à la liquidité disponible (0 si insuffisante).
+        Sans carnet synchronisé : au marché, taille inchangée.
+        Retourne {"size", "limit_price" (None = marché), "expected_price"}.
+        """
+        plan = {"size": size, "limit_price": None, "expected_price": None}
+        book = self.books.get(symbol)
+        if book is None:
+            return plan
+        best = book.best_ask() if side == "buy" else book.best_bid()
+        if best is None:
+            return plan
+        band = MAX_SLIPPAGE_PCT / 100
+        limit = best[0] * (1 + band) if side == "buy" else best[0] * (1 - band)
+        average, filled = book.expected_fill(side, size)
+        plan["expected_price"] = average
+        if filled >= size and (average <= limit if side == "buy" else average >= limit):
+            return plan
+        available = book.liquidity(side, limit)
+        capped = math.floor(min(size, available) / MIN_ORDER_SIZE + 1e-9) * MIN_ORDER_SIZE
+        plan["size"] = round(capped, 8) if capped >= MIN_ORDER_SIZE else 0.0
+        plan["limit_price"] = round(limit, 2)
+        logger.info("[%s] Carnet peu profond : %s %s -> IOC %s @ %s (prix moyen attendu %s, meilleur %s)",
+                    symbol, side, size, plan["size"], plan["limit_price"], average, best[0])
+        return plan
+
+    @staticmethod
+    def _tp_sl(symbol: str, entry_side: str, size: float, tp: float, sl: float):
+        """Ordres de sortie résidents (reduce-only) opposés au sens d'entrée."""
+        exit_side = "sell" if entry_side == "buy" else "buy"
+        take_profit = {
+            "orderType": "take_profit",
             "symbol": symbol,
-            "side": "sell",
+            "side": exit_side,
             "size": float(size),
+            "stopPrice": round(tp, 2),
+            "triggerSignal": "last",
+            "reduceOnly": True,
             "cliOrdId": str(uuid.uuid4())
         }
-        self._send_order(payload)
-
-    def close_position_market(self, symbol: str, side: str, size: float):
-        close_side = "sell" if side == "long" else "buy"
-        payload = {
-            "orderType": "mkt",
+        stop_loss = {
+            "orderType": "stp",
             "symbol": symbol,
-            "side": close_side,
+            "side": exit_side,
             "size": float(size),
+            "stopPrice": round(sl, 2),
+            "triggerSignal": "last",
             "reduceOnly": True,
             "cliOrdId": str(uuid.uuid4())
         }
-        self._send_order(payload)
+        return take_profit, stop_loss
+
+    # ---- Ordres simples (sendorder) ----
+
+    def open_long_market(self, symbol: str, size: float) -> dict:
+        return self._send_order(self._market(symbol, "buy", size))
+
+    def open_short_market(self, symbol: str, size: float) -> dict:
+        return self._send_order(self._market(symbol, "sell", size))
+
+    def close_position_market(self, symbol: str, side: str, size: float) -> dict:
+        close_side = "sell" if side == "long" else "buy"
+        return self._send_order(self._market(symbol, close_side, size, reduce_only=True))
+
+    # ---- Ordres groupés (batchorder) : un seul aller-retour ----
 
-    def _get_auth_headers(self, payload: dict) -> dict:
+    def place_tp_sl_orders(self, symbol: str, entry_side: str, size: float, tp: float, sl: float) -> dict:
+        take_profit, stop_loss = self._tp_sl(symbol, entry_side, size, tp, sl)
+        return self._send_batch([("tp", take_profit), ("sl", stop_loss)])
+
+    def open_with_tp_sl(self, symbol: str, action: str, size: float, tp=None, sl=None, limit_price=None) -> dict:
+        """
+        Entrée (au marché, ou limite IOC si `limit_price`) + TP + SL dans une seule requête.
+        Retourne {"entry", "tp", "sl"}.
+        """
+        orders = [("entry", self._entry(symbol, action, size, limit_price))]
+        if tp is not None and sl is not None:
+            take_profit, stop_loss = self._tp_sl(symbol, action, size, tp, sl)
+            orders += [("tp", take_profit), ("sl", stop_loss)]
+        return self._send_batch(orders)
+
+    def close_position(self, symbol: str, side: str, size: float, cancel_ids=()) -> dict:
+        """Clôture au marché et annule les TP/SL résidents dans la même requête."""
+        close_side = "sell" if side == "long" else "buy"
+        orders = [("close", self._market(symbol, close_side, size, reduce_only=True))]
+        orders += [(f"cancel_{i}", {"order_id": order_id}) for i, order_id in enumerate(cancel_ids) if order_id]
+        return self._send_batch(orders)
+
+    def reverse_position(self, symbol: str, side: str, size: float, action: str, new_size: float,
+                         tp=None, sl=None, cancel_ids=(), limit_price=None) -> dict:
+        """
+        Retournement en un seul aller-retour : annulation des anciens TP/SL,
+        clôture reduce-only, nouvelle entrée puis nouveaux TP/SL (exécutés dans l'ordre du lot).
+        """
+        close_side = "sell" if side == "long" else "buy"
+        orders = [(f"cancel_{i}", {"order_id": order_id}) for i, order_id in enumerate(cancel_ids) if order_id]
+        orders.append(("close", self._market(symbol, close_side, size, reduce_only=True)))
+        orders.append(("entry", self._entry(symbol, action, new_size, limit_price)))
+        if tp is not None and sl is not None:
+            take_profit, stop_loss = self._tp_sl(symbol, action, new_size, tp, sl)
+            orders += [("tp", take_profit), ("sl", stop_loss)]
+        return self._send_batch(orders)
+
+    def cancel_orders(self, order_ids) -> dict:
+        """Annule des ordres résidents en une seule requête (ex. TP/SL orphelins)."""
+        return self._send_batch([(f"cancel_{i}", {"order_id": order_id}) for i, order_id in enumerate(order_ids)])
+
+    # ---- État du compte ----
+
+    def get_open_positions(self) -> list | None:
+        """Positions ouvertes chez Kraken (None si la requête échoue)."""
+        data = self._get("openpositions")
+        return data.get("openPositions", []) if data else None
+
+    def get_open_orders(self) -> list | None:
+        """Ordres résidents chez Kraken (None si la requête échoue)."""
+        data = self._get("openorders")
+        return data.get("openOrders", []) if data else None
+
+    # ---- Transport ----
+
+    def _get_auth_headers(self, payload: dict | None) -> dict:
         nonce = str(int(time.time() * 1000))
-        payload_str = json.dumps(payload)
+        payload_str = json.dumps(payload) if payload is not None else ""  # GET : corps vide
         message = nonce + payload_str
         signature = hmac.new(
             base64.b64decode(self.api_secret),
@@ -67,20 +230,106 @@ class OrderExecutor:
             "Content-Type": "application/json"
         }
 
-    def _send_order(self, payload: dict):
-        url = f"{self.base_url}/sendorder"
+    def _post(self, endpoint: str, payload: dict):
+        """POST signé. Retourne (réponse JSON ou None, erreur ou None, latence en ms)."""
+        url = f"{self.base_url}/{endpoint}"
         headers = self._get_auth_headers(payload)
-        logger.info(f"[DEBUG] Payload envoyé à Kraken : {payload}")
-        logger.info(f"[DEBUG] Headers envoyés : {headers}")
+        logger.debug("Payload envoyé à Kraken (%s) : %s", endpoint, payload)
+        orders = payload.get("batchOrder", (payload,))
+        symbol = next((order["symbol"] for order in orders if "symbol" in order), "all")
+        start = time.perf_counter()
         try:
-            response = self.session.post(url, headers=headers, json=payload)
-            logger.info(f"[DEBUG] Réponse Kraken : {response.status_code} - {response.text}")
+            response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            latency_ms = (time.perf_counter() - start) * 1000
+            self.latency[endpoint].add(latency_ms)
+            metrics.observe("order_ack", symbol, latency_ms / 1000)
+            if logger.isEnabledFor(logging.DEBUG):  # response.text décode le corps
+                logger.debug("Réponse Kraken : %s - %s", response.status_code, response.text)
+            return response.json(), None, latency_ms
+        except Exception as e:
+            latency_ms = (time.perf_counter() - start) * 1000
+            logger.error("Échec envoi ordre (%s) : %s", endpoint, e)
+            return None, str(e), latency_ms
+
+    def _get(self, endpoint: str) -> dict | None:
+        """GET signé. Retourne la réponse JSON si `result` vaut success, sinon None."""
+        try:
+            response = self.session.get(f"{self.base_url}/{endpoint}", headers=self._get_auth_headers(None),
+                                        timeout=self.timeout)
             data = response.json()
-            if isinstance(data, dict) and "error" in data.get("result", "").lower():
-                logger.error(f"Erreur ordre : {data}")
-            elif "error" in data:
-                logger.error(f"Erreur ordre : {data}")
-            else:
-                logger.info(f"ORDRE ENVOYÉ : {data}")
         except Exception as e:
-            logger.error(f"Échec envoi ordre : {e}")
+            logger.error("Échec requête %s : %s", endpoint, e)
+            return None
+        if not isinstance(data, dict) or data.get("result") != "success":
+            logger.error("Erreur %s : %s", endpoint, data)
+            return None
+        return data
+
+    @staticmethod
+    def _ack(status: dict | None, tag: str, cli_ord_id, latency_ms: float, error=None) -> dict:
+        status = status or {}
+        order_id = status.get("order_id")
+        state = status.get("status")
+        ok = error is None and order_id is not None and state in ("placed", "cancelled", "edited", None)
+        return {
+            "ok": ok,
+            "order_id": order_id,
+            "cli_ord_id": cli_ord_id,
+            "status": state,
+            "tag": tag,
+            "error": error or (None if ok else state),
+            "latency_ms": latency_ms,
+        }
+
+    def _send_order(self, payload: dict) -> dict:
+        data, error, latency_ms = self._post("sendorder", payload)
+        if error is None and (not isinstance(data, dict) or data.get("result") != "success"):
+            error = (data or {}).get("error", "réponse invalide") if isinstance(data, dict) else "réponse invalide"
+        status = data.get("sendStatus") if isinstance(data, dict) else None
+        ack = self._ack(status, "order", payload.get("cliOrdId"), latency_ms, error)
+        if ack["ok"]:
+            logger.info("ORDRE ENVOYÉ : %s %s %s | id=%s | %.1fms", payload["side"], payload["size"],
+                        payload["symbol"], ack["order_id"], latency_ms)
+        else:
+            logger.error("Erreur ordre : %s | %s", ack["error"], data)
+        return ack
+
+    @staticmethod
+    def _is_cancel(order: dict) -> bool:
+        """Annulation dans un lot : {"order_id": ...} seul."""
+        return "order_id" in order and len(order) == 1
+
+    def _send_batch(self, orders) -> dict:
+        """Envoie une liste [(tag, ordre)] via batchorder. Retourne {tag: accusé}."""
+        instructions = []
+        for tag, order in orders:
+            if self._is_cancel(order):
+                instructions.append({"order": "cancel", "order_id": order["order_id"]})
+            else:
+                instructions.append(dict(order, order="send", order_tag=tag))
+        data, error, latency_ms = self._post("batchorder", {"batchOrder": instructions})
+        if error is None and (not isinstance(data, dict) or data.get("result") != "success"):
+            error = (data or {}).get("error", "réponse invalide") if isinstance(data, dict) else "réponse invalide"
+
+        statuses = data.get("batchStatus", []) if isinstance(data, dict) and error is None else []
+        # L'ordre de batchStatus n'est pas garanti : envois retrouvés par order_tag, annulations par order_id
+        by_tag, by_id = {}, {}
+        for status in statuses:
+            if status.get("order_tag") is not None:
+                by_tag[status["order_tag"]] = status
+            else:
+                by_id[status.get("order_id")] = status
+        acks = {}
+        for tag, order in orders:
+            status = by_id.get(order["order_id"]) if self._is_cancel(order) else by_tag.get(tag)
+            acks[tag] = self._ack(status, tag, order.get("cliOrdId"), latency_ms, error)
+
+        failed = [tag for tag, ack in acks.items() if not ack["ok"]]
+        if failed == ["entry"] and acks["entry"]["status"] == IOC_NOT_FILLED:
+            # Issue normale d'une entrée IOC : le prix a dépassé la limite entre la décision et l'envoi
+            logger.warning("Entrée IOC non exécutée (carnet déplacé), TP/SL du lot à annuler | %.1fms", latency_ms)
+        elif failed:
+            logger.error("Erreur lot d'ordres (%s) : %s", ", ".join(failed), error or data)
+        else:
+            logger.info("LOT ENVOYÉ : %s | %.1fms", ", ".join(acks), latency_ms)
+        return acks
@@ -0,0 +1,252 @@
+"""
+Paper trading : même interface qu'OrderExecutor, mais les ordres sont exécutés localement sur
+le flux de trades (live ou rejoué), sans aucun envoi à Kraken.
+
+- Ordres au marché / IOC : exécutés sur le premier trade postérieur de PAPER_LATENCY_MS au
+  dernier trade connu à l'envoi (horloge des trades : valable aussi en rejeu accéléré), au
+  prix moyen attendu du carnet local s'il est synchronisé, sinon au prix du trade.
+- TP / SL résidents (take_profit / stp, triggerSignal "last") : déclenchés par le trade qui
+  franchit le niveau puis exécutés au marché. Les niveaux d'un symbole sont réduits à une
+  bande [lower, upper] : un trade à l'intérieur, sans ordre en attente, coûte une comparaison.
+- Soldes et positions virtuels en mémoire (dicts par symbole), frais PAPER_FEE_PCT par
+  exécution, PnL réalisé crédité au solde.
+
+Les réponses suivent le format Kraken (sendStatus / batchStatus, openPositions / openOrders) :
+les accusés, la réconciliation et main.py fonctionnent sans modification.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from trading.order_executor import OrderExecutor, IOC_NOT_FILLED
+from utils.logger import setup_logger
+from config import PAPER_LATENCY_MS, PAPER_FEE_PCT, PAPER_BALANCE
+
+logger = setup_logger("PaperExecutor")
+
+INF = float("inf")
+FILL_HISTORY = 1000  # Exécutions conservées pour stats() et la comparaison avec le backtest
+
+
+def _fill_time() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _triggers_above(order: dict) -> bool:
+    """True : déclenché par un prix >= stopPrice (TP vendeur, SL acheteur) ; False : par un prix <= stopPrice."""
+    return (order["orderType"] == "take_profit") == (order["side"] == "sell")
+
+
+class PaperExecutor(OrderExecutor):
+    def __init__(self, latency_ms: float = PAPER_LATENCY_MS, fee_pct: float = PAPER_FEE_PCT,
+                 balance: float = PAPER_BALANCE, books=None):
+        super().__init__(books=books)
+        self.latency_ms = latency_ms
+        self.fee_pct = fee_pct
+        self.initial_balance = self.balance = balance
+        self.positions = {}  # symbole -> {"size" (signée), "price" (prix moyen), "fillTime"}
+        self.orders = {}     # order_id -> ordre résident
+        self.resting = {}    # symbole -> {order_id: ordre résident}
+        self.bands = {}      # symbole -> (lower, upper) : niveaux de déclenchement les plus proches
+        self.pending = {}    # symbole -> deque d'ordres au marché / IOC en attente de latence
+        self.last = {}       # symbole -> (prix, horodatage ms) du dernier trade
+        self.fills = deque(maxlen=FILL_HISTORY)
+        self.realized = 0.0
+        self.fees = 0.0
+        self.counts = {"filled": 0, "triggered": 0, "rejected": 0}
+        self.order_seq = 0
+        self.lock = threading.Lock()  # Envois (thread d'exécution) contre exécutions (thread WebSocket)
+
+    # ---- Connexion (rien à ouvrir) ----
+
+    def warm_up(self):
+        logger.info("📄 Paper trading : ordres simulés, solde virtuel %.2f USD", self.balance)
+
+    def start_keepalive(self, interval: float = 0):
+        pass
+
+    # ---- Flux de trades ----
+
+    def on_tick(self, symbol: str, price: float, time_ms: int):
+        """Chemin chaud : appelé pour chaque trade (thread WebSocket)."""
+        self.last[symbol] = (price, time_ms)
+        if not self.pending.get(symbol):
+            band = self.bands.get(symbol)
+            if band is None or band[0] < price < band[1]:
+                return
+        with self.lock:
+            pending = self.pending.get(symbol)
+            while pending and pending[0]["due_ms"] <= time_ms:
+                self._execute(pending.popleft(), price, time_ms)
+            band = self.bands.get(symbol)
+            if band is not None and not band[0] < price < band[1]:
+                self._trigger(symbol, price, time_ms)
+
+    def _trigger(self, symbol: str, price: float, time_ms: int):
+        resting = self.resting[symbol]
+        for order_id, order in list(resting.items()):
+            stop = float(order["stopPrice"])
+            if (price >= stop) if _triggers_above(order) else (price <= stop):
+                del resting[order_id]
+                self.orders.pop(order_id, None)
+                self.counts["triggered"] += 1
+                logger.info("[%s] %s %s déclenché au trade %s (niveau %s)", symbol, order["orderType"],
+                            order_id, price, stop)
+                self._execute(order, price, time_ms)
+        self._refresh_band(symbol)
+
+    def _refresh_band(self, symbol: str):
+        resting = self.resting.get(symbol)
+        if not resting:
+            self.resting.pop(symbol, None)
+            self.bands.pop(symbol, None)
+            return
+        above = [float(o["stopPrice"]) for o in resting.values() if _triggers_above(o)]
+        below = [float(o["stopPrice"]) for o in resting.values() if not _triggers_above(o)]
+        self.bands[symbol] = (max(below, default=-INF), min(above, default=INF))
+
+    # ---- Exécution ----
+
+    def _execute(self, order: dict, price: float, time_ms: int):
+        """Exécute un ordre au marché (ou IOC, ou stop déclenché) au trade `price`."""
+        symbol, side = order["symbol"], order["side"]
+        size = float(order["size"])
+        held = self.positions.get(symbol)
+        position = held["size"] if held else 0.0
+        if order.get("reduceOnly"):
+            if not position or (position > 0) == (side == "buy"):
+                return self._reject(order, "wouldNotReducePosition")
+            size = min(size, abs(position))
+
+        limit = float(order["limitPrice"]) if order["orderType"] == "ioc" else None
+        book = self.books.get(symbol)
+        if book is not None and book.synced:
+            if limit is not None:
+                size = min(size, book.liquidity(side, limit))
+            average, filled = book.expected_fill(side, size) if size > 0 else (None, 0.0)
+            if average is not None and filled >= size:
+                price = average
+        if size <= 0 or (limit is not None and ((price > limit) if side == "buy" else (price < limit))):
+            return self._reject(order, IOC_NOT_FILLED)
+
+        signed = size if side == "buy" else -size
+        realized = 0.0
+        if position and (position > 0) != (signed > 0):
+            realized = (price - held["price"]) * min(abs(position), size) * (1 if position > 0 else -1)
+        new_size = round(position + signed, 10)
+        if new_size == 0:
+            self.positions.pop(symbol, None)
+        elif not position or (new_size > 0) != (position > 0):
+            self.positions[symbol] = {"size": new_size, "price": price, "fillTime": _fill_time()}
+        elif abs(new_size) > abs(position):
+            average = (held["price"] * abs(position) + price * size) / abs(new_size)
+            self.positions[symbol] = dict(held, size=new_size, price=average)
+        else:
+            self.positions[symbol] = dict(held, size=new_size)
+
+        fee = price * size * self.fee_pct / 100
+        self.balance += realized - fee
+        self.realized += realized
+        self.fees += fee
+        self.counts["filled"] += 1
+        self.fills.append({
+            "order_id": order["order_id"], "symbol": symbol, "side": side, "size": size, "price": price,
+            "type": order["orderType"], "time_ms": time_ms, "fee": fee, "realized": realized,
+        })
+        logger.info("📄 [%s] Exécution %s %s %s @ %.2f | PnL réalisé %.2f | frais %.4f | solde %.2f", symbol,
+                    order["orderType"], side, size, price, realized, fee, self.balance)
+
+    def _reject(self, order: dict, reason: str):
+        self.counts["rejected"] += 1
+        logger.info("📄 [%s] Ordre %s %s non exécuté : %s", order["symbol"], order["orderType"], order["order_id"],
+                    reason)
+
+    # ---- Transport simulé (format Kraken) ----
+
+    def _place(self, order: dict) -> dict:
+        """Traite une instruction (envoi ou annulation). Retourne le statut au format Kraken."""
+        if order.get("order") == "cancel":
+            found = self.orders.pop(order.get("order_id"), None)
+            if found:
+                self.resting[found["symbol"]].pop(found["order_id"], None)
+                self._refresh_band(found["symbol"])
+            return {"order_id": order.get("order_id"), "status": "cancelled" if found else "notFound"}
+
+        self.order_seq += 1
+        order_id = f"paper-{self.order_seq:08d}"
+        symbol, side, size = order.get("symbol"), order.get("side"), float(order.get("size", 0))
+        status = {"order_id": order_id, "receivedTime": int(time.time() * 1000), "orderEvents": []}
+        if "order_tag" in order:
+            status["order_tag"] = order["order_tag"]
+        if not symbol or side not in ("buy", "sell") or size <= 0:
+            return dict(status, status="invalidArgument")
+        order = dict(order, order_id=order_id, receivedTime=status["receivedTime"])
+        order_type = order.get("orderType")
+        if order_type in ("mkt", "ioc"):
+            last = self.last.get(symbol)
+            if last is None:
+                return dict(status, status="marketSuspended")
+            if order_type == "ioc" and ((last[0] > float(order["limitPrice"])) if side == "buy"
+                                        else (last[0] < float(order["limitPrice"]))):
+                return dict(status, status=IOC_NOT_FILLED)  # Refusée à l'envoi, comme Kraken
+            order["due_ms"] = last[1] + self.latency_ms
+            self.pending.setdefault(symbol, deque()).append(order)
+        elif order_type in ("stp", "take_profit"):
+            self.orders[order_id] = order
+            self.resting.setdefault(symbol, {})[order_id] = order
+            self._refresh_band(symbol)
+        else:
+            return dict(status, status="invalidOrderType")
+        status["orderEvents"].append({"type": "PLACE", "order": {"orderId": order_id}})
+        return dict(status, status="placed")
+
+    def _post(self, endpoint: str, payload: dict):
+        start = time.perf_counter()
+        with self.lock:
+            if endpoint == "batchorder":
+                data = {"result": "success", "batchStatus": [self._place(o) for o in payload["batchOrder"]]}
+            else:
+                data = {"result": "success", "sendStatus": self._place(payload)}
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.latency[endpoint].add(latency_ms)
+        return data, None, latency_ms
+
+    def _get(self, endpoint: str) -> dict | None:
+        with self.lock:
+            if endpoint == "openpositions":
+                return {"result": "success", "openPositions": [
+                    {"side": "long" if p["size"] > 0 else "short", "symbol": symbol, "price": p["price"],
+                     "fillTime": p["fillTime"], "size": abs(p["size"]), "unrealizedFunding": 0.0}
+                    for symbol, p in self.positions.items()
+                ]}
+            if endpoint == "openorders":
+                return {"result": "success", "openOrders": [
+                    {"order_id": order_id, "cliOrdId": o.get("cliOrdId"), "symbol": o["symbol"], "side": o["side"],
+                     "orderType": "stop" if o["orderType"] == "stp" else o["orderType"],
+                     "stopPrice": o.get("stopPrice"), "unfilledSize": float(o["size"]), "filledSize": 0,
+                     "reduceOnly": bool(o.get("reduceOnly")), "status": "untouched", "receivedTime": o["receivedTime"]}
+                    for order_id, o in self.orders.items()
+                ]}
+        logger.error("Endpoint %s non simulé", endpoint)
+        return None
+
+    # ---- Compte virtuel ----
+
+    def equity(self) -> float:
+        """Solde + PnL latent des positions au dernier prix."""
+        unrealized = sum((self.last.get(symbol, (p["price"],))[0] - p["price"]) * p["size"]
+                         for symbol, p in self.positions.items())
+        return self.balance + unrealized
+
+    def stats(self) -> dict:
+        equity = self.equity()
+        return {
+            "balance": self.balance,
+            "equity": equity,
+            "pnl_percent": (equity / self.initial_balance - 1) * 100 if self.initial_balance else 0.0,
+            "realized": self.realized,
+            "fees": self.fees,
+            "positions": {symbol: p["size"] for symbol, p in self.positions.items()},
+            "resting": len(self.orders),
+            **self.counts,
+        }
@@ -1,34 +1,328 @@
+"""
+Journalisation asynchrone : les threads applicatifs (WebSocket, stratégie, ordres) ne font
+que déposer l'enregistrement dans une file ; un thread d'écriture unique formate et écrit
+(console, fichiers tournants par composant, JSON lines optionnel).
+
+- Formatage différé : passer les valeurs en arguments (`logger.info("Bougie : %s", candle)`)
+  et non en f-string, la chaîne n'est alors construite que par le thread d'écriture.
+  Les objets passés ne doivent plus être modifiés ensuite (bougie clôturée, payload envoyé).
+- File bornée : si l'écriture ne suit pas, les messages sont perdus (comptés) plutôt que de
+  bloquer le chemin des ticks ou des ordres.
+- Limitation de débit par logger et par gabarit de message (seau à jetons, WARNING et
+  au-delà toujours écrits), échantillonnage optionnel des messages fréquents ; les messages
+  supprimés sont comptés dans le suivant.
+- LOG_JSON_PATH : sink JSON lines (un objet par ligne), interrogeable avec
+  `python -m utils.logger <fichier> [--logger X] [--level WARNING] [--since ISO] [--grep txt]`.
+"""
+import argparse
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 LOG_DIR = "logs"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper()   # Niveau des loggers (INFO : debug non émis)
+LOG_JSON_PATH = os.getenv("LOG_JSON_PATH")            # ex. logs/bot.jsonl (désactivé si vide)
+LOG_QUEUE_SIZE = 10_000        # Enregistrements en attente d'écriture max (au-delà : perdus)
+LOG_MAX_BYTES = 10_000_000     # Taille d'un fichier avant rotation
+LOG_BACKUP_COUNT = 5
+LOG_RATE_PER_SEC = 10          # Débit max par gabarit de message et par logger
+LOG_BURST = 50                 # Messages identiques acceptés d'affilée avant limitation
 os.makedirs(LOG_DIR, exist_ok=True)
 
-def setup_logger(name: str) -> logging.Logger:
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+FORMAT = '%(asctime)s | %(levelname)s | %(name)s | %(message)s'
+_formatter = logging.Formatter(FORMAT)
 
-    if logger.hasHandlers():
-        return logger  # Évite d'ajouter plusieurs fois les handlers
 
-    # Formatter commun
-    formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(name)s | %(message)s')
+class RateLimitFilter(logging.Filter):
+    """
+    Seau à jetons par gabarit de message (`record.msg`, avant formatage) : au plus `burst`
+    messages d'affilée puis `rate_per_sec`. Les suppressions sont signalées par le message
+    suivant du même gabarit. WARNING et au-delà ne sont jamais limités.
+    """
+
+    MAX_KEYS = 1000  # Gabarits suivis (messages en f-string : un gabarit par texte)
+
+    def __init__(self, rate_per_sec: float = LOG_RATE_PER_SEC, burst: int = LOG_BURST):
+        super().__init__()
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.buckets = {}  # gabarit -> [jetons, dernier instant, supprimés]
+        self.suppressed = 0
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        key = _template(record)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.MAX_KEYS:
+                self.buckets.clear()
+            bucket = self.buckets[key] = [self.burst, now, 0]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            self.suppressed += 1
+            return False
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            _note_suppressed(record, bucket[2])
+            bucket[2] = 0
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Garde 1 message sur `every` par gabarit, pour les niveaux <= `max_level`."""
+
+    def __init__(self, every: int, max_level: int = logging.INFO):
+        super().__init__()
+        self.every = every
+        self.max_level = max_level
+        self.counts = {}
+        self.suppressed = 0
+
+    def filter(self, record) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = _template(record)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1 if len(self.counts) < RateLimitFilter.MAX_KEYS else 1
+        if count % self.every:
+            self.suppressed += 1
+            return False
+        return True
+
+
+def _no_caller(*args, **kwargs):
+    """
+    Remplace Logger.findCaller sur les loggers du bot : fichier / ligne de l'appelant non
+    utilisés par les formats, la pile n'est pas parcourue (sans toucher au module logging).
+    """
+    return "(unknown file)", 0, "(unknown function)", None
+
+
+def _template(record):
+    return record.msg if isinstance(record.msg, str) else type(record.msg).__name__
+
+
+def _note_suppressed(record, count: int):
+    if record.args and isinstance(record.args, tuple):
+        record.msg = f"{record.msg} (+%d messages similaires ignorés)"
+        record.args = record.args + (count,)
+    elif not record.args:
+        record.msg = f"{record.msg} (+{count} messages similaires ignorés)"
+
+
+class _AsyncHandler(QueueHandler):
+    """Dépôt non bloquant ; le formatage reste au thread d'écriture."""
+
+    def __init__(self, log_queue, maxsize: int = LOG_QUEUE_SIZE):
+        super().__init__(log_queue)
+        self.maxsize = maxsize
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Seule la trace d'une exception est figée ici (la pile n'existera plus à l'écriture)
+        if record.exc_info:
+            record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # SimpleQueue (C, sans verrou Python) bornée par sa taille : 20 % plus rapide que Queue
+        if self.queue.qsize() >= self.maxsize:
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+
+class _FileRouter(logging.Handler):
+    """Un fichier tournant par logger déclaré via setup_logger (ouvert à la première écriture)."""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.names = set()
+        self.files = {}
+
+    def emit(self, record):
+        handler = self.files.get(record.name)
+        if handler is None:
+            if record.name not in self.names:
+                return  # Logger racine ou tiers : console uniquement
+            handler = self.files[record.name] = RotatingFileHandler(
+                os.path.join(LOG_DIR, f"{record.name}.log"), maxBytes=LOG_MAX_BYTES,
+                backupCount=LOG_BACKUP_COUNT, delay=True, encoding="utf-8",
+            )
+            handler.setFormatter(_formatter)
+        handler.handle(record)
 
-    # Handler console
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        super().close()
 
-    # Handler fichier
-    file_handler = RotatingFileHandler(
-        os.path.join(LOG_DIR, f"{name}.log"), maxBytes=1_000_000, backupCount=5
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
 
-    # Ajout des handlers
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+class JsonLinesHandler(RotatingFileHandler):
+    """Un objet JSON par ligne : time, level, logger, thread, msg (+ exc, + `extra={"data": ...}`)."""
 
+    def __init__(self, path: str):
+        super().__init__(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True, encoding="utf-8")
+
+    def format(self, record) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        data = getattr(record, "data", None)
+        if data is not None:
+            entry["data"] = data
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_queue = queue.SimpleQueue()
+_handler = _AsyncHandler(_queue)
+_router = _FileRouter()
+_listener = None
+_start_lock = threading.Lock()
+
+
+def _start():
+    """Démarre le thread d'écriture (une fois par processus), arrêté et vidé à la sortie."""
+    global _listener
+    with _start_lock:
+        if _listener is not None:
+            return
+        console = logging.StreamHandler()
+        console.setLevel(logging.INFO)
+        console.setFormatter(_formatter)
+        handlers = [console, _router]
+        if LOG_JSON_PATH:
+            os.makedirs(os.path.dirname(LOG_JSON_PATH) or ".", exist_ok=True)
+            handlers.append(JsonLinesHandler(LOG_JSON_PATH))
+        _listener = QueueListener(_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def setup_logger(name: str, rate_per_sec: float | None = LOG_RATE_PER_SEC, burst: int = LOG_BURST,
+                 sample_every: int | None = None) -> logging.Logger:
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger  # Évite d'ajouter plusieurs fois les handlers
+
+    _start()
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False  # Pas de double écriture via le logger racine
+    logger.findCaller = _no_caller
+    logger.addHandler(_handler)
+    _router.names.add(name)
+    throttle(name, rate_per_sec, burst, sample_every)
     return logger
+
+
+def setup_root_logger(level=logging.INFO):
+    """Logger racine (logging.info de main.py) : même file, console uniquement."""
+    _start()
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.findCaller = _no_caller
+    root.setLevel(level)
+    throttle(root, LOG_RATE_PER_SEC, LOG_BURST)
+    return root
+
+
+def throttle(logger, rate_per_sec: float | None = LOG_RATE_PER_SEC, burst: int = LOG_BURST,
+             sample_every: int | None = None):
+    """(Re)définit la limitation de débit et l'échantillonnage d'un logger (nom ou instance)."""
+    logger = logging.getLogger(logger) if isinstance(logger, str) else logger
+    for existing in list(logger.filters):
+        if isinstance(existing, (RateLimitFilter, SampleFilter)):
+            logger.removeFilter(existing)
+    if sample_every and sample_every > 1:
+        logger.addFilter(SampleFilter(sample_every))
+    if rate_per_sec:
+        logger.addFilter(RateLimitFilter(rate_per_sec, burst))
+
+
+def stats() -> dict:
+    """Profondeur de la file, messages perdus (file pleine) et supprimés (débit / échantillonnage)."""
+    suppressed = 0
+    for logger in [logging.getLogger(), *logging.Logger.manager.loggerDict.values()]:
+        for f in getattr(logger, "filters", ()):
+            suppressed += getattr(f, "suppressed", 0) if isinstance(f, (RateLimitFilter, SampleFilter)) else 0
+    return {"queued": _queue.qsize(), "dropped": _handler.dropped, "suppressed": suppressed}
+
+
+def flush(timeout: float = 5.0):
+    """Attend que la file d'écriture soit vide (au plus `timeout` secondes)."""
+    deadline = time.monotonic() + timeout
+    while _listener is not None and not _queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def shutdown():
+    """Vide la file et ferme les fichiers (appelé à la sortie du processus)."""
+    global _listener
+    with _start_lock:
+        if _listener is None:
+            return
+        if _listener._thread is not None:
+            _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+# ---- Lecture du sink JSON lines ----
+
+def query(path: str, logger: str | None = None, level: str | None = None, since: str | None = None,
+          grep: str | None = None):
+    """Itère les entrées du fichier JSON lines (et de ses rotations, du plus ancien au plus récent)."""
+    min_level = logging.getLevelName(level.upper()) if level else 0
+    files = [f"{path}.{i}" for i in range(LOG_BACKUP_COUNT, 0, -1)] + [path]
+    for name in files:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Ligne tronquée (arrêt brutal)
+                if logger and entry["logger"] != logger:
+                    continue
+                if min_level and logging.getLevelName(entry["level"]) < min_level:
+                    continue
+                if since and entry["time"] < since:
+                    continue
+                if grep and grep not in entry["msg"]:
+                    continue
+                yield entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filtre un journal JSON lines (LOG_JSON_PATH).")
+    parser.add_argument("path", nargs="?", default=LOG_JSON_PATH)
+    parser.add_argument("--logger")
+    parser.add_argument("--level", help="Niveau minimum (ex. WARNING)")
+    parser.add_argument("--since", help="Horodatage ISO UTC minimum (ex. 2024-05-01T12:00)")
+    parser.add_argument("--grep", help="Texte recherché dans le message")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("chemin du journal requis (ou LOG_JSON_PATH)")
+    for entry in query(args.path, args.logger, args.level, args.since, args.grep):
+        sys.stdout.write(json.dumps(entry, ensure_ascii=False) + "\n")
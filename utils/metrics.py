@@ -0,0 +1,208 @@
+import bisect
+import os
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.logger import setup_logger
+
+logger = setup_logger("Metrics")
+
+
+class LatencyStats:
+    """Statistiques de latence cumulées (en millisecondes), thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def add(self, ms: float):
+        with self.lock:
+            self.count += 1
+            self.total_ms += ms
+            self.last_ms = ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            mean = self.total_ms / self.count if self.count else 0.0
+            return {"count": self.count, "mean_ms": mean, "max_ms": self.max_ms, "last_ms": self.last_ms}
+
+
+# Bornes des buckets (secondes) : progression géométrique de raison √2, de 1µs à ~95s
+BUCKETS = tuple(1e-6 * 2 ** (i / 2) for i in range(54))
+
+
+class Histogram:
+    """
+    Histogramme de latences à buckets fixes (secondes) : un enregistrement = une recherche
+    dichotomique + trois additions. Sans verrou : chaque série n'a qu'un seul écrivain
+    (thread WebSocket, worker d'un symbole, thread d'exécution, de MongoDB ou de Telegram).
+    """
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Dernier bucket : au-delà de la plus grande borne
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Quantile estimé par interpolation dans le bucket (borné par le maximum observé)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[i - 1] if i > 0 else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+def process_memory_bytes() -> int:
+    """Mémoire résidente (RSS) du processus en octets."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Pic (Ko) hors Linux
+
+
+class MetricsRegistry:
+    """Histogrammes de latence par (étape, symbole) et jauges calculées à la lecture."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def gauge(self, name: str, help_text: str, read, label: str | None = None):
+        """
+        Jauge évaluée à chaque export : `read()` retourne une valeur, ou {valeur du label: valeur}
+        si `label` est fourni (ex. profondeur de file par étage).
+        """
+        self.gauges[name] = (help_text, read, label)
+
+    def histogram(self, stage: str, symbol: str) -> Histogram:
+        key = (stage, symbol)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, stage: str, symbol: str, seconds: float):
+        self.histogram(stage, symbol).observe(seconds)
+
+    def observe_since(self, stage: str, symbol: str, start_ns: int):
+        """Enregistre le temps écoulé depuis `start_ns` (time.perf_counter_ns)."""
+        self.histogram(stage, symbol).observe((time.perf_counter_ns() - start_ns) * 1e-9)
+
+    def snapshot(self) -> dict:
+        return {key: histogram.snapshot() for key, histogram in sorted(self.histograms.items())}
+
+    def summary(self) -> list:
+        """Lignes de résumé p50/p99/max par étape et par symbole."""
+        return [
+            f"[{stage}][{symbol}] n={stats['count']} | p50={stats['p50_ms']:.2f}ms | "
+            f"p99={stats['p99_ms']:.2f}ms | max={stats['max_ms']:.2f}ms"
+            for (stage, symbol), stats in self.snapshot().items()
+        ]
+
+    def render(self) -> str:
+        """Exposition au format texte Prometheus."""
+        histograms = sorted(self.histograms.items())
+        lines = [
+            "# HELP bot_latency_seconds Latence par étape du pipeline (tick -> ordre).",
+            "# TYPE bot_latency_seconds histogram",
+        ]
+        for (stage, symbol), histogram in histograms:
+            labels = f'stage="{stage}",symbol="{symbol}"'
+            counts = list(histogram.counts)
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f'bot_latency_seconds_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'bot_latency_seconds_bucket{{{labels},le="+Inf"}} {cumulative + counts[-1]}')
+            lines.append(f"bot_latency_seconds_sum{{{labels}}} {histogram.sum:.9f}")
+            lines.append(f"bot_latency_seconds_count{{{labels}}} {histogram.count}")
+
+        lines += [
+            "# HELP bot_latency_quantile_seconds Quantiles estimés depuis l'histogramme.",
+            "# TYPE bot_latency_quantile_seconds gauge",
+        ]
+        for (stage, symbol), histogram in histograms:
+            for q in (0.5, 0.99):
+                lines.append(f'bot_latency_quantile_seconds{{stage="{stage}",symbol="{symbol}",quantile="{q}"}} '
+                             f"{histogram.quantile(q):.9f}")
+        lines += [
+            "# HELP bot_latency_max_seconds Latence maximale observée.",
+            "# TYPE bot_latency_max_seconds gauge",
+        ]
+        for (stage, symbol), histogram in histograms:
+            lines.append(f'bot_latency_max_seconds{{stage="{stage}",symbol="{symbol}"}} {histogram.max:.9f}')
+
+        for name, (help_text, read, label) in sorted(self.gauges.items()):
+            try:
+                value = read()
+            except Exception as e:
+                logger.warning("Jauge %s illisible : %s", name, e)
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            if label:
+                lines += [f'{name}{{{label}="{key}"}} {v}' for key, v in value.items()]
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Registre global du processus
+metrics = MetricsRegistry()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = metrics):
+    """Sert `GET /metrics` (format Prometheus) sur un thread dédié. Retourne le serveur HTTP."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Pas de log par requête de scraping
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Métriques exposées sur http://%s:%s/metrics", host, server.server_port)
+    return server